@@ -1,4 +1,7 @@
-from .moving_averages import calcular_medias_moveis
-from .rsi import calcular_rsi
+from .moving_averages import calcular_medias_moveis, MediaMovelIncremental, MediasMoveisIncrementais
+from .rsi import calcular_rsi, rsi_vetorizado, RSIIncremental
 
-__all__ = ["calcular_medias_moveis", "calcular_rsi"]
+__all__ = [
+    "calcular_medias_moveis", "MediaMovelIncremental", "MediasMoveisIncrementais",
+    "calcular_rsi", "rsi_vetorizado", "RSIIncremental",
+]
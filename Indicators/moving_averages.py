@@ -1,4 +1,9 @@
-def calcular_medias_moveis(dados, janela_curta=7, janela_longa=40):
+import math
+
+import numpy as np
+
+
+def calcular_medias_moveis(dados, janela_curta=7, janela_longa=40, motor=None):
     """
     Calcula médias móveis de curto e longo prazo.
 
@@ -6,10 +11,179 @@ def calcular_medias_moveis(dados, janela_curta=7, janela_longa=40):
         dados (DataFrame): DataFrame com a coluna 'preco_fechamento'.
         janela_curta (int): Período para média móvel curta.
         janela_longa (int): Período para média móvel longa.
+        motor (MediasMoveisIncrementais): Estado incremental mantido entre
+            chamadas. Se informado, só os candles novos são processados e
+            apenas a última linha das colunas é preenchida. As janelas do
+            motor devem ser `janela_curta` e `janela_longa`.
 
     Retorna:
         DataFrame: Dados com colunas 'media_curta' e 'media_longa'.
     """
+    if motor is not None:
+        if (janela_curta, janela_longa) != (motor.curta.janela, motor.longa.janela):
+            raise ValueError(
+                f"Janelas ({janela_curta}, {janela_longa}) diferentes das do motor "
+                f"({motor.curta.janela}, {motor.longa.janela})"
+            )
+        media_curta, media_longa = motor.atualizar_dados(dados)
+        # Colunas montadas em arrays e atribuídas de uma vez (atribuição por iloc é lenta no pandas)
+        curta = np.full(len(dados), np.nan)
+        longa = np.full(len(dados), np.nan)
+        if len(dados) > 0:
+            curta[-1] = media_curta
+            longa[-1] = media_longa
+        dados['media_curta'] = curta
+        dados['media_longa'] = longa
+        return dados
     dados['media_curta'] = dados['preco_fechamento'].rolling(window=janela_curta).mean()
     dados['media_longa'] = dados['preco_fechamento'].rolling(window=janela_longa).mean()
-    return dados
\ No newline at end of file
+    return dados
+
+
+class MediaMovelIncremental:
+    """
+    Média móvel simples com buffer circular, atualizada em tempo constante.
+
+    A soma da janela é mantida com compensação de Kahan (como no rolling do
+    pandas) e recalculada de forma exata a cada `ressincronizar_a_cada`
+    atualizações, para não acumular erro em execuções longas.
+    """
+
+    def __init__(self, janela, ressincronizar_a_cada=10000):
+        self.janela = janela
+        self.ressincronizar_a_cada = ressincronizar_a_cada
+        self.limpar()
+
+    def limpar(self):
+        """Descarta todos os valores da janela."""
+        self._buffer = [0.0] * self.janela
+        self._posicao = 0
+        self._quantidade = 0
+        self._soma = 0.0
+        self._compensacao = 0.0
+        self._atualizacoes = 0
+
+    def inicializar(self, historico):
+        """
+        Carrega a janela a partir de um histórico de preços.
+
+        Parâmetros:
+            historico (array): Preços em ordem cronológica; só os últimos
+                `janela` valores são usados.
+        """
+        self.limpar()
+        ultimos = [float(v) for v in historico[-self.janela:]]
+        self._buffer[:len(ultimos)] = ultimos
+        self._quantidade = len(ultimos)
+        self._posicao = len(ultimos) % self.janela
+        self._soma = math.fsum(ultimos)
+        return self
+
+    def _somar(self, valor):
+        y = valor - self._compensacao
+        t = self._soma + y
+        self._compensacao = (t - self._soma) - y
+        self._soma = t
+
+    def atualizar(self, preco):
+        """Adiciona o preço de um candle fechado e retorna a média atual."""
+        preco = float(preco)
+        if self._quantidade == self.janela:
+            self._somar(-self._buffer[self._posicao])
+        else:
+            self._quantidade += 1
+        self._buffer[self._posicao] = preco
+        self._somar(preco)
+        self._posicao = (self._posicao + 1) % self.janela
+
+        self._atualizacoes += 1
+        if self._atualizacoes >= self.ressincronizar_a_cada:
+            self._soma = math.fsum(self._buffer[:self._quantidade] if self._quantidade < self.janela else self._buffer)
+            self._compensacao = 0.0
+            self._atualizacoes = 0
+        return self.valor
+
+    @property
+    def valor(self):
+        """Média da janela, ou NaN se ainda não houver valores suficientes."""
+        if self._quantidade < self.janela:
+            return math.nan
+        return self._soma / self.janela
+
+    def valor_com(self, preco):
+        """
+        Média que resultaria de adicionar `preco`, sem alterar o estado.
+
+        Usado para o candle ainda aberto, cujo preço muda até o fechamento.
+        """
+        return (self.soma_parcial() + float(preco)) / self.janela
+
+    def soma_parcial(self):
+        """
+        Soma dos `janela - 1` preços mais recentes, ou NaN se não houver valores suficientes.
+
+        É a parte da média que não depende do candle aberto.
+        """
+        if self._quantidade < self.janela - 1:
+            return math.nan
+        soma = self._soma
+        if self._quantidade == self.janela:
+            soma -= self._buffer[self._posicao]
+        return soma
+
+
+class MediasMoveisIncrementais:
+    """
+    Par de médias móveis (curta e longa) mantido entre ciclos do bot.
+
+    Guarda o horário do último candle fechado já processado; a cada chamada
+    processa apenas os candles fechados depois dele e trata o último candle
+    dos dados como provisório (ainda aberto). Se a sequência não continuar
+    de onde parou, as médias são reinicializadas a partir do histórico.
+    """
+
+    def __init__(self, janela_curta=7, janela_longa=40):
+        self.curta = MediaMovelIncremental(janela_curta)
+        self.longa = MediaMovelIncremental(janela_longa)
+        self.ultimo_tempo = None
+
+    def inicializar(self, historico):
+        """Carrega as duas médias a partir de um histórico de preços fechados."""
+        self.curta.inicializar(historico)
+        self.longa.inicializar(historico)
+        return self
+
+    def atualizar(self, preco):
+        """Adiciona o preço de um candle fechado e retorna (curta, longa)."""
+        return self.curta.atualizar(preco), self.longa.atualizar(preco)
+
+    def atualizar_dados(self, dados):
+        """
+        Atualiza o estado com os candles novos de `dados`.
+
+        Parâmetros:
+            dados (DataFrame): Colunas 'preco_fechamento' e 'tempo_fechamento'.
+
+        Retorna:
+            tuple: (media_curta, media_longa) considerando o último candle.
+        """
+        if len(dados) == 0:
+            return math.nan, math.nan
+        precos = dados['preco_fechamento'].to_numpy(dtype=float)
+        tempos = dados['tempo_fechamento'].to_numpy()
+
+        inicio = None
+        if self.ultimo_tempo is not None:
+            indice = int(np.searchsorted(tempos, self.ultimo_tempo))
+            if indice < len(tempos) and tempos[indice] == self.ultimo_tempo:
+                inicio = indice + 1
+        if inicio is None:
+            self.inicializar(precos[:-1])
+        else:
+            for preco in precos[inicio:-1]:
+                self.atualizar(preco)
+        if len(tempos) > 1:
+            self.ultimo_tempo = tempos[-2]
+
+        preco_atual = precos[-1]
+        return self.curta.valor_com(preco_atual), self.longa.valor_com(preco_atual)
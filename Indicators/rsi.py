@@ -1,19 +1,203 @@
-def calcular_rsi(dados, periodo=14):
+import math
+
+import numpy as np
+import pandas as pd
+
+from .moving_averages import MediaMovelIncremental
+
+
+def calcular_rsi(dados, periodo=14, metodo='sma', motor=None):
     """
     Calcula o Índice de Força Relativa (RSI).
 
     Parâmetros:
         dados (DataFrame): DataFrame com a coluna 'preco_fechamento'.
         periodo (int): Período para cálculo do RSI.
+        metodo (str): 'sma' (médias simples de ganhos e perdas) ou 'wilder'
+            (suavização de Wilder).
+        motor (RSIIncremental): Estado incremental mantido entre chamadas. Se
+            informado, só os candles novos são processados e apenas a última
+            linha da coluna é preenchida.
 
     Retorna:
         DataFrame: Dados com coluna 'rsi'.
     """
-    delta = dados['preco_fechamento'].diff()
-    ganhos = delta.where(delta > 0, 0)
-    perdas = -delta.where(delta < 0, 0)
-    media_ganhos = ganhos.rolling(window=periodo).mean()
-    media_perdas = perdas.rolling(window=periodo).mean()
-    rs = media_ganhos / media_perdas
-    dados['rsi'] = 100 - (100 / (1 + rs))
+    if motor is not None:
+        valor = motor.atualizar_dados(dados)
+        rsi = np.full(len(dados), np.nan)
+        if len(dados) > 0:
+            rsi[-1] = valor
+        dados['rsi'] = rsi
+        return dados
+    dados['rsi'] = rsi_vetorizado(dados['preco_fechamento'].to_numpy(dtype=float), periodo, metodo)
     return dados
+
+
+def rsi_vetorizado(precos, periodo=14, metodo='sma'):
+    """
+    Calcula o RSI de uma série inteira de uma vez (modo em lote para backtests).
+
+    Trabalha direto sobre arrays NumPy, sem criar Series intermediárias.
+
+    Parâmetros:
+        precos (array): Preços de fechamento em ordem cronológica.
+        periodo (int): Período do RSI.
+        metodo (str): 'sma' ou 'wilder'.
+
+    Retorna:
+        ndarray: RSI de cada candle (NaN durante o aquecimento).
+    """
+    precos = np.asarray(precos, dtype=float)
+    n = len(precos)
+    rsi = np.full(n, np.nan)
+    if n == 0:
+        return rsi
+
+    delta = np.empty(n)
+    delta[0] = 0.0
+    np.subtract(precos[1:], precos[:-1], out=delta[1:])
+    ganhos = np.maximum(delta, 0.0)
+    perdas = np.maximum(-delta, 0.0)
+
+    if metodo == 'sma':
+        if n < periodo:
+            return rsi
+        janelas_ganho = np.lib.stride_tricks.sliding_window_view(ganhos, periodo)
+        janelas_perda = np.lib.stride_tricks.sliding_window_view(perdas, periodo)
+        media_ganhos = janelas_ganho.mean(axis=1)
+        media_perdas = janelas_perda.mean(axis=1)
+        inicio = periodo - 1
+    elif metodo == 'wilder':
+        if n <= periodo:
+            return rsi
+        # Semente: média simples dos primeiros `periodo` deltas; depois média exponencial com alfa = 1/periodo
+        ganhos[periodo] = ganhos[1:periodo + 1].mean()
+        perdas[periodo] = perdas[1:periodo + 1].mean()
+        alfa = 1.0 / periodo
+        media_ganhos = pd.Series(ganhos[periodo:]).ewm(alpha=alfa, adjust=False).mean().to_numpy()
+        media_perdas = pd.Series(perdas[periodo:]).ewm(alpha=alfa, adjust=False).mean().to_numpy()
+        inicio = periodo
+    else:
+        raise ValueError(f"Método de RSI desconhecido: {metodo}")
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = media_ganhos / media_perdas
+        rsi[inicio:] = 100 - (100 / (1 + rs))
+    return rsi
+
+
+class RSIIncremental:
+    """
+    RSI atualizado candle a candle, guardando as médias de ganho e perda.
+
+    Com metodo='sma' reproduz `calcular_rsi` (médias simples em buffer
+    circular); com metodo='wilder' usa a suavização de Wilder. Assim como as
+    médias móveis incrementais, guarda o horário do último candle fechado e
+    trata o último candle dos dados como provisório.
+    """
+
+    def __init__(self, periodo=14, metodo='sma'):
+        if metodo not in ('sma', 'wilder'):
+            raise ValueError(f"Método de RSI desconhecido: {metodo}")
+        self.periodo = periodo
+        self.metodo = metodo
+        self.limpar()
+
+    def limpar(self):
+        """Descarta todo o estado acumulado."""
+        self._ganhos = MediaMovelIncremental(self.periodo)
+        self._perdas = MediaMovelIncremental(self.periodo)
+        self._media_ganhos = 0.0
+        self._media_perdas = 0.0
+        self._deltas = 0
+        self._ultimo_preco = None
+        self.ultimo_tempo = None
+
+    def inicializar(self, historico):
+        """Recalcula o estado a partir de um histórico de preços fechados."""
+        self.limpar()
+        for preco in historico:
+            self.atualizar(preco)
+        return self
+
+    def _proximas_medias(self, ganho, perda):
+        if self._deltas < self.periodo:
+            # Ainda acumulando a semente (média simples dos primeiros deltas)
+            n = self._deltas + 1
+            return (self._media_ganhos * self._deltas + ganho) / n, (self._media_perdas * self._deltas + perda) / n
+        return (
+            (self._media_ganhos * (self.periodo - 1) + ganho) / self.periodo,
+            (self._media_perdas * (self.periodo - 1) + perda) / self.periodo,
+        )
+
+    @staticmethod
+    def _rsi(media_ganhos, media_perdas):
+        if media_perdas == 0:
+            return math.nan if media_ganhos == 0 else 100.0
+        return 100 - (100 / (1 + media_ganhos / media_perdas))
+
+    def atualizar(self, preco):
+        """Adiciona o preço de um candle fechado e retorna o RSI atual."""
+        preco = float(preco)
+        delta = 0.0 if self._ultimo_preco is None else preco - self._ultimo_preco
+        primeiro = self._ultimo_preco is None
+        self._ultimo_preco = preco
+        ganho, perda = max(delta, 0.0), max(-delta, 0.0)
+
+        if self.metodo == 'sma':
+            self._ganhos.atualizar(ganho)
+            self._perdas.atualizar(perda)
+        elif not primeiro:
+            self._media_ganhos, self._media_perdas = self._proximas_medias(ganho, perda)
+            self._deltas += 1
+        return self.valor
+
+    @property
+    def valor(self):
+        """RSI atual, ou NaN durante o aquecimento."""
+        if self.metodo == 'sma':
+            return self._rsi(self._ganhos.valor, self._perdas.valor)
+        if self._deltas < self.periodo:
+            return math.nan
+        return self._rsi(self._media_ganhos, self._media_perdas)
+
+    def valor_com(self, preco):
+        """RSI que resultaria de adicionar `preco`, sem alterar o estado."""
+        if self._ultimo_preco is None:
+            return math.nan
+        delta = float(preco) - self._ultimo_preco
+        ganho, perda = max(delta, 0.0), max(-delta, 0.0)
+        if self.metodo == 'sma':
+            return self._rsi(self._ganhos.valor_com(ganho), self._perdas.valor_com(perda))
+        if self._deltas + 1 < self.periodo:
+            return math.nan
+        return self._rsi(*self._proximas_medias(ganho, perda))
+
+    def atualizar_dados(self, dados):
+        """
+        Atualiza o estado com os candles novos de `dados`.
+
+        Parâmetros:
+            dados (DataFrame): Colunas 'preco_fechamento' e 'tempo_fechamento'.
+
+        Retorna:
+            float: RSI considerando o último candle.
+        """
+        if len(dados) == 0:
+            return math.nan
+        precos = dados['preco_fechamento'].to_numpy(dtype=float)
+        tempos = dados['tempo_fechamento'].to_numpy()
+
+        inicio = None
+        if self.ultimo_tempo is not None:
+            indice = int(np.searchsorted(tempos, self.ultimo_tempo))
+            if indice < len(tempos) and tempos[indice] == self.ultimo_tempo:
+                inicio = indice + 1
+        if inicio is None:
+            self.inicializar(precos[:-1])
+        else:
+            for preco in precos[inicio:-1]:
+                self.atualizar(preco)
+        if len(tempos) > 1:
+            self.ultimo_tempo = tempos[-2]
+        return self.valor_com(precos[-1])
@@ -8,12 +8,21 @@ import os
 import time
 from datetime import datetime, timedelta
 import pandas as pd
-from bot import main, run_bot_loop
+from bot import main, SessaoBot
 import os as os_module
 from binance.client import Client
 from dotenv import load_dotenv
-from utils.data import obter_dados_historicos
-from Indicators.moving_averages import calcular_medias_moveis
+from utils.async_client import ClientePool, pool_conexoes, pool_habilitado
+from utils.client_cache import cache_clientes
+from utils.market_data import hub_mercado
+from utils.scheduler import agendador_bots
+from utils.db import DB_PATH, banco, conectar
+from utils.migrations import migrar
+from utils.positions import lucro_nao_realizado, posicoes_do_usuario
+from utils.transaction_sync import sincronizar_trades
+from utils.response_cache import cache_respostas
+from utils.rate_limit import ClienteGovernado, LimitePesoExcedido, PRIORIDADE_PAINEL, governador_peso
+from utils.assets import TOP_ASSETS
 from cryptography.fernet import Fernet
 import base64
 
@@ -21,6 +30,9 @@ app = Flask(__name__)
 app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'your-secret-key-change-in-production')
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
 
+# Tempo máximo (s) para /api/portfolio reunir conta, preços e médias; o que não chegar é marcado como parcial
+PRAZO_PORTFOLIO = float(os.getenv('PORTFOLIO_DEADLINE_SECONDS', '8'))
+
 # Configurar CORS para permitir todas as origens e métodos
 CORS(app, 
      resources={r"/api/*": {"origins": "*"}},
@@ -31,14 +43,16 @@ CORS(app,
 
 jwt = JWTManager(app)
 
-# Database setup
-# Use persistent disk path for Render or current directory for local development
-DB_DIR = os.environ.get('RENDER') and '/opt/render/project/src' or os.path.dirname(os.path.abspath(__file__))
-DB_PATH = os.path.join(DB_DIR, 'cryptobot.db')
+@app.teardown_appcontext
+def liberar_conexao_da_thread(exc):
+    """Desfaz escritas não confirmadas de rotas que retornaram sem fechar a conexão."""
+    banco.liberar_thread()
+
+# Database setup (conexões por thread reaproveitadas, ver utils/db.py)
 print(f"📁 Database path: {DB_PATH}")
 
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
+    conn = conectar()
     cursor = conn.cursor()
     
     # Users table
@@ -132,14 +146,13 @@ def init_db():
     ''')
     
     conn.commit()
+    
+    # Colunas e índices acrescentados depois da criação das tabelas
+    migrar(conn)
     conn.close()
 
 init_db()
 
-# Threads management
-bot_threads = {}
-bot_stop_flags = {}
-
 # Encryption key for API secrets (in production, use environment variable)
 # Try to load from .env first, then from .encryption_key file, then generate new
 ENCRYPTION_KEY_FILE = '.encryption_key'
@@ -204,11 +217,20 @@ def decrypt_secret(encrypted_secret):
 
 def get_binance_client(user_id=None):
     """
-    Cria um cliente Binance com configurações apropriadas.
+    Retorna o cliente Binance do usuário, reaproveitado entre requisições.
     O recvWindow é passado explicitamente nas chamadas de API que precisarem.
+    
+    O cliente fica em cache (utils/client_cache.py) até as chaves serem salvas
+    de novo ou ele ficar ocioso; só a primeira requisição lê e descriptografa as chaves.
+    """
+    return cache_clientes.obter(user_id, lambda: criar_binance_client(user_id))
+
+def criar_binance_client(user_id=None):
+    """
+    Cria um cliente Binance com configurações apropriadas.
     """
     if user_id:
-        conn = sqlite3.connect(DB_PATH)
+        conn = conectar()
         cursor = conn.cursor()
         cursor.execute('SELECT api_key, api_secret FROM api_keys WHERE user_id = ?', (user_id,))
         result = cursor.fetchone()
@@ -229,11 +251,49 @@ def get_binance_client(user_id=None):
         api_key = os_module.getenv("KEY_BINANCE")
         api_secret = os_module.getenv("SECRET_BINANCE")
     
-    # Criar cliente Binance
-    client = Client(api_key, api_secret)
+    # Criar cliente Binance (sobre o pool de conexões compartilhado, se habilitado);
+    # chamadas das rotas têm a prioridade mais baixa no governador de peso
+    client = ClientePool(api_key, api_secret) if pool_habilitado() else Client(api_key, api_secret)
+    client = ClienteGovernado(client, PRIORIDADE_PAINEL)
     
     return client
 
+def resposta_em_cache(rota, user_id, gerar):
+    """
+    Responde uma rota do dashboard a partir do cache de respostas do usuário.
+
+    Respostas 200 completas são guardadas por alguns segundos (ver utils/response_cache.py)
+    e levam um ETag; se o cliente enviar o mesmo ETag em If-None-Match, a
+    resposta é 304 sem corpo.
+
+    Parâmetros:
+        rota (str): Nome da rota no cache (e.g., "portfolio").
+        user_id: ID do usuário.
+        gerar (callable): Recebe user_id e retorna a resposta da rota (como numa view).
+    """
+    def calcular():
+        # Também roda fora da requisição, no recálculo em segundo plano
+        with app.app_context():
+            resposta = app.make_response(gerar(user_id))
+        headers = {k: v for k, v in resposta.headers if k not in ("Content-Type", "Content-Length")}
+        valor = (resposta.get_data(), resposta.status_code, resposta.mimetype, headers)
+        # Respostas parciais (prazo esgotado) não são guardadas: a próxima consulta tenta de novo
+        parcial = resposta.is_json and (resposta.get_json(silent=True) or {}).get("partial")
+        return valor, resposta.status_code == 200 and not parcial
+    
+    (corpo, status, mimetype, headers), estado = cache_respostas.obter(user_id, rota, calcular)
+    resposta = app.response_class(corpo, status=status, mimetype=mimetype, headers=headers)
+    resposta.headers["X-Cache"] = estado
+    if status == 200:
+        resposta.headers["Cache-Control"] = "private, no-cache"
+        resposta.add_etag()
+        resposta.make_conditional(request)
+    return resposta
+
+def resposta_limite_peso(e):
+    """Resposta 503 para chamadas recusadas pelo governador de peso de requisições."""
+    return jsonify({"error": str(e), "retry_after": e.retry_after}), 503, {"Retry-After": str(e.retry_after)}
+
 def sync_binance_time(client):
     """
     Sincroniza o tempo com o servidor Binance e ajusta o recvWindow.
@@ -267,7 +327,7 @@ def register():
     if not username or not password:
         return jsonify({"error": "Username and password are required"}), 400
     
-    conn = sqlite3.connect(DB_PATH)
+    conn = conectar()
     cursor = conn.cursor()
     
     try:
@@ -299,7 +359,7 @@ def login():
     if not username or not password:
         return jsonify({"error": "Username and password are required"}), 400
     
-    conn = sqlite3.connect(DB_PATH)
+    conn = conectar()
     cursor = conn.cursor()
     cursor.execute('SELECT id, password_hash FROM users WHERE username = ?', (username,))
     user = cursor.fetchone()
@@ -315,10 +375,21 @@ def login():
     else:
         return jsonify({"error": "Invalid credentials"}), 401
 
-@app.route('/api/portfolio', methods=['GET'])
-@jwt_required()
-def get_portfolio():
-    user_id = int(get_jwt_identity())
+def medias_moveis_atuais(ativo):
+    """
+    Retorna as últimas médias móveis (curta, longa) de um ativo no intervalo de 30 minutos.
+    
+    Reaproveita as médias publicadas pelos bots no candle atual (ver utils/indicator_store.py).
+    """
+    media_curta, media_longa = hub_mercado.medias_moveis(
+        ativo, Client.KLINE_INTERVAL_30MINUTE, prioridade=PRIORIDADE_PAINEL
+    )
+    media_curta = float(media_curta) if not pd.isna(media_curta) else 0
+    media_longa = float(media_longa) if not pd.isna(media_longa) else 0
+    return media_curta, media_longa
+
+def dados_portfolio(user_id):
+    """Monta a resposta de /api/portfolio (saldos, custo, retorno e médias de cada ativo habilitado)."""
     try:
         client = get_binance_client(user_id)
     except ValueError as e:
@@ -327,7 +398,7 @@ def get_portfolio():
         return jsonify({"error": f"Error creating Binance client: {str(e)}"}), 500
     
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = conectar()
         cursor = conn.cursor()
         
         # Get user's enabled assets
@@ -348,21 +419,39 @@ def get_portfolio():
         total_value = 0
         total_invested = 0
         
-        # Get account once, outside the loop
-        try:
-            account = client.get_account(recvWindow=60000)
-            if not account or "balances" not in account:
-                conn.close()
-                return jsonify({"error": "Invalid response from Binance account API"}), 500
-            balances = account.get("balances", [])
-        except Exception as e:
+        # Conta, preços e médias de cada ativo buscados ao mesmo tempo, com prazo
+        # máximo: a rota leva o tempo da chamada mais lenta, não a soma de todas
+        chamadas = [
+            lambda: client.get_account(recvWindow=60000),
+            lambda: hub_mercado.precos(ativos, prioridade=PRIORIDADE_PAINEL),
+        ] + [lambda ativo=ativo: medias_moveis_atuais(ativo) for ativo in ativos]
+        account, precos, *medias = pool_conexoes.paralelo(chamadas, prazo=PRAZO_PORTFOLIO)
+        medias_por_ativo = dict(zip(ativos, medias))
+        
+        if isinstance(account, LimitePesoExcedido):
+            conn.close()
+            return resposta_limite_peso(account)
+        if isinstance(account, Exception):
+            conn.close()
+            return jsonify({"error": f"Error getting account from Binance: {str(account)}"}), 500
+        if not account or "balances" not in account:
             conn.close()
-            return jsonify({"error": f"Error getting account from Binance: {str(e)}"}), 500
+            return jsonify({"error": "Invalid response from Binance account API"}), 500
+        balances = account.get("balances", [])
+        
+        if isinstance(precos, Exception):
+            conn.close()
+            return jsonify({"error": f"Error getting prices from Binance: {str(precos)}"}), 500
+        
+        # Custo e lucro realizado de cada ativo, mantidos pelo livro de posições
+        posicoes = posicoes_do_usuario(cursor, user_id)
+        
+        # Ativos que ficaram de fora ou sem médias (erro ou prazo esgotado)
+        unavailable = []
         
         for ativo in ativos:
             try:
-                ticker = client.get_symbol_ticker(symbol=ativo)
-                current_price = float(ticker["price"])
+                current_price = precos[ativo]
                 asset_name = ativo.replace("USDT", "")
                 
                 # Get current balance from already fetched account
@@ -374,30 +463,26 @@ def get_portfolio():
                 
                 value_usdt = quantity * current_price
                 
-                # Calculate invested amount from transactions
-                cursor.execute('''
-                    SELECT SUM(total) FROM transactions 
-                    WHERE user_id = ? AND asset = ? AND type = 'BUY'
-                ''', (user_id, ativo))
-                invested_buy = cursor.fetchone()[0] or 0
-                
-                cursor.execute('''
-                    SELECT SUM(total) FROM transactions 
-                    WHERE user_id = ? AND asset = ? AND type = 'SELL'
-                ''', (user_id, ativo))
-                invested_sell = cursor.fetchone()[0] or 0
-                
-                invested = invested_buy - invested_sell
+                # Calculate invested amount from the position ledger
+                posicao = posicoes.get(ativo)
+                if posicao is None:
+                    invested = cost_basis = realized_pnl = unrealized_pnl = 0
+                else:
+                    invested = posicao["total_bought"] - posicao["total_sold"]
+                    cost_basis = posicao["cost_basis"]
+                    realized_pnl = posicao["realized_pnl"]
+                    unrealized_pnl = lucro_nao_realizado(posicao, current_price)
                 total_invested += invested
                 total_value += value_usdt
                 
-                # Get moving averages
-                dados = obter_dados_historicos(client, ativo, Client.KLINE_INTERVAL_30MINUTE)
-                dados = calcular_medias_moveis(dados)
-                media_curta_val = dados["media_curta"].iloc[-1] if len(dados) > 0 else None
-                media_longa_val = dados["media_longa"].iloc[-1] if len(dados) > 0 else None
-                media_curta = float(media_curta_val) if media_curta_val is not None and not pd.isna(media_curta_val) else 0
-                media_longa = float(media_longa_val) if media_longa_val is not None and not pd.isna(media_longa_val) else 0
+                # Moving averages (zeros and partial=True if they did not arrive in time)
+                media = medias_por_ativo[ativo]
+                partial = isinstance(media, Exception)
+                if partial:
+                    unavailable.append({"symbol": ativo, "error": str(media) or type(media).__name__})
+                    media_curta = media_longa = 0
+                else:
+                    media_curta, media_longa = media
                 
                 return_amount = value_usdt - invested if invested > 0 else 0
                 return_percentage = ((value_usdt - invested) / invested * 100) if invested > 0 else 0
@@ -409,13 +494,18 @@ def get_portfolio():
                     "current_price": current_price,
                     "value_usdt": value_usdt,
                     "invested": invested,
+                    "cost_basis": cost_basis,
+                    "realized_pnl": realized_pnl,
+                    "unrealized_pnl": unrealized_pnl,
                     "return_amount": return_amount,
                     "return_percentage": return_percentage,
                     "media_curta": media_curta,
-                    "media_longa": media_longa
+                    "media_longa": media_longa,
+                    "partial": partial
                 })
             except Exception as e:
                 print(f"Error processing {ativo}: {e}")
+                unavailable.append({"symbol": ativo, "error": str(e)})
                 continue
         
         conn.close()
@@ -428,7 +518,9 @@ def get_portfolio():
             "total_value": total_value,
             "total_invested": total_invested,
             "total_return": total_return,
-            "total_return_percentage": total_return_percentage
+            "total_return_percentage": total_return_percentage,
+            "partial": bool(unavailable),
+            "unavailable": unavailable
         }), 200
     except Exception as e:
         import traceback
@@ -443,7 +535,7 @@ def get_transactions():
     user_id = int(get_jwt_identity())
     limit = request.args.get('limit', 50, type=int)
     
-    conn = sqlite3.connect(DB_PATH)
+    conn = conectar()
     cursor = conn.cursor()
     cursor.execute('''
         SELECT asset, type, quantity, price, total, timestamp 
@@ -467,17 +559,20 @@ def get_transactions():
     conn.close()
     return jsonify({"transactions": transactions}), 200
 
-@app.route('/api/stats', methods=['GET'])
+@app.route('/api/portfolio', methods=['GET'])
 @jwt_required()
-def get_stats():
-    user_id = int(get_jwt_identity())
+def get_portfolio():
+    return resposta_em_cache("portfolio", int(get_jwt_identity()), dados_portfolio)
+
+def dados_stats(user_id):
+    """Monta a resposta de /api/stats (saldo USDT, total investido, transações e posições ativas)."""
     try:
         client = get_binance_client(user_id)
     except ValueError:
         return jsonify({"error": "API keys not configured. Please configure your API keys first."}), 400
     
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = conectar()
         cursor = conn.cursor()
         
         # Get account balance
@@ -486,6 +581,9 @@ def get_stats():
             if not account or "balances" not in account:
                 conn.close()
                 return jsonify({"error": "Invalid response from Binance API"}), 500
+        except LimitePesoExcedido as e:
+            conn.close()
+            return resposta_limite_peso(e)
         except Exception as e:
             conn.close()
             return jsonify({"error": f"Error accessing Binance account: {str(e)}"}), 500
@@ -497,16 +595,14 @@ def get_stats():
                 usdt_balance = float(balance.get("free", 0))
                 break
         
-        # Get initial investment (first transaction total)
+        # Get total bought and transactions count from the position ledger
         cursor.execute('''
-            SELECT SUM(total) FROM transactions 
-            WHERE user_id = ? AND type = 'BUY'
+            SELECT SUM(total_bought), SUM(trades) FROM positions 
+            WHERE user_id = ?
         ''', (user_id,))
-        total_invested = cursor.fetchone()[0] or 0
-        
-        # Get total transactions count
-        cursor.execute('SELECT COUNT(*) FROM transactions WHERE user_id = ?', (user_id,))
-        total_transactions = cursor.fetchone()[0]
+        total_invested, total_transactions = cursor.fetchone()
+        total_invested = total_invested or 0
+        total_transactions = total_transactions or 0
         
         # Get user's enabled assets
         cursor.execute('''
@@ -546,12 +642,17 @@ def get_stats():
         print(f"Traceback: {error_trace}")
         return jsonify({"error": f"Internal server error: {str(e)}"}), 500
 
+@app.route('/api/stats', methods=['GET'])
+@jwt_required()
+def get_stats():
+    return resposta_em_cache("stats", int(get_jwt_identity()), dados_stats)
+
 @app.route('/api/api-keys', methods=['GET'])
 @jwt_required()
 def get_api_keys():
     """Get API keys for current user (without secret)"""
     user_id = int(get_jwt_identity())
-    conn = sqlite3.connect(DB_PATH)
+    conn = conectar()
     cursor = conn.cursor()
     cursor.execute('SELECT api_key FROM api_keys WHERE user_id = ?', (user_id,))
     result = cursor.fetchone()
@@ -580,7 +681,7 @@ def save_api_keys():
     # Validate API keys by trying to create a client
     try:
         # Criar cliente para teste
-        test_client = Client(api_key, api_secret)
+        test_client = ClienteGovernado(Client(api_key, api_secret), PRIORIDADE_PAINEL)
         
         # Sincronizar tempo antes do teste
         try:
@@ -597,6 +698,8 @@ def save_api_keys():
         # Test connection - agora com recvWindow explícito se necessário
         test_client.get_account(recvWindow=60000)
         
+    except LimitePesoExcedido as e:
+        return resposta_limite_peso(e)
     except Exception as e:
         error_msg = str(e)
         # Mensagem mais amigável para erro de timestamp
@@ -607,7 +710,7 @@ def save_api_keys():
         return jsonify({"error": f"Chaves de API inválidas: {error_msg}"}), 400
     
     # Encrypt and save
-    conn = sqlite3.connect(DB_PATH)
+    conn = conectar()
     cursor = conn.cursor()
     
     try:
@@ -618,27 +721,25 @@ def save_api_keys():
         ''', (user_id, api_key, encrypted_secret))
         conn.commit()
         conn.close()
+        cache_clientes.invalidar(user_id)
+        cache_respostas.invalidar(user_id)
         return jsonify({"message": "API keys saved successfully"}), 200
     except Exception as e:
         conn.close()
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/bot/status', methods=['GET'])
-@jwt_required()
-def get_bot_status():
-    """Get bot status for current user"""
-    user_id = int(get_jwt_identity())
+def dados_bot_status(user_id):
+    """Monta a resposta de /api/bot/status, corrigindo o banco se o bot não estiver mais agendado."""
+    # Check if the bot is actually scheduled
+    bot_is_scheduled = agendador_bots.ativo(user_id)
     
-    # Check if thread actually exists and is alive
-    thread_is_alive = user_id in bot_threads and bot_threads[user_id].is_alive()
-    
-    conn = sqlite3.connect(DB_PATH)
+    conn = conectar()
     cursor = conn.cursor()
     cursor.execute('SELECT is_running, started_at, stopped_at FROM bot_status WHERE user_id = ?', (user_id,))
     result = cursor.fetchone()
     
-    # If database says running but thread is not alive, fix the database
-    if result and bool(result[0]) and not thread_is_alive:
+    # If database says running but bot is not scheduled, fix the database
+    if result and bool(result[0]) and not bot_is_scheduled:
         cursor.execute('''
             UPDATE bot_status 
             SET is_running = 0, stopped_at = CURRENT_TIMESTAMP
@@ -648,9 +749,9 @@ def get_bot_status():
         is_running = False
     elif result:
         is_running = bool(result[0])
-        # Also verify thread is actually alive if database says running
-        if is_running and not thread_is_alive:
-            # Thread died but database wasn't updated - fix it
+        # Also verify bot is actually scheduled if database says running
+        if is_running and not bot_is_scheduled:
+            # Bot stopped but database wasn't updated - fix it
             cursor.execute('''
                 UPDATE bot_status 
                 SET is_running = 0, stopped_at = CURRENT_TIMESTAMP
@@ -663,12 +764,42 @@ def get_bot_status():
     
     conn.close()
     
+    scheduler_status = agendador_bots.status(user_id) or {}
+    
     return jsonify({
-        "is_running": is_running and thread_is_alive,  # Both must be true
+        "is_running": is_running and bot_is_scheduled,  # Both must be true
         "started_at": result[1] if result else None,
-        "stopped_at": result[2] if result else None
+        "stopped_at": result[2] if result else None,
+        "next_run_at": scheduler_status.get("next_run_at"),
+        "last_cycle_at": scheduler_status.get("last_cycle_at"),
+        "queue_lag_seconds": scheduler_status.get("queue_lag_seconds"),
+        "last_error": scheduler_status.get("error")
     }), 200
 
+@app.route('/api/bot/status', methods=['GET'])
+@jwt_required()
+def get_bot_status():
+    """Get bot status for current user"""
+    return resposta_em_cache("bot_status", int(get_jwt_identity()), dados_bot_status)
+
+@app.route('/api/bot/scheduler', methods=['GET'])
+@jwt_required()
+def get_scheduler_stats():
+    """Get scheduler load and queue lag for all bots in this instance"""
+    return jsonify(agendador_bots.estatisticas()), 200
+
+@app.route('/api/bot/rate-limit', methods=['GET'])
+@jwt_required()
+def get_rate_limit_stats():
+    """Get Binance request-weight utilisation shared by all bots and routes in this instance"""
+    return jsonify(governador_peso.estatisticas()), 200
+
+@app.route('/api/response-cache', methods=['GET'])
+@jwt_required()
+def get_response_cache_stats():
+    """Get hit/miss counters of the dashboard response cache in this instance"""
+    return jsonify(cache_respostas.estatisticas()), 200
+
 @app.route('/api/bot/start', methods=['POST'])
 @jwt_required()
 def start_bot():
@@ -676,11 +807,11 @@ def start_bot():
     user_id = int(get_jwt_identity())
     
     # Check if bot is already running
-    if user_id in bot_threads and bot_threads[user_id].is_alive():
+    if agendador_bots.ativo(user_id):
         return jsonify({"error": "Bot is already running"}), 400
     
     # Check if API keys are configured
-    conn = sqlite3.connect(DB_PATH)
+    conn = conectar()
     cursor = conn.cursor()
     cursor.execute('SELECT api_key, api_secret FROM api_keys WHERE user_id = ?', (user_id,))
     result = cursor.fetchone()
@@ -696,12 +827,8 @@ def start_bot():
         except ValueError as e:
             return jsonify({"error": "API keys encryption error. The encryption key has changed. Please reconfigure your API keys."}), 400
         
-        # Create stop flag for this user
-        stop_flag = {'stop': False}
-        bot_stop_flags[user_id] = stop_flag
-        
         # Get bot settings (check interval)
-        conn = sqlite3.connect(DB_PATH)
+        conn = conectar()
         cursor = conn.cursor()
         cursor.execute('SELECT check_interval_minutes FROM bot_settings WHERE user_id = ?', (user_id,))
         settings_result = cursor.fetchone()
@@ -723,17 +850,15 @@ def start_bot():
         
         conn.close()
         
-        # Start bot in a new thread
-        thread = threading.Thread(
-            target=run_bot_loop,
-            args=(api_key, api_secret, stop_flag, user_id, check_interval_minutes, enabled_assets),
-            daemon=True
+        # Schedule bot cycles (the session is created by the scheduler's worker pool)
+        agendador_bots.adicionar(
+            user_id,
+            lambda: SessaoBot(api_key, api_secret, user_id=user_id, enabled_assets=enabled_assets),
+            check_interval_minutes
         )
-        thread.start()
-        bot_threads[user_id] = thread
         
         # Update database
-        conn = sqlite3.connect(DB_PATH)
+        conn = conectar()
         cursor = conn.cursor()
         cursor.execute('''
             INSERT OR REPLACE INTO bot_status (user_id, is_running, started_at, stopped_at)
@@ -741,6 +866,7 @@ def start_bot():
         ''', (user_id,))
         conn.commit()
         conn.close()
+        cache_respostas.invalidar(user_id)
         
         return jsonify({"message": "Bot started successfully"}), 200
     except Exception as e:
@@ -752,49 +878,12 @@ def stop_bot():
     """Stop bot for current user"""
     user_id = int(get_jwt_identity())
     
-    # Check if thread actually exists and is alive
-    thread_is_alive = user_id in bot_threads and bot_threads[user_id].is_alive()
-    
-    # If thread doesn't exist but database says running, just fix the database
-    if not thread_is_alive:
-        # Clean up any stale references
-        if user_id in bot_threads:
-            del bot_threads[user_id]
-        if user_id in bot_stop_flags:
-            del bot_stop_flags[user_id]
-        
-        # Fix database state
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE bot_status 
-            SET is_running = 0, stopped_at = CURRENT_TIMESTAMP
-            WHERE user_id = ?
-        ''', (user_id,))
-        conn.commit()
-        conn.close()
-        return jsonify({"message": "Bot was already stopped. Status synchronized."}), 200
+    # Stop scheduled cycles (a cycle in progress skips its remaining assets)
+    was_running = agendador_bots.remover(user_id)
     
+    # Update database
     try:
-        # Set stop flag if it exists
-        if user_id in bot_stop_flags:
-            bot_stop_flags[user_id]['stop'] = True
-        
-        # Wait for thread to finish (with timeout)
-        if user_id in bot_threads:
-            thread = bot_threads[user_id]
-            if thread.is_alive():
-                thread.join(timeout=5)  # Wait up to 5 seconds
-            
-            # Remove thread reference
-            del bot_threads[user_id]
-        
-        # Remove stop flag
-        if user_id in bot_stop_flags:
-            del bot_stop_flags[user_id]
-        
-        # Update database
-        conn = sqlite3.connect(DB_PATH)
+        conn = conectar()
         cursor = conn.cursor()
         cursor.execute('''
             UPDATE bot_status 
@@ -803,36 +892,21 @@ def stop_bot():
         ''', (user_id,))
         conn.commit()
         conn.close()
-        
-        return jsonify({"message": "Bot stopped successfully"}), 200
     except Exception as e:
-        # Even if there's an error, try to fix the database state
-        try:
-            if user_id in bot_threads:
-                del bot_threads[user_id]
-            if user_id in bot_stop_flags:
-                del bot_stop_flags[user_id]
-            
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute('''
-                UPDATE bot_status 
-                SET is_running = 0, stopped_at = CURRENT_TIMESTAMP
-                WHERE user_id = ?
-            ''', (user_id,))
-            conn.commit()
-            conn.close()
-        except:
-            pass
-        
         return jsonify({"error": str(e)}), 500
+    finally:
+        cache_respostas.invalidar(user_id)
+    
+    if not was_running:
+        return jsonify({"message": "Bot was already stopped. Status synchronized."}), 200
+    return jsonify({"message": "Bot stopped successfully"}), 200
 
 @app.route('/api/bot/settings', methods=['GET'])
 @jwt_required()
 def get_bot_settings():
     """Get bot settings for current user"""
     user_id = int(get_jwt_identity())
-    conn = sqlite3.connect(DB_PATH)
+    conn = conectar()
     cursor = conn.cursor()
     cursor.execute('SELECT check_interval_minutes FROM bot_settings WHERE user_id = ?', (user_id,))
     result = cursor.fetchone()
@@ -868,7 +942,7 @@ def save_bot_settings():
         return jsonify({"error": "check_interval_minutes must be a number"}), 400
     
     # Check if bot is running
-    conn = sqlite3.connect(DB_PATH)
+    conn = conectar()
     cursor = conn.cursor()
     cursor.execute('SELECT is_running FROM bot_status WHERE user_id = ?', (user_id,))
     status_result = cursor.fetchone()
@@ -888,6 +962,7 @@ def save_bot_settings():
         ''', (user_id, check_interval_minutes))
         conn.commit()
         conn.close()
+        cache_respostas.invalidar(user_id)
         return jsonify({
             "message": "Settings saved successfully",
             "check_interval_minutes": check_interval_minutes
@@ -907,51 +982,19 @@ def sync_transactions():
         return jsonify({"error": "API keys not configured. Please configure your API keys first."}), 400
     
     try:
-        ativos = ["BNBUSDT", "BTCUSDT", "ETHUSDT", "SOLUSDT", "XRPUSDT"]
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        synced_count = 0
-        
-        for ativo in ativos:
-            try:
-                trades = client.get_my_trades(symbol=ativo, limit=500, recvWindow=60000)
-                
-                for trade in trades:
-                    cursor.execute('''
-                        SELECT id FROM transactions 
-                        WHERE user_id = ? AND asset = ? 
-                        AND quantity = ? AND price = ? AND timestamp = ?
-                    ''', (
-                        user_id,
-                        ativo,
-                        float(trade['qty']),
-                        float(trade['price']),
-                        trade['time']
-                    ))
-                    
-                    if cursor.fetchone() is None:
-                        trade_type = 'BUY' if trade['isBuyer'] else 'SELL'
-                        cursor.execute('''
-                            INSERT INTO transactions 
-                            (user_id, asset, type, quantity, price, total, timestamp)
-                            VALUES (?, ?, ?, ?, ?, ?, ?)
-                        ''', (
-                            user_id,
-                            ativo,
-                            trade_type,
-                            float(trade['qty']),
-                            float(trade['price']),
-                            float(trade['qty']) * float(trade['price']),
-                            trade['time']
-                        ))
-                        synced_count += 1
-            except Exception as e:
-                print(f"Error syncing transactions for {ativo}: {e}")
-                continue
-        
-        conn.commit()
+        conn = conectar()
+        try:
+            # Só os trades novos de cada ativo habilitado, a partir do cursor de sincronização
+            resultado = sincronizar_trades(client, conn, user_id)
+        except LimitePesoExcedido as e:
+            # Páginas já gravadas são mantidas; o restante fica para a próxima tentativa
+            conn.close()
+            cache_respostas.invalidar(user_id)
+            return resposta_limite_peso(e)
         conn.close()
+        synced_count = sum(resultado.values())
+        if synced_count:
+            cache_respostas.invalidar(user_id)
         
         return jsonify({
             "message": f"Synced {synced_count} new transactions",
@@ -960,20 +1003,6 @@ def sync_transactions():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-# Lista das 10 moedas mais comuns da Binance
-TOP_ASSETS = [
-    {"symbol": "BTCUSDT", "name": "Bitcoin (BTC)"},
-    {"symbol": "ETHUSDT", "name": "Ethereum (ETH)"},
-    {"symbol": "BNBUSDT", "name": "Binance Coin (BNB)"},
-    {"symbol": "SOLUSDT", "name": "Solana (SOL)"},
-    {"symbol": "XRPUSDT", "name": "Ripple (XRP)"},
-    {"symbol": "ADAUSDT", "name": "Cardano (ADA)"},
-    {"symbol": "DOGEUSDT", "name": "Dogecoin (DOGE)"},
-    {"symbol": "MATICUSDT", "name": "Polygon (MATIC)"},
-    {"symbol": "DOTUSDT", "name": "Polkadot (DOT)"},
-    {"symbol": "AVAXUSDT", "name": "Avalanche (AVAX)"}
-]
-
 @app.route('/api/assets', methods=['GET'])
 @jwt_required()
 def get_available_assets():
@@ -985,7 +1014,7 @@ def get_available_assets():
 def get_asset_settings():
     """Get asset settings for current user"""
     user_id = int(get_jwt_identity())
-    conn = sqlite3.connect(DB_PATH)
+    conn = conectar()
     cursor = conn.cursor()
     
     # Get user's asset settings
@@ -1025,7 +1054,7 @@ def reset_transactions():
     user_id = int(get_jwt_identity())
     
     # Check if bot is running
-    conn = sqlite3.connect(DB_PATH)
+    conn = conectar()
     cursor = conn.cursor()
     cursor.execute('SELECT is_running FROM bot_status WHERE user_id = ?', (user_id,))
     status_result = cursor.fetchone()
@@ -1040,12 +1069,14 @@ def reset_transactions():
     try:
         # Delete all transactions for this user
         cursor.execute('DELETE FROM transactions WHERE user_id = ?', (user_id,))
+        cursor.execute('DELETE FROM positions WHERE user_id = ?', (user_id,))
         
         # Also delete portfolio snapshots
         cursor.execute('DELETE FROM portfolio_snapshots WHERE user_id = ?', (user_id,))
         
         conn.commit()
         conn.close()
+        cache_respostas.invalidar(user_id)
         
         return jsonify({
             "message": "Transactions and portfolio data reset successfully. Total invested and return will be recalculated from new transactions."
@@ -1066,7 +1097,7 @@ def save_asset_settings():
         return jsonify({"error": "assets must be a list"}), 400
     
     # Check if bot is running
-    conn = sqlite3.connect(DB_PATH)
+    conn = conectar()
     cursor = conn.cursor()
     cursor.execute('SELECT is_running FROM bot_status WHERE user_id = ?', (user_id,))
     status_result = cursor.fetchone()
@@ -1106,6 +1137,7 @@ def save_asset_settings():
         
         conn.commit()
         conn.close()
+        cache_respostas.invalidar(user_id)
         return jsonify({"message": "Asset settings saved successfully"}), 200
     except Exception as e:
         conn.close()
@@ -2,94 +2,156 @@ import os
 import time
 from binance.client import Client
 from dotenv import load_dotenv
-from utils.data import obter_dados_historicos
-from Indicators.moving_averages import calcular_medias_moveis
+from Indicators.moving_averages import calcular_medias_moveis, MediasMoveisIncrementais
 from src.strategy.tranding_strategy import estrategia_trading
 from src.information.show_info import create_info_box, print_moving_averages, print_position
 from src.information.check_position import verificar_estado_inicial
+from utils.account import AccountSnapshot, ativo_base
+from utils.db import conectar
+from utils.transaction_sync import registrar_ordem
+from utils.async_client import ClientePool, pool_conexoes, pool_habilitado
+from utils.market_data import hub_mercado
+from utils.rate_limit import ClienteGovernado, PRIORIDADE_BOT
+from utils.response_cache import cache_respostas
+from utils.kline_stream import stream_klines
 
-def run_bot_loop(api_key=None, api_secret=None, stop_flag=None, user_id=None, check_interval_minutes=30, enabled_assets=None):
+class SessaoBot:
     """
-    Roda o bot em loop contínuo até que stop_flag seja definido como True.
-    
-    Args:
-        api_key: Chave API Binance
-        api_secret: Secret API Binance
-        stop_flag: Objeto compartilhado para controlar parada (dict com 'stop' key)
-        user_id: ID do usuário para logging
-        check_interval_minutes: Intervalo em minutos entre verificações das médias móveis
-        enabled_assets: Lista de ativos habilitados
+    Estado de um bot entre ciclos: cliente, ativos, valores por ativo e motores das médias.
+
+    `run_bot_loop` roda os ciclos em loop numa thread própria; o agendador
+    (utils/scheduler.py) chama `executar_ciclo` a partir de um pool de
+    trabalhadores, sem uma thread por usuário.
+
+    Parâmetros:
+        api_key, api_secret: Chaves da Binance (se omitidas, vêm do .env).
+        user_id: ID do usuário para logging e configurações por ativo.
+        enabled_assets: Lista de ativos habilitados.
+        market_data: MarketDataHub para dados públicos (padrão: hub compartilhado do processo).
+        streaming: Se True, acompanha os candles por WebSocket (padrão: variável de ambiente BOT_STREAMING).
+        client: Cliente já criado (e.g., SimulatedClient); se informado, api_key e api_secret são ignorados.
+        id_inscricao: Identificador da inscrição no hub (padrão: único por sessão).
     """
-    import sqlite3
-    import os
-    
-    # Use persistent disk path for Render or current directory for local development
-    DB_DIR = os.environ.get('RENDER') and '/opt/render/project/src' or os.path.dirname(os.path.abspath(__file__))
-    DB_PATH = os.path.join(DB_DIR, 'cryptobot.db')
-    if api_key and api_secret:
-        # Criar cliente Binance
-        client = Client(api_key, api_secret)
-    else:
-        load_dotenv()
-        api_key = os.getenv("KEY_BINANCE")
-        api_secret = os.getenv("SECRET_BINANCE")
-        # Criar cliente Binance
-        client = Client(api_key, api_secret)
-    
-    # Configurar recvWindow padrão para evitar erros de timestamp
-    # O recvWindow será passado explicitamente nas chamadas de API que precisarem
-    if hasattr(client, 'REQUEST_TIMEOUT'):
-        # A biblioteca python-binance moderna suporta configuração de timeout
-        pass
-    
-    # Sincronizar tempo com servidor Binance na inicialização
-    try:
-        server_time = client.get_server_time()
-        server_timestamp = server_time['serverTime']
-        local_timestamp = int(time.time() * 1000)
-        offset = server_timestamp - local_timestamp
-        if abs(offset) > 5000:
-            print(f"Warning: Time offset detected: {offset}ms")
-    except Exception as e:
-        print(f"Error syncing time: {e}")
-    
-    # Use enabled assets if provided, otherwise use default
-    if enabled_assets:
-        ativos = enabled_assets
-    else:
-        ativos = ["BNBUSDT", "BTCUSDT", "ETHUSDT", "SOLUSDT", "XRPUSDT"]
-    intervalo = Client.KLINE_INTERVAL_30MINUTE
-    
-    # Buscar investment_amount para cada ativo do banco de dados
-    asset_investment_amounts = {}
-    if user_id:
+
+    def __init__(self, api_key=None, api_secret=None, user_id=None, enabled_assets=None, market_data=None,
+                 streaming=None, client=None, id_inscricao=None):
+        if client is None:
+            if not (api_key and api_secret):
+                load_dotenv()
+                api_key = os.getenv("KEY_BINANCE")
+                api_secret = os.getenv("SECRET_BINANCE")
+            # Criar cliente Binance (sobre o pool de conexões compartilhado, se habilitado)
+            client = ClientePool(api_key, api_secret) if pool_habilitado() else Client(api_key, api_secret)
+            # Chamadas dos bots dividem o peso de requisições do processo com as rotas da API
+            client = ClienteGovernado(client, PRIORIDADE_BOT)
+        self.client = client
+        self.user_id = user_id
+
+        # Sincronizar tempo com servidor Binance na inicialização
         try:
-            conn = sqlite3.connect(DB_PATH)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT asset_symbol, investment_amount 
-                FROM asset_settings 
-                WHERE user_id = ?
-            ''', (user_id,))
-            for row in cursor.fetchall():
-                asset_investment_amounts[row[0]] = row[1]
-            conn.close()
+            server_time = client.get_server_time()
+            server_timestamp = server_time['serverTime']
+            local_timestamp = int(time.time() * 1000)
+            offset = server_timestamp - local_timestamp
+            if abs(offset) > 5000:
+                print(f"Warning: Time offset detected: {offset}ms")
         except Exception as e:
-            print(f"Erro ao buscar investment_amount: {e}")
-    
-    while True:
-        if stop_flag and stop_flag.get('stop', False):
-            print(f"Bot parado para usuário {user_id}")
-            break
-        
+            print(f"Error syncing time: {e}")
+
+        # Use enabled assets if provided, otherwise use default
+        if enabled_assets:
+            self.ativos = enabled_assets
+        else:
+            self.ativos = ["BNBUSDT", "BTCUSDT", "ETHUSDT", "SOLUSDT", "XRPUSDT"]
+        self.intervalo = Client.KLINE_INTERVAL_30MINUTE
+
+        # Dados públicos (klines, preços, filtros) vêm do hub compartilhado entre os bots
+        self.mercado = market_data or hub_mercado
+        self.id_inscricao = id_inscricao if id_inscricao is not None else id(self)
+        self.mercado.inscrever(self.id_inscricao, self.ativos, self.intervalo)
+
+        if streaming is None:
+            streaming = os.getenv("BOT_STREAMING", "").lower() in ("1", "true", "yes")
+        self.streaming = streaming
+        if streaming:
+            stream_klines.acompanhar(self.ativos, self.intervalo)
+
+        # Buscar investment_amount para cada ativo do banco de dados
+        self.asset_investment_amounts = {}
+        if user_id:
+            try:
+                conn = conectar()
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT asset_symbol, investment_amount 
+                    FROM asset_settings 
+                    WHERE user_id = ?
+                ''', (user_id,))
+                for row in cursor.fetchall():
+                    self.asset_investment_amounts[row[0]] = row[1]
+                conn.close()
+            except Exception as e:
+                print(f"Erro ao buscar investment_amount: {e}")
+
+        # Estado incremental das médias móveis por ativo, mantido entre ciclos
+        self.motores_medias = {}
+
+    def encerrar(self):
+        """Cancela a inscrição no hub e libera os streams acompanhados."""
+        self.mercado.cancelar_inscricao(self.id_inscricao)
+        if self.streaming:
+            stream_klines.liberar(self.ativos, self.intervalo)
+
+    def registrar_ordem(self, ativo, ordem):
+        """Grava as execuções de uma ordem do bot (posições atualizadas pelo trigger)."""
+        if self.user_id is None:
+            return
+        try:
+            conn = conectar()
+            try:
+                registrar_ordem(conn, self.user_id, ativo, ordem)
+            finally:
+                conn.close()
+            cache_respostas.invalidar(self.user_id)
+        except Exception as e:
+            print(f"Erro ao registrar ordem de {ativo}: {e}")
+
+    def executar_ciclo(self, stop_flag=None):
+        """
+        Executa um ciclo da estratégia para todos os ativos.
+
+        Parâmetros:
+            stop_flag: dict com 'stop'; se definido durante o ciclo, os ativos restantes são pulados.
+        """
+        client, ativos, mercado = self.client, self.ativos, self.mercado
         posicoes = {}
+
+        # As requisições independentes do ciclo saem ao mesmo tempo: conta,
+        # preços em lote e filtros e candles de cada ativo. O ciclo espera
+        # apenas a mais lenta; as ordens continuam sequenciais.
+        chamadas = [lambda: AccountSnapshot(client), lambda: mercado.precos(ativos)]
+        for ativo in ativos:
+            chamadas.append(lambda ativo=ativo: mercado.filtros(ativo))
+            chamadas.append(lambda ativo=ativo: mercado.dados_historicos(ativo, self.intervalo))
+        snapshot, precos, *por_ativo = pool_conexoes.paralelo(chamadas)
+        filtros_por_ativo = dict(zip(ativos, por_ativo[0::2]))
+        dados_por_ativo = dict(zip(ativos, por_ativo[1::2]))
+        
+        # Uma única consulta de conta por ciclo; atualizada após cada ordem
+        if isinstance(snapshot, Exception):
+            print(f"Erro ao obter conta: {snapshot}")
+            snapshot = None
+        
+        # Preços de todos os ativos numa única chamada, usados em todo o ciclo
+        if isinstance(precos, Exception):
+            print(f"Erro ao obter preços: {precos}")
+            precos = {}
         
         # Verificar estado inicial de cada ativo
         for ativo in ativos:
             try:
-                ticker = client.get_symbol_ticker(symbol=ativo)
-                preco_atual = float(ticker["price"])
-                is_totally_positioned, not_positioned = verificar_estado_inicial(client, ativo, preco_atual)
+                preco_atual = precos[ativo]
+                is_totally_positioned, not_positioned = verificar_estado_inicial(client, ativo, preco_atual, snapshot)
                 posicoes[ativo] = (is_totally_positioned, not_positioned)
             except Exception as e:
                 print(f"Erro ao obter posição inicial de {ativo}: {e}")
@@ -101,19 +163,20 @@ def run_bot_loop(api_key=None, api_secret=None, stop_flag=None, user_id=None, ch
                 break
                 
             try:
-                symbol_info = client.get_symbol_info(ativo)
-                ticker = client.get_symbol_ticker(symbol=ativo)
-                current_price = float(ticker["price"])
+                filtros = _resultado(filtros_por_ativo[ativo])
+                current_price = precos[ativo]
 
-                lot_size_filter = next(f for f in symbol_info["filters"] if f["filterType"] == "LOT_SIZE")
-                min_qty = float(lot_size_filter["minQty"])
-                max_qty = float(lot_size_filter["maxQty"])
-                step_size = float(lot_size_filter["stepSize"])
+                min_qty = filtros["min_qty"]
+                max_qty = filtros["max_qty"]
+                step_size = filtros["step_size"]
 
                 create_info_box(ativo, min_qty, max_qty, step_size, current_price)
 
-                dados = obter_dados_historicos(client, ativo, intervalo)
-                dados = calcular_medias_moveis(dados)
+                dados = _resultado(dados_por_ativo[ativo])
+                motor = self.motores_medias.setdefault(ativo, MediasMoveisIncrementais())
+                dados = calcular_medias_moveis(dados, motor=motor)
+                # Médias do candle atual ficam disponíveis para o dashboard sem recálculo
+                mercado.indicadores.publicar(ativo, self.intervalo, motor)
 
                 media_rapida = dados["media_curta"].iloc[-1]
                 media_lenta = dados["media_longa"].iloc[-1]
@@ -124,23 +187,24 @@ def run_bot_loop(api_key=None, api_secret=None, stop_flag=None, user_id=None, ch
                 is_totally_positioned, not_positioned = posicoes[ativo]
                 
                 # Buscar investment_amount para este ativo
-                investment_amount = asset_investment_amounts.get(ativo, 10.0)
+                investment_amount = self.asset_investment_amounts.get(ativo, 10.0)
+                
+                if snapshot is None:
+                    snapshot = AccountSnapshot(client)
                 
                 is_totally_positioned, status_message = estrategia_trading(
-                    dados, ativo, client, is_totally_positioned, not_positioned, investment_amount
+                    dados, ativo, client, is_totally_positioned, not_positioned, investment_amount, snapshot,
+                    current_price, self.registrar_ordem
                 )
                 posicoes[ativo] = (is_totally_positioned, not_positioned)
 
                 if status_message:
                     print(status_message)
 
-                conta = client.get_account(recvWindow=60000)
-                for saldo in conta["balances"]:
-                    if saldo["asset"] == ativo.split("USDT")[0]:
-                        valor_usdt = float(saldo["free"]) * current_price
-                        print(f" Valor em USDT: {valor_usdt:.2f}")
-                        print(f" Posição em {ativo.split('USDT')[0]}: {saldo['free']} {ativo.split('USDT')[0]}")
-                        break
+                saldo_livre = snapshot.saldo_livre(ativo)
+                valor_usdt = saldo_livre * current_price
+                print(f" Valor em USDT: {valor_usdt:.2f}")
+                print(f" Posição em {ativo_base(ativo)}: {saldo_livre} {ativo_base(ativo)}")
 
                 print("╚══════════════════════════════════════════════════════════════════════════╝")
                 print()
@@ -148,17 +212,66 @@ def run_bot_loop(api_key=None, api_secret=None, stop_flag=None, user_id=None, ch
             except Exception as e:
                 print(f"Erro ao processar {ativo}: {e}")
                 continue
+
+
+def _resultado(valor):
+    """Devolve o resultado de uma chamada feita em paralelo, relançando a exceção se ela falhou."""
+    if isinstance(valor, Exception):
+        raise valor
+    return valor
+
+
+def run_bot_loop(api_key=None, api_secret=None, stop_flag=None, user_id=None, check_interval_minutes=30, enabled_assets=None,
+                 market_data=None, streaming=None, client=None):
+    """
+    Roda o bot em loop contínuo até que stop_flag seja definido como True.
+    
+    Args:
+        api_key: Chave API Binance
+        api_secret: Secret API Binance
+        stop_flag: Objeto compartilhado para controlar parada (dict com 'stop' key)
+        user_id: ID do usuário para logging
+        check_interval_minutes: Intervalo em minutos entre verificações das médias móveis
+        enabled_assets: Lista de ativos habilitados
+        market_data: MarketDataHub para dados públicos (padrão: hub compartilhado do processo)
+        streaming: Se True, recebe os candles por WebSocket e roda a estratégia assim que
+            um candle fecha, mantendo check_interval_minutes como limite máximo de espera
+            (padrão: variável de ambiente BOT_STREAMING)
+        client: Cliente já criado (e.g., SimulatedClient); se informado, api_key e api_secret são ignorados
+    """
+    sessao = SessaoBot(
+        api_key, api_secret, user_id=user_id, enabled_assets=enabled_assets, market_data=market_data,
+        streaming=streaming, client=client, id_inscricao=user_id if user_id is not None else id(stop_flag),
+    )
+    ativos, intervalo, streaming = sessao.ativos, sessao.intervalo, sessao.streaming
+    
+    while True:
+        if stop_flag and stop_flag.get('stop', False):
+            print(f"Bot parado para usuário {user_id}")
+            sessao.encerrar()
+            break
+        
+        sessao.executar_ciclo(stop_flag)
         
         # Aguardar antes da próxima iteração (intervalo configurável)
         if not (stop_flag and stop_flag.get('stop', False)):
             check_interval_seconds = check_interval_minutes * 60
-            print(f"Aguardando {check_interval_minutes} minutos antes da próxima verificação...")
+            if streaming:
+                print(f"Aguardando fechamento de candle (no máximo {check_interval_minutes} minutos)...")
+                marcador = stream_klines.fechamentos(ativos, intervalo)
+            else:
+                print(f"Aguardando {check_interval_minutes} minutos antes da próxima verificação...")
             # Aguardar em intervalos de 5 segundos para verificar stop_flag frequentemente
             iterations = int(check_interval_seconds / 5)
             for _ in range(iterations):
                 if stop_flag and stop_flag.get('stop', False):
                     break
-                time.sleep(5)
+                if not streaming:
+                    time.sleep(5)
+                elif stream_klines.aguardar_fechamento(ativos, intervalo, marcador, timeout=5):
+                    # Os candles de todos os ativos fecham juntos; dar tempo aos demais eventos
+                    stream_klines.aguardar_fechamento(ativos, intervalo, marcador + len(ativos) - 1, timeout=2)
+                    break
 
 def main():
     import sqlite3
@@ -185,11 +298,18 @@ def main():
     for ativo in ativos:
         asset_investment_amounts[ativo] = 10.0
 
+    try:
+        snapshot = AccountSnapshot(client)
+        precos = hub_mercado.precos(ativos)
+    except Exception as e:
+        # Sem saldos ou preços nenhum ativo pode ser processado neste ciclo
+        print(f"Erro ao obter saldos e preços da conta: {e}")
+        return
+
     for ativo in ativos:
         try:
-            ticker = client.get_symbol_ticker(symbol=ativo)
-            preco_atual = float(ticker["price"])
-            is_totally_positioned, not_positioned = verificar_estado_inicial(client, ativo, preco_atual)
+            preco_atual = precos[ativo]
+            is_totally_positioned, not_positioned = verificar_estado_inicial(client, ativo, preco_atual, snapshot)
             posicoes[ativo] = (is_totally_positioned, not_positioned)
         except Exception as e:
             print(f"Erro ao obter posição inicial de {ativo}: {e}")
@@ -197,18 +317,16 @@ def main():
 
     for ativo in ativos:
         try:
-            symbol_info = client.get_symbol_info(ativo)
-            ticker = client.get_symbol_ticker(symbol=ativo)
-            current_price = float(ticker["price"])
+            filtros = hub_mercado.filtros(ativo)
+            current_price = precos[ativo]
 
-            lot_size_filter = next(f for f in symbol_info["filters"] if f["filterType"] == "LOT_SIZE")
-            min_qty = float(lot_size_filter["minQty"])
-            max_qty = float(lot_size_filter["maxQty"])
-            step_size = float(lot_size_filter["stepSize"])
+            min_qty = filtros["min_qty"]
+            max_qty = filtros["max_qty"]
+            step_size = filtros["step_size"]
 
             create_info_box(ativo, min_qty, max_qty, step_size, current_price)
 
-            dados = obter_dados_historicos(client, ativo, intervalo)
+            dados = hub_mercado.dados_historicos(ativo, intervalo)
             dados = calcular_medias_moveis(dados)
 
             media_rapida = dados["media_curta"].iloc[-1]
@@ -223,20 +341,18 @@ def main():
             investment_amount = asset_investment_amounts.get(ativo, 10.0)
             
             is_totally_positioned, status_message = estrategia_trading(
-                dados, ativo, client, is_totally_positioned, not_positioned, investment_amount
+                dados, ativo, client, is_totally_positioned, not_positioned, investment_amount, snapshot,
+                current_price
             )
             posicoes[ativo] = (is_totally_positioned, not_positioned)
 
             if status_message:
                 print(status_message)
 
-            conta = client.get_account(recvWindow=60000)
-            for saldo in conta["balances"]:
-                if saldo["asset"] == ativo.split("USDT")[0]:
-                    valor_usdt = float(saldo["free"]) * current_price
-                    print(f" Valor em USDT: {valor_usdt:.2f}")
-                    print(f" Posição em {ativo.split('USDT')[0]}: {saldo['free']} {ativo.split('USDT')[0]}")
-                    break
+            saldo_livre = snapshot.saldo_livre(ativo)
+            valor_usdt = saldo_livre * current_price
+            print(f" Valor em USDT: {valor_usdt:.2f}")
+            print(f" Posição em {ativo_base(ativo)}: {saldo_livre} {ativo_base(ativo)}")
 
             print("╚══════════════════════════════════════════════════════════════════════════╝")
             print()
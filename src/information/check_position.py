@@ -1,4 +1,6 @@
-def verificar_estado_inicial(client, ativo, preco_atual):
+from utils.account import AccountSnapshot
+
+def verificar_estado_inicial(client, ativo, preco_atual, snapshot=None):
     """
     Verifica o estado inicial de posição com base no saldo atual e preço do ativo.
 
@@ -6,17 +8,16 @@ def verificar_estado_inicial(client, ativo, preco_atual):
         client (Client): Cliente Binance.
         ativo (str): Símbolo do ativo (e.g., 'BNB').
         preco_atual (float): Preço atual do ativo.
+        snapshot (AccountSnapshot): Saldos já carregados no ciclo; se omitido,
+            a conta é consultada na Binance.
 
     Retorna:
         tuple: (is_totally_positioned, not_positioned)
     """
     # Obtém saldo do ativo
-    conta = client.get_account(recvWindow=60000)
-    saldo_disponivel = 0
-    for item in conta['balances']:
-        if item['asset'] == ativo.split("USDT")[0]:
-            saldo_disponivel = float(item['free'])
-            break
+    if snapshot is None:
+        snapshot = AccountSnapshot(client)
+    saldo_disponivel = snapshot.saldo_livre(ativo)
 
     # Calcula o valor atual em USDT
     valor_em_usdt = saldo_disponivel * preco_atual
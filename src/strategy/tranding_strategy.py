@@ -1,6 +1,11 @@
 import math
 
-def estrategia_trading(dados, ativo, client, is_totally_positioned, not_positioned, investment_amount=10.0):
+from utils.account import AccountSnapshot
+from utils.symbol_info import obter_filtros
+from utils.prices import obter_preco
+
+def estrategia_trading(dados, ativo, client, is_totally_positioned, not_positioned, investment_amount=10.0,
+                       snapshot=None, preco_atual=None, registrar_ordem=None):
     """
         Executa lógica de compra e venda baseada em médias móveis, sem utilizar o RSI.
 
@@ -11,6 +16,12 @@ def estrategia_trading(dados, ativo, client, is_totally_positioned, not_position
         client (Client): Cliente Binance.
         is_totally_positioned, not_positioned (bool): Estados de posição.
         investment_amount (float): Valor em USDT para investir por operação (padrão: 10.0).
+        snapshot (AccountSnapshot): Saldos do ciclo atual; é atualizado após
+            cada ordem enviada. Se omitido, a conta é consultada na Binance.
+        preco_atual (float): Preço do ativo no ciclo; se omitido, vem do
+            retrato de preços compartilhado.
+        registrar_ordem (callable): Chamado com (ativo, ordem) após cada ordem
+            executada, para gravar as execuções no banco.
 
 
     Retorna:
@@ -20,8 +31,8 @@ def estrategia_trading(dados, ativo, client, is_totally_positioned, not_position
     ultima_media_longa = dados['media_longa'].iloc[-1]
 
     # Preço atual
-    ticker = client.get_symbol_ticker(symbol=ativo)
-    preco_atual = float(ticker['price'])
+    if preco_atual is None:
+        preco_atual = obter_preco(client, ativo)
 
     # Quantidades - usar o investment_amount configurado pelo usuário
     # Se investment_amount for 0, usar valor padrão de 10 USD
@@ -29,20 +40,16 @@ def estrategia_trading(dados, ativo, client, is_totally_positioned, not_position
     quantidade_total = amount_to_invest / preco_atual
 
     # Ajustar precisão
-    symbol_info = client.get_symbol_info(ativo)
-    lot_size_filter = next(f for f in symbol_info['filters'] if f['filterType'] == 'LOT_SIZE')
-    step_size = float(lot_size_filter['stepSize'])
-    min_qty = float(lot_size_filter['minQty'])
-    precision = int(round(-math.log(step_size, 10)))
+    filtros = obter_filtros(client, ativo)
+    step_size = filtros['step_size']
+    min_qty = filtros['min_qty']
+    precision = filtros['precision']
     quantidade_total = max(round(quantidade_total, precision), min_qty)
 
     # Get current asset balance
-    conta = client.get_account(recvWindow=60000)
-    saldo_disponivel = 0
-    for item in conta['balances']:
-        if item['asset'] == ativo.split("USDT")[0]:
-            saldo_disponivel = float(item['free'])
-            break
+    if snapshot is None:
+        snapshot = AccountSnapshot(client)
+    saldo_disponivel = snapshot.saldo_livre(ativo)
 
     # Calculate current value in USD
     valor_em_usdt = saldo_disponivel * preco_atual
@@ -51,13 +58,16 @@ def estrategia_trading(dados, ativo, client, is_totally_positioned, not_position
     # Se a média curta for maior que a média longa => sinal de compra
     if ultima_media_curta > ultima_media_longa:
         if not_positioned or valor_em_usdt < 5:
-            client.create_order(
+            ordem = client.create_order(
                 symbol=ativo, 
                 side="BUY", 
                 type="MARKET", 
                 quantity=f"{quantidade_total:.{precision}f}",
                 recvWindow=60000
             )
+            if registrar_ordem is not None:
+                registrar_ordem(ativo, ordem)
+            snapshot.atualizar()
             is_totally_positioned = True
             return is_totally_positioned, " Compra realizada"
     
@@ -72,13 +82,16 @@ def estrategia_trading(dados, ativo, client, is_totally_positioned, not_position
         
         # Verificar se a quantidade está acima do mínimo
         if quantidade_venda >= min_qty:
-            client.create_order(
+            ordem = client.create_order(
                 symbol=ativo, 
                 side="SELL", 
                 type="MARKET", 
                 quantity=f"{quantidade_venda:.{precision}f}",
                 recvWindow=60000
             )
+            if registrar_ordem is not None:
+                registrar_ordem(ativo, ordem)
+            snapshot.atualizar()
             is_totally_positioned = False
             return is_totally_positioned, " Venda realizada"
         else:
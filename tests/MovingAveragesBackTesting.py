@@ -1,11 +1,92 @@
-import yfinance as yf
+import os
+import sys
+import time
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 
 def backtest_ma(data, short_window=7, long_window=40, initial_cash=20):
     """
-    Executa o backtesting da estratégia de médias móveis.
+    Executa o backtesting da estratégia de médias móveis com operações vetorizadas.
+
+    Produz o mesmo resultado de `backtest_ma_loop`: os sinais de cruzamento,
+    o estado da posição e a curva de capital são calculados sobre arrays;
+    só as operações (compras e vendas) são percorridas uma a uma.
+    
+    Parâmetros:
+    data (DataFrame): Dados históricos com a coluna 'Close'.
+    short_window (int): Período para a média móvel curta (default=7).
+    long_window (int): Período para a média móvel longa (default=40).
+    initial_cash (float): Valor inicial em dólares para investir (default=20).
+    
+    Retorna:
+    DataFrame contendo a evolução do valor da carteira para a estratégia e para o buy and hold.
+    """
+    close = np.asarray(data['Close'], dtype=float).reshape(-1)
+    ma_curta = pd.Series(close).rolling(window=short_window).mean().to_numpy()
+    ma_longa = pd.Series(close).rolling(window=long_window).mean().to_numpy()
+    return _simular_cruzamentos(close, ma_curta, ma_longa, initial_cash, data.index)
+
+def _simular_cruzamentos(close, ma_curta, ma_longa, initial_cash, index):
+    """
+    Simula a estratégia de cruzamento a partir de médias já calculadas.
+
+    Retorna:
+    DataFrame com as colunas 'Strategy' e 'BuyHold' (vazio se as médias nunca ficarem disponíveis).
+    """
+    validos = np.flatnonzero(~np.isnan(ma_longa))
+    if len(validos) == 0:
+        # Não há dados suficientes para calcular as médias
+        return pd.DataFrame()
+    start_idx = validos[0]
+    n = len(close)
+
+    # Estado desejado da posição: 1 após cruzamento de alta, 0 após cruzamento de baixa
+    diff = ma_curta - ma_longa
+    prev_diff, curr_diff = diff[start_idx:-1], diff[start_idx + 1:]
+    eventos = np.full(n - start_idx, np.nan)
+    eventos[0] = 1.0 if diff[start_idx] > 0 else 0.0
+    eventos[1:][(prev_diff <= 0) & (curr_diff > 0)] = 1.0
+    eventos[1:][(prev_diff >= 0) & (curr_diff < 0)] = 0.0
+    ultimos = np.maximum.accumulate(np.where(np.isnan(eventos), 0, np.arange(len(eventos))))
+    estado = eventos[ultimos]
+
+    # Caixa e posição só mudam nas operações; entre elas são propagados
+    mudancas = np.flatnonzero(np.diff(estado, prepend=0.0))
+    caixa_op = np.empty(len(mudancas))
+    posicao_op = np.empty(len(mudancas))
+    cash, position = float(initial_cash), 0.0
+    for k, j in enumerate(mudancas):
+        preco = close[start_idx + j]
+        if estado[j] == 1.0:
+            position = cash / preco
+            cash = 0
+        else:
+            cash = position * preco
+            position = 0
+        caixa_op[k], posicao_op[k] = cash, position
+
+    caixa = np.full(n - start_idx, float(initial_cash))
+    posicao = np.zeros(n - start_idx)
+    if len(mudancas):
+        indice_op = np.searchsorted(mudancas, np.arange(n - start_idx), side='right') - 1
+        com_op = indice_op >= 0
+        caixa[com_op] = caixa_op[indice_op[com_op]]
+        posicao[com_op] = posicao_op[indice_op[com_op]]
+
+    portfolio_values = np.full(n, float(initial_cash))
+    portfolio_values[start_idx:] = caixa + posicao * close[start_idx:]
+    buy_hold_shares = initial_cash / close[start_idx]
+    buy_hold_values = buy_hold_shares * close
+
+    result = pd.DataFrame({'Strategy': portfolio_values, 'BuyHold': buy_hold_values}, index=index)
+    result.attrs['trades'] = len(mudancas)
+    return result
+
+def backtest_ma_loop(data, short_window=7, long_window=40, initial_cash=20):
+    """
+    Executa o backtesting da estratégia de médias móveis candle a candle.
+
+    Implementação de referência de `backtest_ma`, mantida para conferência.
     
     Parâmetros:
     data (DataFrame): Dados históricos com a coluna 'Close'.
@@ -79,7 +160,45 @@ def backtest_ma(data, short_window=7, long_window=40, initial_cash=20):
     result = pd.DataFrame({'Strategy': portfolio_values, 'BuyHold': buy_hold_values}, index=df.index)
     return result
 
-def main():
+def benchmark(n=150_000):
+    """Compara tempo e resultado das versões vetorizada e em loop sobre uma série sintética."""
+    rng = np.random.default_rng(42)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    data = pd.DataFrame({'Close': close}, index=pd.date_range('2020-01-01', periods=n, freq='30min'))
+
+    inicio = time.perf_counter()
+    vetorizado = backtest_ma(data)
+    tempo_vetorizado = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    loop = backtest_ma_loop(data)
+    tempo_loop = time.perf_counter() - inicio
+
+    iguais = np.allclose(vetorizado.values, loop.values, rtol=1e-12, atol=0)
+    print(f"{n} candles | loop: {tempo_loop:.3f}s | vetorizado: {tempo_vetorizado:.4f}s | "
+          f"{tempo_loop / tempo_vetorizado:.0f}x mais rápido | resultados iguais: {iguais}")
+
+def carregar_do_store(simbolo, intervalo='30m'):
+    """
+    Carrega os candles de um símbolo do armazém local (utils/candle_store.py).
+
+    As colunas são lidas com memória mapeada, sem acesso à rede.
+
+    Retorna:
+    DataFrame com a coluna 'Close' indexado pelo horário de abertura (vazio se não houver dados).
+    """
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from utils.candle_store import store_candles
+
+    colunas = store_candles.ler(simbolo, intervalo)
+    return pd.DataFrame(
+        {'Close': colunas['preco_fechamento']},
+        index=pd.to_datetime(colunas['tempo_abertura'], unit='ms'),
+    )
+
+def _dados_yfinance():
+    import yfinance as yf
+
     # Define os ativos e seus tickers no yfinance
     tickers = {
         'XRP': 'XRP-USD',
@@ -95,8 +214,20 @@ def main():
     
     for asset, ticker in tickers.items():
         print(f"Baixando dados para {asset} ({ticker})...")
-        data = yf.download(ticker, start=start_date, end=end_date)
-        
+        yield asset, yf.download(ticker, start=start_date, end=end_date)
+
+def _dados_store(intervalo):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from utils.assets import TOP_ASSETS
+
+    for asset in TOP_ASSETS:
+        yield asset['symbol'], carregar_do_store(asset['symbol'], intervalo)
+
+def main(fonte='yfinance', intervalo='30m'):
+    import matplotlib.pyplot as plt
+
+    dados = _dados_store(intervalo) if fonte == 'store' else _dados_yfinance()
+    for asset, data in dados:
         if data.empty:
             print(f"Nenhum dado encontrado para {asset}.")
             continue
@@ -115,4 +246,12 @@ def main():
             plt.tight_layout()
             plt.show()
 if __name__ == "__main__":
-    main()
+    # python MovingAveragesBackTesting.py              -> dados diários do yfinance
+    # python MovingAveragesBackTesting.py store [30m]  -> armazém local de candles
+    # python MovingAveragesBackTesting.py benchmark    -> compara loop x vetorizado
+    if len(sys.argv) > 1 and sys.argv[1] == "benchmark":
+        benchmark()
+    elif len(sys.argv) > 1 and sys.argv[1] == "store":
+        main('store', sys.argv[2] if len(sys.argv) > 2 else '30m')
+    else:
+        main()
@@ -0,0 +1,150 @@
+"""
+Varredura de janelas das médias móveis para todos os ativos de TOP_ASSETS.
+
+Avalia todas as combinações de janela curta e longa em cada símbolo, com um
+processo por símbolo. As médias de todas as janelas saem de uma única soma
+acumulada por símbolo, e cada combinação é simulada com o motor vetorizado
+de MovingAveragesBackTesting.
+
+Uso:
+    python tests/MovingAveragesSweep.py --days 365 --shorts 3:20 --longs 20:100:5 --csv sweep.csv
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils.assets import TOP_ASSETS
+from utils.candle_store import store_candles
+from MovingAveragesBackTesting import _simular_cruzamentos
+
+
+def carregar_fechamentos(simbolo, intervalo, dias):
+    """
+    Carrega os preços de fechamento de um símbolo.
+
+    Usa o armazém local de candles quando ele tem dados do par; caso
+    contrário baixa os candles da Binance.
+
+    Retorna:
+        ndarray: Preços de fechamento em ordem cronológica.
+    """
+    colunas = store_candles.ler(simbolo, intervalo)
+    if len(colunas["tempo_abertura"]):
+        inicio = int(time.time() * 1000) - dias * 86_400_000
+        primeiro = np.searchsorted(colunas["tempo_abertura"], inicio)
+        return colunas["preco_fechamento"][primeiro:]
+
+    from binance.client import Client
+
+    client = Client()
+    candles = client.get_historical_klines(simbolo, intervalo, f"{dias} days ago UTC")
+    return np.array([float(c[4]) for c in candles])
+
+
+def medias_por_soma_acumulada(close, janelas):
+    """
+    Calcula a média móvel de várias janelas a partir de uma única soma acumulada.
+
+    Os preços são centralizados antes da soma para reduzir o erro de
+    arredondamento em séries longas.
+
+    Retorna:
+        dict: Janela -> array de médias (NaN durante o aquecimento).
+    """
+    base = close.mean() if len(close) else 0.0
+    acumulada = np.concatenate(([0.0], np.cumsum(close - base)))
+    medias = {}
+    for janela in janelas:
+        media = np.full(len(close), np.nan)
+        if janela <= len(close):
+            media[janela - 1:] = (acumulada[janela:] - acumulada[:-janela]) / janela + base
+        medias[janela] = media
+    return medias
+
+
+def avaliar_simbolo(simbolo, curtas, longas, intervalo, dias, initial_cash=20):
+    """
+    Avalia todas as combinações de janelas para um símbolo.
+
+    Retorna:
+        list: Um dicionário por combinação com retorno, drawdown e número de operações.
+    """
+    try:
+        close = carregar_fechamentos(simbolo, intervalo, dias)
+    except Exception as e:
+        print(f"Erro ao carregar {simbolo}: {e}")
+        return []
+    medias = medias_por_soma_acumulada(close, sorted(set(curtas) | set(longas)))
+    index = pd.RangeIndex(len(close))
+
+    linhas = []
+    for curta in curtas:
+        for longa in longas:
+            if curta >= longa:
+                continue
+            resultado = _simular_cruzamentos(close, medias[curta], medias[longa], initial_cash, index)
+            if resultado.empty:
+                continue
+            carteira = resultado['Strategy'].to_numpy()
+            drawdown = carteira / np.maximum.accumulate(carteira) - 1
+            linhas.append({
+                "symbol": simbolo,
+                "short": curta,
+                "long": longa,
+                "return_pct": (carteira[-1] / initial_cash - 1) * 100,
+                "max_drawdown_pct": drawdown.min() * 100,
+                "trades": resultado.attrs['trades'],
+                "buyhold_pct": (resultado['BuyHold'].iloc[-1] / initial_cash - 1) * 100,
+            })
+    return linhas
+
+
+def faixa(texto):
+    """Converte 'inicio:fim[:passo]' (fim inclusivo) numa lista de janelas."""
+    partes = [int(p) for p in texto.split(":")]
+    inicio, fim = partes[0], partes[1]
+    passo = partes[2] if len(partes) > 2 else 1
+    return list(range(inicio, fim + 1, passo))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Varredura de janelas das médias móveis")
+    parser.add_argument("--shorts", type=faixa, default=faixa("3:20"), help="janelas curtas (inicio:fim[:passo])")
+    parser.add_argument("--longs", type=faixa, default=faixa("20:100:5"), help="janelas longas (inicio:fim[:passo])")
+    parser.add_argument("--interval", default="30m")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--symbols", nargs="*", default=[a["symbol"] for a in TOP_ASSETS])
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--top", type=int, default=5, help="melhores combinações exibidas por símbolo")
+    parser.add_argument("--csv", help="salva a tabela completa neste arquivo")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futuros = [
+            executor.submit(avaliar_simbolo, s, args.shorts, args.longs, args.interval, args.days)
+            for s in args.symbols
+        ]
+        linhas = [linha for futuro in futuros for linha in futuro.result()]
+
+    if not linhas:
+        print("Nenhum resultado.")
+        return
+    tabela = pd.DataFrame(linhas).sort_values(["symbol", "return_pct"], ascending=[True, False])
+    print(f"{len(tabela)} combinações avaliadas em {time.perf_counter() - inicio:.1f}s\n")
+    print(tabela.groupby("symbol").head(args.top).to_string(index=False, float_format="%.2f"))
+    if args.csv:
+        tabela.to_csv(args.csv, index=False)
+        print(f"\nTabela completa salva em {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Replay candle a candle do código de produção da estratégia.
+
+Roda `calcular_medias_moveis`, `verificar_estado_inicial` e
+`estrategia_trading` sem alterações, como o bot faz a cada ciclo, contra a
+corretora simulada (utils/simulated_exchange.py). As médias usam o estado
+incremental (MediasMoveisIncrementais), então cada candle processa só uma
+janela de 3 linhas em vez de recalcular 1000 linhas de médias móveis.
+100 mil candles levam cerca de meio minuto, quase todo em overhead do pandas.
+
+Uso:
+    python tests/StrategyReplay.py --bars 100000
+    python tests/StrategyReplay.py --store --symbols BTCUSDT ETHUSDT
+    python tests/StrategyReplay.py --bars 2000 --check   # confere contra o cálculo completo
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from Indicators import MediasMoveisIncrementais, calcular_medias_moveis
+from src.information.check_position import verificar_estado_inicial
+from src.strategy.tranding_strategy import estrategia_trading
+from utils.account import AccountSnapshot, ativo_base
+from utils.simulated_exchange import SimulatedClient
+from MovingAveragesBackTesting import backtest_ma
+
+# Candles que o bot recebe a cada ciclo (limite de obter_dados_historicos)
+HISTORICO = 1000
+
+
+def replay(client, simbolo, barras=None, investment_amount=10.0, incremental=True):
+    """
+    Executa a estratégia de produção candle a candle para um símbolo.
+
+    Parâmetros:
+        client (SimulatedClient): Corretora simulada com a série do símbolo.
+        simbolo (str): Símbolo do ativo (e.g., 'BTCUSDT').
+        barras (int): Candles simulados após o aquecimento (padrão: a série inteira).
+        investment_amount (float): Valor em USDT por compra, como em asset_settings.
+        incremental (bool): Se False, recalcula as médias sobre 1000 candles a
+            cada passo, como sem o motor incremental (lento; usado para conferência).
+
+    Retorna:
+        DataFrame com a evolução da carteira ('Strategy') e do buy and hold
+        ('BuyHold'); attrs['trades'] tem o número de ordens enviadas.
+    """
+    quantidade = HISTORICO + barras if barras is not None else None
+    inicio, fechamentos = client.fechamentos(simbolo, quantidade)
+    if quantidade is not None:
+        fechamentos = fechamentos[:quantidade]
+    if len(fechamentos) <= HISTORICO:
+        return pd.DataFrame()
+    passo = client.passo
+    tempos_fechamento = inicio + np.arange(len(fechamentos), dtype=np.int64) * passo + passo - 1
+    base = ativo_base(simbolo)
+
+    client.definir_tempo(inicio + (HISTORICO - 1) * passo)
+    snapshot = AccountSnapshot(client)
+    motor = MediasMoveisIncrementais() if incremental else None
+    capital_inicial = client.saldos["USDT"] + client.saldos[base] * fechamentos[HISTORICO - 1]
+    carteira = np.empty(len(fechamentos) - HISTORICO + 1)
+    ordens = client.chamadas["create_order"]
+
+    # Com o motor incremental, um único DataFrame de 3 linhas é reaproveitado
+    # em todos os ciclos: só os valores das colunas de entrada são trocados
+    janela = pd.DataFrame({"preco_fechamento": np.zeros(3), "tempo_fechamento": np.zeros(3, dtype=np.int64)})
+    precos_janela = janela["preco_fechamento"].to_numpy()
+    tempos_janela = janela["tempo_fechamento"].to_numpy()
+
+    for k, i in enumerate(range(HISTORICO - 1, len(fechamentos))):
+        if incremental and k > 0:
+            precos_janela[:] = fechamentos[i - 2:i + 1]
+            tempos_janela[:] = tempos_fechamento[i - 2:i + 1]
+            dados = janela
+        else:
+            # Histórico completo, como o bot recebe de obter_dados_historicos
+            dados = pd.DataFrame({
+                "preco_fechamento": fechamentos[i + 1 - HISTORICO:i + 1],
+                "tempo_fechamento": tempos_fechamento[i + 1 - HISTORICO:i + 1],
+            })
+        dados = calcular_medias_moveis(dados, motor=motor)
+        preco_atual = fechamentos[i]
+
+        is_totally_positioned, not_positioned = verificar_estado_inicial(client, simbolo, preco_atual, snapshot)
+        estrategia_trading(
+            dados, simbolo, client, is_totally_positioned, not_positioned, investment_amount, snapshot, preco_atual
+        )
+        carteira[k] = client.saldos["USDT"] + client.saldos[base] * preco_atual
+        client.avancar()
+
+    indice = pd.to_datetime(tempos_fechamento[HISTORICO - 1:] - passo + 1, unit="ms")
+    resultado = pd.DataFrame({
+        "Strategy": carteira,
+        "BuyHold": capital_inicial / fechamentos[HISTORICO - 1] * fechamentos[HISTORICO - 1:],
+    }, index=indice)
+    resultado.attrs["trades"] = client.chamadas["create_order"] - ordens
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay da estratégia de produção contra a corretora simulada")
+    parser.add_argument("--symbols", nargs="*", default=["BTCUSDT"])
+    parser.add_argument("--bars", type=int, default=None, help="candles após o aquecimento (padrão: 100000 gerados ou a série do armazém)")
+    parser.add_argument("--store", action="store_true", help="usa os candles do armazém local em vez de preços gerados")
+    parser.add_argument("--interval", default="30m")
+    parser.add_argument("--cash", type=float, default=1000.0, help="saldo inicial em USDT")
+    parser.add_argument("--amount", type=float, default=10.0, help="investment_amount por compra")
+    parser.add_argument("--check", action="store_true", help="confere o replay incremental contra o cálculo completo")
+    args = parser.parse_args()
+
+    barras = args.bars if args.bars is not None or args.store else 100_000
+    for simbolo in args.symbols:
+        client = SimulatedClient(saldos={"USDT": args.cash}, intervalo=args.interval)
+        if args.store:
+            client.carregar_do_store(simbolo)
+
+        inicio = time.perf_counter()
+        resultado = replay(client, simbolo, barras, args.amount)
+        duracao = time.perf_counter() - inicio
+        if resultado.empty:
+            print(f"{simbolo}: candles insuficientes (mínimo {HISTORICO + 1}).")
+            continue
+
+        retorno = (resultado["Strategy"].iloc[-1] / resultado["Strategy"].iloc[0] - 1) * 100
+        buy_hold = (resultado["BuyHold"].iloc[-1] / resultado["BuyHold"].iloc[0] - 1) * 100
+        print(f"{simbolo}: {len(resultado)} candles em {duracao:.1f}s | {resultado.attrs['trades']} ordens | "
+              f"retorno {retorno:.2f}% | buy and hold {buy_hold:.2f}%")
+
+        # O backtest vetorizado simula todo o capital em cada cruzamento; o replay, o bot real
+        _, fechamentos = client.fechamentos(simbolo)
+        fechamentos = fechamentos[:len(resultado) + HISTORICO - 1]
+        # 39 candles antes do primeiro ciclo, para que as médias já existam nele
+        vetorizado = backtest_ma(pd.DataFrame({"Close": fechamentos[HISTORICO - 40:]}))
+        print(f"    backtest vetorizado (cruzamentos, capital total): {vetorizado.attrs['trades']} operações, "
+              f"retorno {(vetorizado['Strategy'].iloc[-1] / vetorizado['Strategy'].iloc[0] - 1) * 100:.2f}%")
+
+        if args.check:
+            conferencia = SimulatedClient(saldos={"USDT": args.cash}, intervalo=args.interval)
+            conferencia.definir_precos(simbolo, fechamentos, inicio=client.fechamentos(simbolo)[0])
+            inicio = time.perf_counter()
+            completo = replay(conferencia, simbolo, None, args.amount, incremental=False)
+            iguais = (completo.attrs["trades"] == resultado.attrs["trades"]
+                      and np.allclose(completo["Strategy"], resultado["Strategy"], rtol=1e-9))
+            print(f"    cálculo completo: {time.perf_counter() - inicio:.1f}s | resultados iguais: {iguais}")
+
+
+if __name__ == "__main__":
+    main()
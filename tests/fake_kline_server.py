@@ -0,0 +1,198 @@
+"""
+Servidor HTTP local que imita o endpoint REST de klines da Binance.
+
+Usado para testar o backfill de histórico sem conexão com a Binance:
+
+    python tests/fake_kline_server.py --port 8766 --days 90
+    python -m utils.backfill --base-url http://127.0.0.1:8766 --since 2024-01-01
+
+Atende /api/v3/ping, /api/v3/time e /api/v3/klines (startTime, endTime e
+limit), além de /api/v3/ticker/price, /api/v3/exchangeInfo e de uma conta
+fixa em /api/v3/account (exige X-MBX-APIKEY e assinatura), o suficiente para
+um ciclo do bot sem ordens. Os preços vêm de `preco_sintetico`, então execuções repetidas geram
+os mesmos candles. O peso usado no minuto é devolvido no cabeçalho
+X-MBX-USED-WEIGHT-1M e pedidos acima de `limite_peso` recebem HTTP 429,
+como na Binance. Também é possível omitir candles (buracos) e repetir o
+primeiro candle de cada página (duplicados) e atrasar cada resposta
+(`latencia`) para medir requisições em paralelo.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from binance.helpers import interval_to_milliseconds
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_kline_stream import preco_sintetico
+
+PESO_KLINES = 2
+SIMBOLOS = ("BNBUSDT", "BTCUSDT", "ETHUSDT", "SOLUSDT", "XRPUSDT")
+
+
+class EstadoFalso:
+    """Configuração e contadores compartilhados pelas requisições do servidor."""
+
+    def __init__(self, inicio, limite_peso=6000, buracos=(), duplicar=False, latencia=0.0):
+        self.inicio = inicio
+        self.latencia = latencia
+        self.limite_peso = limite_peso
+        self.buracos = set(buracos)
+        self.duplicar = duplicar
+        self.requisicoes = 0
+        self.rejeitadas = 0
+        self._peso = {}
+        self._lock = threading.Lock()
+
+    def consumir(self, peso):
+        """Soma o peso ao minuto corrente. Retorna (aceito, peso usado no minuto)."""
+        minuto = int(time.time() // 60)
+        with self._lock:
+            self.requisicoes += 1
+            usado = self._peso.get(minuto, 0) + peso
+            if usado > self.limite_peso:
+                self.rejeitadas += 1
+                return False, usado - peso
+            self._peso = {minuto: usado}
+            return True, usado
+
+    def klines(self, simbolo, intervalo, inicio, fim, limite):
+        passo = interval_to_milliseconds(intervalo)
+        agora = int(time.time() * 1000)
+        abertura = max(inicio, self.inicio)
+        abertura += -(abertura - self.inicio) % passo
+        fim = min(fim, agora)
+
+        candles = []
+        while abertura <= fim and len(candles) < limite:
+            if (abertura - self.inicio) // passo not in self.buracos:
+                preco = f"{preco_sintetico(abertura, passo):.8f}"
+                candles.append([
+                    abertura, preco, preco, preco, preco, "1.0", abertura + passo - 1,
+                    preco, 1, "0.5", "0", "0",
+                ])
+            abertura += passo
+        if self.duplicar and len(candles) > 1:
+            candles.insert(1, list(candles[0]))
+            candles.pop()
+        return candles
+
+    def preco(self, simbolo, intervalo="30m"):
+        passo = interval_to_milliseconds(intervalo)
+        agora = int(time.time() * 1000)
+        return f"{preco_sintetico(agora - (agora - self.inicio) % passo, passo):.8f}"
+
+    def exchange_info(self):
+        filtros = [
+            {"filterType": "PRICE_FILTER", "minPrice": "0.01", "maxPrice": "1000000.00", "tickSize": "0.01"},
+            {"filterType": "LOT_SIZE", "minQty": "0.00001", "maxQty": "9000.00000", "stepSize": "0.00001"},
+            {"filterType": "NOTIONAL", "minNotional": "5.00", "applyMinToMarket": True},
+        ]
+        return {"serverTime": int(time.time() * 1000), "symbols": [
+            {"symbol": s, "status": "TRADING", "baseAsset": s[:-4], "quoteAsset": "USDT", "filters": filtros}
+            for s in SIMBOLOS
+        ]}
+
+
+def _criar_handler(estado):
+    class Handler(BaseHTTPRequestHandler):
+        def _responder(self, status, corpo, peso_usado=0):
+            dados = json.dumps(corpo).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(dados)))
+            self.send_header("X-MBX-USED-WEIGHT-1M", str(peso_usado))
+            if status == 429:
+                self.send_header("Retry-After", str(60 - int(time.time()) % 60))
+            self.end_headers()
+            self.wfile.write(dados)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            params = {k: v[0] for k, v in parse_qs(url.query).items()}
+            peso = PESO_KLINES if url.path == "/api/v3/klines" else 1
+            aceito, usado = estado.consumir(peso)
+            if estado.latencia:
+                time.sleep(estado.latencia)
+            if not aceito:
+                self._responder(429, {"code": -1003, "msg": "Too many requests."}, usado)
+                return
+
+            if url.path == "/api/v3/ping":
+                self._responder(200, {}, usado)
+            elif url.path == "/api/v3/time":
+                self._responder(200, {"serverTime": int(time.time() * 1000)}, usado)
+            elif url.path == "/api/v3/klines":
+                candles = estado.klines(
+                    params["symbol"],
+                    params["interval"],
+                    int(params.get("startTime", 0)),
+                    int(params.get("endTime", 2 ** 62)),
+                    min(int(params.get("limit", 500)), 1000),
+                )
+                self._responder(200, candles, usado)
+            elif url.path == "/api/v3/ticker/price":
+                if "symbols" in params:
+                    simbolos = json.loads(params["symbols"])
+                    self._responder(200, [{"symbol": s, "price": estado.preco(s)} for s in simbolos], usado)
+                else:
+                    self._responder(200, {"symbol": params["symbol"], "price": estado.preco(params["symbol"])}, usado)
+            elif url.path == "/api/v3/exchangeInfo":
+                self._responder(200, estado.exchange_info(), usado)
+            elif url.path == "/api/v3/account":
+                if not self.headers.get("X-MBX-APIKEY") or "signature" not in params:
+                    self._responder(401, {"code": -2014, "msg": "API-key format invalid."}, usado)
+                    return
+                saldos = [{"asset": "USDT", "free": "1000.00000000", "locked": "0.00000000"}]
+                self._responder(200, {"canTrade": True, "accountType": "SPOT", "balances": saldos}, usado)
+            else:
+                self._responder(404, {"code": -1, "msg": "Not found."}, usado)
+
+        def log_message(self, formato, *args):
+            pass
+
+    return Handler
+
+
+def iniciar_em_thread(port=0, dias=30, **kwargs):
+    """
+    Inicia o servidor numa thread daemon (útil em testes).
+
+    Retorna:
+        tuple: (servidor, estado). A URL base é http://127.0.0.1:<servidor.server_port>.
+    """
+    agora = int(time.time() * 1000)
+    estado = EstadoFalso(inicio=agora - agora % 86_400_000 - dias * 86_400_000, **kwargs)
+    servidor = ThreadingHTTPServer(("127.0.0.1", port), _criar_handler(estado))
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, estado
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Endpoint de klines falso para testes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--days", type=int, default=30, help="dias de histórico disponíveis")
+    parser.add_argument("--weight-limit", type=int, default=6000, help="peso máximo por minuto")
+    parser.add_argument("--gaps", type=int, nargs="*", default=[], help="índices de candles omitidos")
+    parser.add_argument("--duplicate", action="store_true", help="repete o primeiro candle de cada página")
+    parser.add_argument("--latency", type=float, default=0.0, help="atraso de cada resposta em segundos")
+    args = parser.parse_args()
+
+    agora = int(time.time() * 1000)
+    estado = EstadoFalso(
+        inicio=agora - agora % 86_400_000 - args.days * 86_400_000,
+        limite_peso=args.weight_limit,
+        buracos=args.gaps,
+        duplicar=args.duplicate,
+        latencia=args.latency,
+    )
+    servidor = ThreadingHTTPServer((args.host, args.port), _criar_handler(estado))
+    print(f"Klines falsos em http://{args.host}:{args.port}")
+    servidor.serve_forever()
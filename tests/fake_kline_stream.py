@@ -0,0 +1,104 @@
+"""
+Servidor local que imita os streams de klines da Binance.
+
+Usado para testar o modo streaming do bot sem conexão com a Binance:
+
+    python tests/fake_kline_stream.py --port 8765 --close-every 10
+    BINANCE_STREAM_URL=ws://127.0.0.1:8765 BOT_STREAMING=1 python app.py
+
+Cada conexão recebe eventos no formato de stream combinado
+(/stream?streams=bnbusdt@kline_30m/...). O candle corrente é atualizado a
+cada `tick` segundos e fechado a cada `close_every` segundos, avançando o
+tempo simulado em um intervalo completo.
+"""
+import argparse
+import asyncio
+import json
+import math
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+import websockets
+from binance.helpers import interval_to_milliseconds
+
+
+def gerar_evento(simbolo, intervalo, abertura, preco, fechado):
+    """Monta um evento de kline no formato enviado pela Binance."""
+    passo = interval_to_milliseconds(intervalo)
+    preco = f"{preco:.8f}"
+    return {
+        "stream": f"{simbolo.lower()}@kline_{intervalo}",
+        "data": {
+            "e": "kline", "E": int(time.time() * 1000), "s": simbolo,
+            "k": {
+                "t": abertura, "T": abertura + passo - 1, "s": simbolo, "i": intervalo,
+                "f": 0, "L": 0, "o": preco, "c": preco, "h": preco, "l": preco,
+                "v": "1.0", "n": 1, "x": fechado, "q": preco, "V": "0.5", "Q": "0", "B": "0",
+            },
+        },
+    }
+
+
+def preco_sintetico(abertura, passo):
+    """Preço determinístico para o candle, para que os testes sejam reproduzíveis."""
+    i = abertura // passo
+    return 100 + 10 * math.sin(i / 17)
+
+
+async def _atender(conexao, *args, tick=1.0, close_every=10.0, inicio=None):
+    # websockets >= 13 expõe o caminho em conexao.request; versões antigas o passam como argumento
+    requisicao = getattr(conexao, "request", None)
+    caminho = requisicao.path if requisicao is not None else (args[0] if args else "")
+    streams = parse_qs(urlparse(caminho).query).get("streams", [""])[0].split("/")
+    pares = []
+    for stream in filter(None, streams):
+        simbolo, tipo = stream.split("@")
+        pares.append((simbolo.upper(), tipo.replace("kline_", "")))
+
+    agora = int(time.time() * 1000)
+    aberturas = {}
+    for simbolo, intervalo in pares:
+        passo = interval_to_milliseconds(intervalo)
+        aberturas[(simbolo, intervalo)] = inicio if inicio is not None else agora - agora % passo
+
+    proximo_fechamento = time.time() + close_every
+    while True:
+        await asyncio.sleep(tick)
+        fechar = time.time() >= proximo_fechamento
+        for (simbolo, intervalo), abertura in aberturas.items():
+            passo = interval_to_milliseconds(intervalo)
+            evento = gerar_evento(simbolo, intervalo, abertura, preco_sintetico(abertura, passo), fechar)
+            await conexao.send(json.dumps(evento))
+            if fechar:
+                aberturas[(simbolo, intervalo)] = abertura + passo
+        if fechar:
+            proximo_fechamento = time.time() + close_every
+
+
+async def servir(host="127.0.0.1", port=8765, tick=1.0, close_every=10.0, inicio=None):
+    """Inicia o servidor e atende conexões até ser cancelado."""
+    async def atender(conexao, *args):
+        await _atender(conexao, *args, tick=tick, close_every=close_every, inicio=inicio)
+
+    async with websockets.serve(atender, host, port):
+        await asyncio.Future()
+
+
+def iniciar_em_thread(port=8765, **kwargs):
+    """Inicia o servidor numa thread daemon (útil em testes)."""
+    thread = threading.Thread(target=lambda: asyncio.run(servir(port=port, **kwargs)), daemon=True)
+    thread.start()
+    time.sleep(0.5)
+    return thread
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream de klines falso para testes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--tick", type=float, default=1.0, help="segundos entre atualizações")
+    parser.add_argument("--close-every", type=float, default=10.0, help="segundos entre fechamentos")
+    args = parser.parse_args()
+    print(f"Stream falso em ws://{args.host}:{args.port}")
+    asyncio.run(servir(args.host, args.port, args.tick, args.close_every))
@@ -1,3 +1,4 @@
 from .data import obter_dados_historicos
+from .kline_cache import cache_klines
 
-__all__ = ["obter_dados_historicos"]
+__all__ = ["obter_dados_historicos", "cache_klines"]
@@ -0,0 +1,37 @@
+class AccountSnapshot:
+    """
+    Fotografia da conta Binance usada durante um ciclo do bot.
+
+    Faz uma única chamada a `get_account` e indexa os saldos por ativo, de
+    modo que as consultas de saldo no ciclo não chamem a API novamente.
+    Deve ser atualizada com `atualizar()` depois de cada ordem enviada.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.saldos = {}
+        self.atualizar()
+
+    def atualizar(self):
+        """Busca a conta na Binance e reconstrói o índice ativo → saldo."""
+        conta = self.client.get_account(recvWindow=60000)
+        self.saldos = {item['asset']: item for item in conta.get('balances', [])}
+        return self
+
+    def saldo_livre(self, ativo):
+        """
+        Retorna o saldo livre de um ativo.
+
+        Parâmetros:
+            ativo (str): Ativo ('BNB') ou par ('BNBUSDT'); o sufixo USDT é ignorado.
+
+        Retorna:
+            float: Saldo livre (0 se o ativo não estiver na conta).
+        """
+        item = self.saldos.get(ativo_base(ativo))
+        return float(item['free']) if item else 0.0
+
+
+def ativo_base(simbolo):
+    """Retorna o ativo base de um par USDT (e.g., 'BNBUSDT' -> 'BNB')."""
+    return simbolo.split("USDT")[0] if simbolo != "USDT" else simbolo
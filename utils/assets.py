@@ -0,0 +1,13 @@
+# Lista das 10 moedas mais comuns da Binance
+TOP_ASSETS = [
+    {"symbol": "BTCUSDT", "name": "Bitcoin (BTC)"},
+    {"symbol": "ETHUSDT", "name": "Ethereum (ETH)"},
+    {"symbol": "BNBUSDT", "name": "Binance Coin (BNB)"},
+    {"symbol": "SOLUSDT", "name": "Solana (SOL)"},
+    {"symbol": "XRPUSDT", "name": "Ripple (XRP)"},
+    {"symbol": "ADAUSDT", "name": "Cardano (ADA)"},
+    {"symbol": "DOGEUSDT", "name": "Dogecoin (DOGE)"},
+    {"symbol": "MATICUSDT", "name": "Polygon (MATIC)"},
+    {"symbol": "DOTUSDT", "name": "Polkadot (DOT)"},
+    {"symbol": "AVAXUSDT", "name": "Avalanche (AVAX)"}
+]
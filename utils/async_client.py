@@ -0,0 +1,189 @@
+"""
+Cliente Binance assíncrono sobre um pool de conexões compartilhado.
+
+Um único event loop (numa thread daemon) mantém uma `aiohttp.ClientSession`
+com um número limitado de conexões keep-alive, usada por todos os clientes
+do processo, públicos e assinados. A chave da API vai no cabeçalho de cada
+requisição em vez de ficar na sessão, então milhares de usuários dividem as
+mesmas conexões em vez de manter uma `requests.Session` cada.
+
+`ClientePool` expõe os mesmos métodos síncronos do `Client` que o bot usa
+(get_account, create_order, get_klines, ...), de modo que caches, estratégia
+e snapshots funcionam sem alteração. `PoolConexoes.paralelo` executa as
+chamadas independentes de um ciclo ao mesmo tempo: o ciclo passa a levar o
+tempo da requisição mais lenta, não a soma de todas.
+"""
+import asyncio
+import atexit
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import aiohttp
+from binance.client import AsyncClient
+
+# Chamadas do Client repassadas ao cliente assíncrono
+METODOS = (
+    "ping", "get_server_time", "get_exchange_info", "get_symbol_info", "get_klines",
+    "get_symbol_ticker", "get_account", "create_order", "get_my_trades",
+)
+
+
+def pool_habilitado():
+    """Indica se os bots devem usar o pool assíncrono (variável de ambiente BINANCE_ASYNC_POOL, padrão: sim)."""
+    return os.getenv("BINANCE_ASYNC_POOL", "1").lower() not in ("0", "false", "no")
+
+
+class PoolConexoes:
+    """
+    Event loop e sessão HTTP compartilhados, criados na primeira utilização.
+
+    Parâmetros:
+        limite (int): Máximo de conexões abertas ao mesmo tempo.
+        timeout (float): Tempo máximo de cada requisição em segundos.
+    """
+
+    def __init__(self, limite=None, timeout=30):
+        self.limite = limite or int(os.getenv("BINANCE_POOL_SIZE", "64"))
+        self.timeout = timeout
+        self._loop = None
+        self._sessao = None
+        self._thread = None
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self):
+        """Event loop do pool, iniciado numa thread daemon."""
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=loop.run_forever, daemon=True, name="binance-pool")
+                self._thread.start()
+                self._sessao = asyncio.run_coroutine_threadsafe(self._criar_sessao(), loop).result()
+                self._executor = ThreadPoolExecutor(max_workers=self.limite, thread_name_prefix="binance-pool")
+                self._loop = loop
+                atexit.register(self.fechar)
+            return self._loop
+
+    @property
+    def sessao(self):
+        """Sessão aiohttp compartilhada."""
+        self.loop
+        return self._sessao
+
+    async def _criar_sessao(self):
+        conector = aiohttp.TCPConnector(limit=self.limite, keepalive_timeout=60, ttl_dns_cache=300)
+        return aiohttp.ClientSession(connector=conector, timeout=aiohttp.ClientTimeout(total=self.timeout))
+
+    def executar(self, coro):
+        """Executa uma corrotina no loop do pool e espera o resultado."""
+        loop = self.loop
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("Chamada síncrona dentro do loop do pool; use await")
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    def paralelo(self, funcoes, prazo=None):
+        """
+        Executa chamadas independentes ao mesmo tempo.
+
+        Parâmetros:
+            funcoes (list): Funções sem argumentos (e.g., lambdas sobre os caches).
+            prazo (float): Espera máxima em segundos pelo conjunto (padrão: sem limite).
+
+        Retorna:
+            list: Resultado de cada função, na mesma ordem; exceções são
+            devolvidas no lugar do resultado, para cada chamada tratar a sua.
+            Chamadas não concluídas no prazo devolvem `TimeoutError` (as já
+            iniciadas terminam em segundo plano e o resultado é descartado).
+        """
+        self.loop
+        futuros = [self._executor.submit(funcao) for funcao in funcoes]
+        _, pendentes = wait(futuros, timeout=prazo)
+        resultados = []
+        for futuro in futuros:
+            if futuro in pendentes:
+                futuro.cancel()
+                resultados.append(TimeoutError(f"Sem resposta em {prazo:g}s"))
+                continue
+            try:
+                resultados.append(futuro.result())
+            except Exception as e:
+                resultados.append(e)
+        return resultados
+
+    def fechar(self):
+        """Fecha a sessão e para o loop."""
+        with self._lock:
+            if self._loop is None:
+                return
+            asyncio.run_coroutine_threadsafe(self._sessao.close(), self._loop).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._executor.shutdown(wait=False)
+            self._loop = self._sessao = self._thread = self._executor = None
+
+
+pool_conexoes = PoolConexoes()
+
+
+class ClienteAssincrono(AsyncClient):
+    """
+    AsyncClient da python-binance que usa a sessão do pool.
+
+    A chave da API é enviada por requisição; fechar o cliente não fecha a
+    sessão compartilhada.
+    """
+
+    def __init__(self, api_key=None, api_secret=None, pool=pool_conexoes, base_url=None):
+        self.pool = pool
+        super().__init__(api_key, api_secret, loop=pool.loop)
+        if base_url:
+            self.API_URL = base_url.rstrip("/") + "/api"
+
+    def _init_session(self):
+        return self.pool.sessao
+
+    async def _request(self, method, uri, signed, force_params=False, **kwargs):
+        kwargs = self._get_request_kwargs(method, signed, force_params, **kwargs)
+        kwargs["headers"] = self._get_headers()
+
+        async with getattr(self.session, method)(uri, **kwargs) as response:
+            self.response = response
+            return await self._handle_response(response)
+
+    async def close_connection(self):
+        pass
+
+
+class ClientePool:
+    """
+    Fachada síncrona de `ClienteAssincrono` com a interface do `Client`.
+
+    Parâmetros:
+        api_key, api_secret: Chaves da Binance (omitidas para dados públicos).
+        pool (PoolConexoes): Pool de conexões (padrão: o do processo).
+        base_url (str): Endpoint REST alternativo (padrão: variável de ambiente BINANCE_API_URL).
+    """
+
+    def __init__(self, api_key=None, api_secret=None, pool=pool_conexoes, base_url=None):
+        self.pool = pool
+        self.assincrono = ClienteAssincrono(
+            api_key, api_secret, pool=pool, base_url=base_url or os.getenv("BINANCE_API_URL")
+        )
+
+    @property
+    def response(self):
+        """Última resposta recebida (cabeçalhos como X-MBX-USED-WEIGHT-1M)."""
+        return self.assincrono.response
+
+    def __getattr__(self, nome):
+        if nome not in METODOS:
+            raise AttributeError(nome)
+        metodo = getattr(self.assincrono, nome)
+
+        def chamar(*args, **kwargs):
+            return self.pool.executar(metodo(*args, **kwargs))
+
+        chamar.__name__ = nome
+        return chamar
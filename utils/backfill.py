@@ -0,0 +1,287 @@
+"""
+Backfill do histórico de klines para o armazém local de candles.
+
+Pagina o histórico de cada símbolo a partir de uma data inicial, com um
+símbolo por thread, respeitando um orçamento de peso de requisições por
+minuto. O progresso é gravado num arquivo de checkpoint a cada página, de
+modo que uma execução interrompida continua de onde parou.
+
+Uso:
+    python -m utils.backfill --interval 30m --since 2021-01-01 --weight 1200
+    python -m utils.backfill --base-url http://127.0.0.1:8766 --symbols BTCUSDT
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from binance.client import Client
+from binance.exceptions import BinanceAPIException
+from binance.helpers import date_to_milliseconds, interval_to_milliseconds
+
+from .assets import TOP_ASSETS
+from .candle_store import store_candles
+
+# Peso do endpoint de klines na Binance (por requisição)
+PESO_KLINES = 2
+LIMITE_PAGINA = 1000
+
+
+def criar_cliente(base_url=None):
+    """
+    Cria um cliente público da Binance.
+
+    Com `base_url` (e.g., 'http://127.0.0.1:8766') as requisições REST vão
+    para esse endereço, como o servidor falso de tests/fake_kline_server.py.
+    """
+    if not base_url:
+        return Client()
+    cliente_local = type("ClienteLocal", (Client,), {"API_URL": base_url.rstrip("/") + "/api"})
+    return cliente_local()
+
+
+class OrcamentoPeso:
+    """
+    Balde de fichas com o peso de requisições permitido por minuto.
+
+    `consumir` bloqueia até haver peso disponível. O peso informado pela
+    Binance no cabeçalho X-MBX-USED-WEIGHT-1M (que inclui outros processos
+    usando o mesmo IP) também é respeitado.
+    """
+
+    def __init__(self, peso_por_minuto=1200):
+        self.peso_por_minuto = peso_por_minuto
+        self._fichas = float(peso_por_minuto)
+        self._ultimo = time.monotonic()
+        self._pausa_ate = 0.0
+        self._lock = threading.Lock()
+
+    def consumir(self, peso):
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                self._fichas = min(
+                    self.peso_por_minuto,
+                    self._fichas + (agora - self._ultimo) * self.peso_por_minuto / 60,
+                )
+                self._ultimo = agora
+                if agora >= self._pausa_ate and self._fichas >= peso:
+                    self._fichas -= peso
+                    return
+                espera = max(self._pausa_ate - agora, (peso - self._fichas) * 60 / self.peso_por_minuto)
+            time.sleep(espera)
+
+    def informar_uso(self, resposta):
+        """Pausa até o próximo minuto se o peso usado informado pela Binance esgotou o orçamento."""
+        if resposta is None:
+            return
+        usado = resposta.headers.get("X-MBX-USED-WEIGHT-1M")
+        if usado is not None and int(usado) >= self.peso_por_minuto:
+            self.pausar(60 - time.time() % 60)
+
+    def pausar(self, segundos):
+        with self._lock:
+            self._pausa_ate = max(self._pausa_ate, time.monotonic() + segundos)
+
+
+class Checkpoint:
+    """Progresso do backfill por (símbolo, intervalo), gravado em JSON."""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self._dados = {}
+        if os.path.exists(caminho):
+            with open(caminho) as arquivo:
+                self._dados = json.load(arquivo)
+
+    def obter(self, simbolo, intervalo):
+        with self._lock:
+            return dict(self._dados.get(f"{simbolo}_{intervalo}", {}))
+
+    def gravar(self, simbolo, intervalo, **campos):
+        with self._lock:
+            self._dados.setdefault(f"{simbolo}_{intervalo}", {}).update(campos)
+            os.makedirs(os.path.dirname(os.path.abspath(self.caminho)), exist_ok=True)
+            # Escreve num arquivo temporário e troca, para não corromper o checkpoint se o processo cair
+            temporario = f"{self.caminho}.tmp"
+            with open(temporario, "w") as arquivo:
+                json.dump(self._dados, arquivo, indent=2)
+            os.replace(temporario, self.caminho)
+
+
+def verificar_serie(aberturas, passo):
+    """
+    Procura buracos, duplicados e candles fora de ordem numa série de aberturas.
+
+    Parâmetros:
+        aberturas (array): Horários de abertura (ms) em ordem de gravação.
+        passo (int): Duração do intervalo em ms.
+
+    Retorna:
+        dict: 'buracos' (lista de [primeira, última] abertura ausente),
+        'duplicados' e 'fora_de_ordem'.
+    """
+    aberturas = np.asarray(aberturas, dtype=np.int64)
+    diferencas = np.diff(aberturas)
+    indices = np.flatnonzero(diferencas > passo)
+    return {
+        "buracos": [[int(aberturas[i] + passo), int(aberturas[i + 1] - passo)] for i in indices],
+        "duplicados": int(np.count_nonzero(diferencas == 0)),
+        "fora_de_ordem": int(np.count_nonzero(diferencas < 0)),
+    }
+
+
+class Backfill:
+    """
+    Preenche o armazém de candles com o histórico completo de vários símbolos.
+
+    Parâmetros:
+        intervalo (str): Intervalo dos candles.
+        inicio (int): Abertura (ms) a partir da qual baixar o histórico.
+        store (CandleStore): Armazém de destino.
+        checkpoint (str): Caminho do arquivo de checkpoint.
+        peso_por_minuto (int): Orçamento de peso compartilhado por todas as threads.
+        trabalhadores (int): Número de símbolos baixados em paralelo.
+        base_url (str): Endereço REST alternativo (ver `criar_cliente`).
+    """
+
+    def __init__(self, intervalo, inicio, store=store_candles, checkpoint=None,
+                 peso_por_minuto=1200, trabalhadores=4, base_url=None):
+        self.intervalo = intervalo
+        self.passo = interval_to_milliseconds(intervalo)
+        self.inicio = inicio
+        self.store = store
+        self.checkpoint = Checkpoint(checkpoint or os.path.join(store.diretorio, "backfill.json"))
+        self.orcamento = OrcamentoPeso(peso_por_minuto)
+        self.trabalhadores = trabalhadores
+        self.base_url = base_url
+        self._parar = threading.Event()
+
+    def parar(self):
+        """Interrompe o backfill ao fim da página corrente de cada símbolo."""
+        self._parar.set()
+
+    def executar(self, simbolos):
+        """
+        Baixa o histórico de todos os símbolos.
+
+        Retorna:
+            dict: Relatório por símbolo com candles gravados, páginas,
+            duplicados descartados e buracos encontrados.
+        """
+        executor = ThreadPoolExecutor(max_workers=self.trabalhadores)
+        futuros = {s: executor.submit(self._executar_simbolo, s) for s in simbolos}
+        relatorio = {}
+        try:
+            for simbolo, futuro in futuros.items():
+                try:
+                    relatorio[simbolo] = futuro.result()
+                except Exception as e:
+                    relatorio[simbolo] = {"erro": str(e)}
+        except KeyboardInterrupt:
+            self.parar()
+            raise
+        finally:
+            executor.shutdown(wait=True)
+        return relatorio
+
+    def _pedir_pagina(self, client, simbolo, inicio, tentativas=5):
+        for tentativa in range(tentativas):
+            self.orcamento.consumir(PESO_KLINES)
+            try:
+                candles = client.get_klines(
+                    symbol=simbolo, interval=self.intervalo, startTime=inicio, limit=LIMITE_PAGINA
+                )
+                self.orcamento.informar_uso(client.response)
+                return candles
+            except BinanceAPIException as e:
+                if e.status_code not in (418, 429) or tentativa == tentativas - 1:
+                    raise
+                espera = e.response.headers.get("Retry-After") if e.response is not None else None
+                self.orcamento.pausar(float(espera) if espera else 60)
+
+    def _executar_simbolo(self, simbolo):
+        client = criar_cliente(self.base_url)
+        progresso = self.checkpoint.obter(simbolo, self.intervalo)
+        ultimo_armazenado = self.store.ultimo_tempo_abertura(simbolo, self.intervalo)
+        proximo = max(
+            self.inicio,
+            progresso.get("proximo", self.inicio),
+            ultimo_armazenado + self.passo if ultimo_armazenado is not None else self.inicio,
+        )
+        anterior = ultimo_armazenado
+        relatorio = {"candles": 0, "paginas": 0, "duplicados": 0, "buracos": list(progresso.get("buracos", []))}
+
+        while not self._parar.is_set():
+            candles = self._pedir_pagina(client, simbolo, proximo)
+            relatorio["paginas"] += 1
+            if not candles:
+                break
+
+            agora = int(time.time() * 1000)
+            fechados = [c for c in candles if c[6] < agora]
+            aberturas = [c[0] for c in fechados]
+            if anterior is not None:
+                aberturas = [anterior] + aberturas
+            verificacao = verificar_serie(aberturas, self.passo)
+            relatorio["duplicados"] += verificacao["duplicados"] + verificacao["fora_de_ordem"]
+            relatorio["buracos"].extend(verificacao["buracos"])
+
+            gravados = self.store.anexar(simbolo, self.intervalo, fechados)
+            relatorio["candles"] += gravados
+            if fechados:
+                anterior = max(anterior or 0, max(c[0] for c in fechados))
+                proximo = anterior + self.passo
+            self.checkpoint.gravar(
+                simbolo, self.intervalo, proximo=proximo, buracos=relatorio["buracos"], concluido=False
+            )
+            # Página incompleta ou candle ainda aberto: chegou ao presente
+            if len(candles) < LIMITE_PAGINA or len(fechados) < len(candles):
+                self.checkpoint.gravar(simbolo, self.intervalo, concluido=True)
+                break
+        return relatorio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill do histórico de klines para o armazém local")
+    parser.add_argument("--symbols", nargs="*", default=[a["symbol"] for a in TOP_ASSETS])
+    parser.add_argument("--interval", default="30m")
+    parser.add_argument("--since", default="2020-01-01", help="data inicial (e.g., '2021-01-01' ou '90 days ago UTC')")
+    parser.add_argument("--weight", type=int, default=1200, help="peso máximo de requisições por minuto")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--checkpoint", help="arquivo de checkpoint (padrão: <armazém>/backfill.json)")
+    parser.add_argument("--base-url", default=os.getenv("BINANCE_API_URL"), help="endpoint REST alternativo")
+    args = parser.parse_args()
+
+    backfill = Backfill(
+        args.interval,
+        date_to_milliseconds(args.since),
+        checkpoint=args.checkpoint,
+        peso_por_minuto=args.weight,
+        trabalhadores=args.workers,
+        base_url=args.base_url,
+    )
+    inicio = time.perf_counter()
+    try:
+        relatorio = backfill.executar(args.symbols)
+    except KeyboardInterrupt:
+        print("Interrompido; execute novamente para continuar do checkpoint.")
+        return
+
+    for simbolo, r in relatorio.items():
+        if "erro" in r:
+            print(f"{simbolo}: erro - {r['erro']}")
+            continue
+        print(f"{simbolo}: {r['candles']} candles em {r['paginas']} páginas, "
+              f"{r['duplicados']} duplicados descartados, {len(r['buracos'])} buracos")
+        for primeira, ultima in r["buracos"]:
+            print(f"    buraco de {primeira} a {ultima} ({(ultima - primeira) // backfill.passo + 1} candles)")
+    print(f"Concluído em {time.perf_counter() - inicio:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
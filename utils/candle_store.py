@@ -0,0 +1,157 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+DIRETORIO_PADRAO = os.getenv(
+    "CANDLE_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "candles"),
+)
+
+# Uma coluna por arquivo, com largura fixa (little-endian)
+COLUNAS = [
+    ("tempo_abertura", "<i8"),
+    ("preco_abertura", "<f8"),
+    ("preco_maximo", "<f8"),
+    ("preco_minimo", "<f8"),
+    ("preco_fechamento", "<f8"),
+    ("volume", "<f8"),
+    ("tempo_fechamento", "<i8"),
+    ("numero_trades", "<i8"),
+]
+# Posição de cada coluna no candle retornado pela API de klines
+INDICES_KLINE = [0, 1, 2, 3, 4, 5, 6, 8]
+
+
+class CandleStore:
+    """
+    Armazém local de candles em formato colunar, um diretório por (símbolo, intervalo).
+
+    Cada coluna é um arquivo binário de largura fixa, lido com memória
+    mapeada (sem cópia) e estendido apenas com candles posteriores ao último
+    armazenado.
+    """
+
+    def __init__(self, diretorio=DIRETORIO_PADRAO):
+        self.diretorio = diretorio
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def caminho(self, simbolo, intervalo):
+        """Diretório dos arquivos de um par (símbolo, intervalo)."""
+        return os.path.join(self.diretorio, f"{simbolo}_{intervalo}")
+
+    def _arquivo(self, simbolo, intervalo, coluna):
+        return os.path.join(self.caminho(simbolo, intervalo), f"{coluna}.bin")
+
+    def _lock_do_par(self, simbolo, intervalo):
+        with self._lock:
+            return self._locks.setdefault((simbolo, intervalo), threading.Lock())
+
+    def _tamanho(self, simbolo, intervalo):
+        # Colunas com tamanhos diferentes (escrita interrompida) são lidas até o menor
+        tamanhos = []
+        for coluna, dtype in COLUNAS:
+            arquivo = self._arquivo(simbolo, intervalo, coluna)
+            if not os.path.exists(arquivo):
+                return 0
+            tamanhos.append(os.path.getsize(arquivo) // np.dtype(dtype).itemsize)
+        return min(tamanhos)
+
+    def ler(self, simbolo, intervalo):
+        """
+        Abre as colunas de um par com memória mapeada.
+
+        Parâmetros:
+            simbolo (str): Símbolo do ativo (e.g., 'BNBUSDT').
+            intervalo (str): Intervalo dos candles.
+
+        Retorna:
+            dict: Coluna -> array somente leitura (vazio se não houver dados).
+        """
+        n = self._tamanho(simbolo, intervalo)
+        colunas = {}
+        for coluna, dtype in COLUNAS:
+            if n == 0:
+                colunas[coluna] = np.empty(0, dtype=dtype)
+            else:
+                colunas[coluna] = np.memmap(self._arquivo(simbolo, intervalo, coluna), dtype=dtype, mode="r", shape=(n,))
+        return colunas
+
+    def dataframe(self, simbolo, intervalo):
+        """Carrega um par como DataFrame indexado pelo horário de abertura."""
+        colunas = self.ler(simbolo, intervalo)
+        dados = pd.DataFrame({c: colunas[c] for c, _ in COLUNAS[1:]})
+        dados.index = pd.to_datetime(colunas["tempo_abertura"], unit="ms")
+        return dados
+
+    def ultimo_tempo_abertura(self, simbolo, intervalo):
+        """Horário de abertura (ms) do último candle armazenado, ou None."""
+        abertura = self.ler(simbolo, intervalo)["tempo_abertura"]
+        return int(abertura[-1]) if len(abertura) else None
+
+    def anexar(self, simbolo, intervalo, candles):
+        """
+        Acrescenta candles ao final do armazém.
+
+        Candles com abertura igual ou anterior ao último armazenado são
+        ignorados, assim como duplicados dentro do próprio lote.
+
+        Parâmetros:
+            candles (list): Candles fechados no formato da API de klines.
+
+        Retorna:
+            int: Quantidade de candles gravados.
+        """
+        if not candles:
+            return 0
+        with self._lock_do_par(simbolo, intervalo):
+            os.makedirs(self.caminho(simbolo, intervalo), exist_ok=True)
+            n = self._tamanho(simbolo, intervalo)
+            self._truncar(simbolo, intervalo, n)
+            ultimo = self.ultimo_tempo_abertura(simbolo, intervalo) if n else None
+
+            matriz = np.array([[float(c[i]) for i in INDICES_KLINE] for c in candles])
+            aberturas = matriz[:, 0].astype("<i8")
+            _, primeiros = np.unique(aberturas, return_index=True)
+            matriz, aberturas = matriz[primeiros], aberturas[primeiros]
+            if ultimo is not None:
+                novos = aberturas > ultimo
+                matriz, aberturas = matriz[novos], aberturas[novos]
+            if len(matriz) == 0:
+                return 0
+
+            for j, (coluna, dtype) in enumerate(COLUNAS):
+                with open(self._arquivo(simbolo, intervalo, coluna), "ab") as arquivo:
+                    arquivo.write(matriz[:, j].astype(dtype).tobytes())
+            return len(matriz)
+
+    def _truncar(self, simbolo, intervalo, n):
+        for coluna, dtype in COLUNAS:
+            arquivo = self._arquivo(simbolo, intervalo, coluna)
+            tamanho = n * np.dtype(dtype).itemsize
+            if os.path.exists(arquivo) and os.path.getsize(arquivo) != tamanho:
+                with open(arquivo, "r+b") as f:
+                    f.truncate(tamanho)
+
+    def candles(self, simbolo, intervalo, quantidade):
+        """
+        Retorna os últimos candles no formato da API de klines.
+
+        Usado para aquecer o cache de klines sem baixar o histórico completo.
+        """
+        colunas = self.ler(simbolo, intervalo)
+        inicio = max(len(colunas["tempo_abertura"]) - quantidade, 0)
+        fatia = {c: colunas[c][inicio:] for c, _ in COLUNAS}
+        return [
+            [
+                int(fatia["tempo_abertura"][i]), str(fatia["preco_abertura"][i]), str(fatia["preco_maximo"][i]),
+                str(fatia["preco_minimo"][i]), str(fatia["preco_fechamento"][i]), str(fatia["volume"][i]),
+                int(fatia["tempo_fechamento"][i]), "0", int(fatia["numero_trades"][i]), "0", "0", "0",
+            ]
+            for i in range(len(fatia["tempo_abertura"]))
+        ]
+
+
+store_candles = CandleStore()
@@ -0,0 +1,119 @@
+"""
+Clientes Binance autenticados prontos para uso, por usuário.
+
+Criar o cliente de um usuário custa uma leitura de `api_keys`, a
+descriptografia do secret e uma sessão HTTP nova (com handshake TLS). As
+rotas do dashboard reaproveitam aqui o cliente já criado: o cache guarda até
+`capacidade` clientes, descarta o usado há mais tempo quando enche e os que
+ficaram ociosos além de `ocioso` segundos. Salvar novas chaves chama
+`invalidar(user_id)`. O cache é do processo: com vários workers, um worker
+que não recebeu a troca de chaves usa o cliente antigo até ele ficar ocioso.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Cliente:
+    def __init__(self, cliente):
+        self.cliente = cliente
+        self.usado_em = time.monotonic()
+
+
+class CacheClientes:
+    """
+    Cache LRU de clientes por usuário, com expiração por ociosidade.
+
+    Parâmetros:
+        capacidade (int): Máximo de clientes guardados (padrão: BINANCE_CLIENT_CACHE_SIZE ou 256).
+        ocioso (float): Segundos sem uso até o cliente ser descartado
+            (padrão: BINANCE_CLIENT_IDLE_SECONDS ou 900).
+    """
+
+    def __init__(self, capacidade=None, ocioso=None):
+        self.capacidade = capacidade or int(os.getenv("BINANCE_CLIENT_CACHE_SIZE", "256"))
+        self.ocioso = float(os.getenv("BINANCE_CLIENT_IDLE_SECONDS", "900")) if ocioso is None else ocioso
+        self._clientes = OrderedDict()
+        self._versoes = {}
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.criados = 0
+        self.descartados = 0
+
+    def obter(self, user_id, criar):
+        """
+        Retorna o cliente do usuário, criando-o se não estiver no cache.
+
+        Parâmetros:
+            user_id: ID do usuário.
+            criar (callable): Sem argumentos; cria o cliente (erros não são guardados).
+
+        Retorna:
+            Cliente Binance do usuário.
+        """
+        with self._lock:
+            descartar = self._expirar()
+            entrada = self._clientes.get(user_id)
+            if entrada is not None:
+                entrada.usado_em = time.monotonic()
+                self._clientes.move_to_end(user_id)
+                self.acertos += 1
+            versao = self._versoes.get(user_id, 0)
+        self._fechar(descartar)
+        if entrada is not None:
+            return entrada.cliente
+
+        cliente = criar()
+        with self._lock:
+            atual = self._clientes.get(user_id)
+            if self._versoes.get(user_id, 0) != versao:
+                # Chaves trocadas durante a criação: usa o cliente nesta requisição sem guardá-lo
+                descartar = []
+            elif atual is not None:
+                # Outra requisição criou o cliente ao mesmo tempo: fica o já guardado
+                descartar = [cliente]
+                cliente = atual.cliente
+            else:
+                self._clientes[user_id] = _Cliente(cliente)
+                self.criados += 1
+                descartar = []
+                while len(self._clientes) > self.capacidade:
+                    descartar.append(self._clientes.popitem(last=False)[1].cliente)
+                    self.descartados += 1
+        self._fechar(descartar)
+        return cliente
+
+    def invalidar(self, user_id):
+        """Descarta o cliente do usuário (e.g., após salvar novas chaves)."""
+        with self._lock:
+            self._versoes[user_id] = self._versoes.get(user_id, 0) + 1
+            entrada = self._clientes.pop(user_id, None)
+        if entrada is not None:
+            self._fechar([entrada.cliente])
+
+    def _expirar(self):
+        """Remove os clientes ociosos (os mais antigos ficam no início) e os retorna."""
+        limite = time.monotonic() - self.ocioso
+        expirados = []
+        while self._clientes:
+            user_id, entrada = next(iter(self._clientes.items()))
+            if entrada.usado_em > limite:
+                break
+            del self._clientes[user_id]
+            expirados.append(entrada.cliente)
+            self.descartados += 1
+        return expirados
+
+    @staticmethod
+    def _fechar(clientes):
+        for cliente in clientes:
+            fechar = getattr(cliente, "close_connection", None)
+            if fechar is not None:
+                try:
+                    fechar()
+                except Exception:
+                    pass
+
+
+cache_clientes = CacheClientes()
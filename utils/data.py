@@ -1,20 +1,40 @@
 import pandas as pd
 from binance.client import Client
+from .kline_cache import cache_klines
 
-def obter_dados_historicos(client, simbolo, intervalo, limite=1000):
+def obter_dados_historicos(client, simbolo, intervalo, limite=1000, usar_cache=True):
     """
     Obtém dados históricos de preços.
 
+    Por padrão os candles passam pelo `cache_klines`, que só baixa da
+    Binance os candles novos desde a última chamada.
+
     Parâmetros:
         client (Client): Cliente Binance.
         simbolo (str): Símbolo do ativo (e.g., 'BNBUSDT').
         intervalo (str): Intervalo dos candles.
         limite (int): Número de registros a serem obtidos.
+        usar_cache (bool): Se False, baixa o histórico completo sem cache.
 
     Retorna:
         DataFrame: Dados de preços.
     """
-    candles = client.get_klines(symbol=simbolo, interval=intervalo, limit=limite)
+    if usar_cache:
+        candles = cache_klines.obter(client, simbolo, intervalo, limite)
+    else:
+        candles = client.get_klines(symbol=simbolo, interval=intervalo, limit=limite)
+    return candles_para_dataframe(candles)
+
+def candles_para_dataframe(candles):
+    """
+    Converte candles brutos da API de klines no DataFrame usado pelo bot.
+
+    Parâmetros:
+        candles (list): Candles no formato retornado por `get_klines`.
+
+    Retorna:
+        DataFrame: Colunas 'preco_fechamento' e 'tempo_fechamento'.
+    """
     dados = pd.DataFrame(candles, columns=[
         'tempo_abertura', 'preco_abertura', 'preco_maximo', 'preco_minimo',
         'preco_fechamento', 'volume', 'tempo_fechamento', 'moedas_negociadas',
@@ -0,0 +1,155 @@
+"""
+Acesso compartilhado ao banco SQLite.
+
+Cada thread reaproveita a mesma conexão entre requisições e ciclos do bot, em
+vez de abrir uma conexão nova a cada rota. As conexões usam WAL (leitores não
+bloqueiam o escritor), `synchronous=NORMAL`, espera em caso de banco ocupado
+e o cache de statements preparados do módulo sqlite3, que só é útil quando a
+conexão sobrevive à rota. O `close()` das conexões devolvidas por `conectar`
+apenas as libera: o código existente continua chamando `conn.close()`.
+
+Uma conexão abandonada sem `close()` (e.g., rota que retorna no meio de um
+erro) é liberada quando o objeto é coletado, e a API chama `liberar_thread`
+ao fim de cada requisição: escritas não confirmadas são desfeitas, como
+aconteceria ao descartar uma conexão própria, em vez de serem confirmadas
+pelo próximo `commit()` da mesma thread.
+"""
+import os
+import sqlite3
+import threading
+import weakref
+from collections import deque
+
+# Use persistent disk path for Render or current directory for local development
+DB_DIR = os.environ.get('RENDER') and '/opt/render/project/src' or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(DB_DIR, 'cryptobot.db')
+
+
+class _ConexaoDaThread:
+    """Conexão de uma thread e quantos usos dela estão abertos."""
+
+    def __init__(self, conexao):
+        self.conexao = conexao
+        self.usos = 0
+        # Incrementada por `liberar_thread`; usos de gerações anteriores não contam mais
+        self.geracao = 0
+
+
+class ConexaoCompartilhada:
+    """
+    Conexão devolvida por `BancoDados.conectar`, com a interface do sqlite3.Connection.
+
+    `close()` libera o uso; quando o último uso da thread é liberado, uma
+    transação não confirmada é desfeita, como aconteceria ao fechar a conexão.
+    """
+
+    def __init__(self, banco, da_thread):
+        self._banco = banco
+        self._da_thread = da_thread
+        self._fechada = False
+        # Libera o uso também quando o objeto é coletado sem close()
+        self._liberar = weakref.finalize(self, banco._liberar, da_thread, da_thread.geracao)
+
+    def __getattr__(self, nome):
+        if self._fechada:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        return getattr(self._da_thread.conexao, nome)
+
+    def __enter__(self):
+        return self._da_thread.conexao.__enter__()
+
+    def __exit__(self, *excecao):
+        return self._da_thread.conexao.__exit__(*excecao)
+
+    def close(self):
+        if not self._fechada:
+            self._fechada = True
+            self._liberar()
+
+
+class BancoDados:
+    """
+    Conexões SQLite por thread, reaproveitadas entre usos.
+
+    Parâmetros:
+        caminho (str): Arquivo do banco (padrão: cryptobot.db na raiz do projeto ou no disco do Render).
+        timeout (float): Espera máxima em segundos quando o banco está ocupado.
+        cached_statements (int): Statements preparados mantidos por conexão.
+        conexoes_livres (int): Conexões de threads encerradas guardadas para reuso.
+    """
+
+    def __init__(self, caminho=DB_PATH, timeout=30, cached_statements=256, conexoes_livres=32):
+        self.caminho = caminho
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self.conexoes_livres = conexoes_livres
+        self._local = threading.local()
+        self._livres = deque()
+        self._lock = threading.Lock()
+        self.criadas = 0
+
+    def conectar(self):
+        """Retorna a conexão da thread atual (criada no primeiro uso)."""
+        da_thread = getattr(self._local, "conexao", None)
+        if da_thread is None:
+            da_thread = _ConexaoDaThread(self._obter_conexao())
+            # Quando a thread termina, a conexão volta para as livres
+            weakref.finalize(da_thread, self._devolver, da_thread.conexao)
+            self._local.conexao = da_thread
+        if da_thread.usos == 0:
+            da_thread.conexao.row_factory = None
+        da_thread.usos += 1
+        return ConexaoCompartilhada(self, da_thread)
+
+    def _obter_conexao(self):
+        with self._lock:
+            if self._livres:
+                return self._livres.pop()
+            self.criadas += 1
+        conexao = sqlite3.connect(
+            self.caminho, timeout=self.timeout, cached_statements=self.cached_statements,
+            check_same_thread=False,
+        )
+        conexao.execute("PRAGMA journal_mode=WAL")
+        conexao.execute("PRAGMA synchronous=NORMAL")
+        conexao.execute(f"PRAGMA busy_timeout={int(self.timeout * 1000)}")
+        return conexao
+
+    def _liberar(self, da_thread, geracao):
+        if geracao != da_thread.geracao:
+            return
+        da_thread.usos -= 1
+        if da_thread.usos == 0 and da_thread.conexao.in_transaction:
+            da_thread.conexao.rollback()
+
+    def liberar_thread(self):
+        """
+        Encerra todos os usos da conexão da thread atual, desfazendo a transação aberta.
+
+        Chamado ao fim de cada requisição da API, para que escritas de uma rota
+        que retornou sem `close()` não vazem para a próxima.
+        """
+        da_thread = getattr(self._local, "conexao", None)
+        if da_thread is None:
+            return
+        da_thread.geracao += 1
+        da_thread.usos = 0
+        if da_thread.conexao.in_transaction:
+            da_thread.conexao.rollback()
+
+    def _devolver(self, conexao):
+        if conexao.in_transaction:
+            conexao.rollback()
+        with self._lock:
+            if len(self._livres) < self.conexoes_livres:
+                self._livres.append(conexao)
+                return
+        conexao.close()
+
+
+banco = BancoDados()
+
+
+def conectar():
+    """Atalho para `banco.conectar()`."""
+    return banco.conectar()
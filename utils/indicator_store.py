@@ -0,0 +1,122 @@
+"""
+Médias móveis compartilhadas entre os bots e a API, uma vez por candle.
+
+Cada entrada é chaveada por (símbolo, intervalo, janela curta, janela longa,
+horário do último candle fechado) e guarda, para cada janela, a soma dos
+`janela - 1` fechamentos mais recentes. A média com o candle ainda aberto é
+montada na leitura somando o preço atual, então o valor continua exato
+enquanto o candle se move, sem recalcular a janela.
+
+Cada `MarketDataHub` tem o seu store (`hub_mercado.indicadores` é o do
+processo). Os bots publicam o estado das suas `MediasMoveisIncrementais` ao
+fim de cada cálculo; o dashboard lê daqui e só calcula quando nenhum bot
+publicou o par (uma única vez por candle, mesmo com leituras simultâneas).
+"""
+import math
+import threading
+from collections import OrderedDict
+
+
+class IndicatorStore:
+    """
+    Somas parciais das médias móveis por par e candle.
+
+    Parâmetros:
+        max_entradas (int): Máximo de entradas guardadas (as menos usadas saem primeiro).
+    """
+
+    def __init__(self, max_entradas=4096):
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()
+        self._locks = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.publicadas = 0
+
+    def _lock_da_chave(self, chave):
+        with self._lock:
+            if chave not in self._locks:
+                self._locks[chave] = threading.Lock()
+            return self._locks[chave]
+
+    def _guardar(self, chave, somas):
+        with self._lock:
+            self._entradas[chave] = somas
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.max_entradas:
+                antiga, _ = self._entradas.popitem(last=False)
+                self._locks.pop(antiga, None)
+
+    def publicar(self, simbolo, intervalo, motor):
+        """
+        Publica as médias de um bot após `calcular_medias_moveis(dados, motor=motor)`.
+
+        Parâmetros:
+            simbolo (str): Símbolo do ativo.
+            intervalo (str): Intervalo dos candles.
+            motor (MediasMoveisIncrementais): Estado já atualizado com os candles do ciclo.
+        """
+        if motor.ultimo_tempo is None:
+            return
+        chave = (simbolo, intervalo, motor.curta.janela, motor.longa.janela, motor.ultimo_tempo)
+        self._guardar(chave, (motor.curta.soma_parcial(), motor.longa.soma_parcial()))
+        with self._lock:
+            self.publicadas += 1
+
+    def medias(self, simbolo, intervalo, dados, janela_curta=7, janela_longa=40):
+        """
+        Retorna as médias (curta, longa) do último candle de `dados`, como `calcular_medias_moveis`.
+
+        Parâmetros:
+            simbolo (str): Símbolo do ativo.
+            intervalo (str): Intervalo dos candles.
+            dados (DataFrame): Colunas 'preco_fechamento' e 'tempo_fechamento';
+                o último candle é tratado como aberto.
+            janela_curta, janela_longa (int): Períodos das médias.
+
+        Retorna:
+            tuple: (media_curta, media_longa); NaN sem histórico suficiente.
+        """
+        if len(dados) < 2:
+            return math.nan, math.nan
+        precos = dados['preco_fechamento'].to_numpy(dtype=float)
+        chave = (simbolo, intervalo, janela_curta, janela_longa, dados['tempo_fechamento'].to_numpy()[-2])
+
+        with self._lock:
+            somas = self._entradas.get(chave)
+            if somas is not None:
+                self._entradas.move_to_end(chave)
+                self.hits += 1
+        if somas is None:
+            with self._lock_da_chave(chave):
+                with self._lock:
+                    somas = self._entradas.get(chave)
+                if somas is None:
+                    fechados = precos[:-1]
+                    somas = tuple(
+                        math.fsum(fechados[len(fechados) - (janela - 1):]) if len(fechados) >= janela - 1 else math.nan
+                        for janela in (janela_curta, janela_longa)
+                    )
+                    self._guardar(chave, somas)
+                    with self._lock:
+                        self.misses += 1
+
+        preco_atual = precos[-1]
+        return (somas[0] + preco_atual) / janela_curta, (somas[1] + preco_atual) / janela_longa
+
+    def limpar(self):
+        """Descarta todas as entradas (e.g., ao trocar a fonte dos candles)."""
+        with self._lock:
+            self._entradas.clear()
+            self._locks.clear()
+
+    def estatisticas(self):
+        """Entradas guardadas, leituras atendidas do store, cálculos e publicações dos bots."""
+        with self._lock:
+            return {
+                "entries": len(self._entradas),
+                "hits": self.hits,
+                "misses": self.misses,
+                "published": self.publicadas,
+            }
@@ -0,0 +1,173 @@
+import json
+import os
+import threading
+import time
+
+from binance.helpers import interval_to_milliseconds
+
+from .candle_store import CandleStore
+
+
+class KlineCache:
+    """
+    Cache em memória dos últimos candles por (símbolo, intervalo).
+
+    Na primeira chamada baixa o histórico completo; nas seguintes pede à
+    Binance apenas os candles a partir do último candle em cache (que pode
+    ainda estar aberto e é substituído). Se a resposta deixar um buraco na
+    série, o histórico é baixado novamente por completo. Pedidos feitos a
+    menos de `validade` segundos da última atualização não vão à Binance,
+    de modo que vários bots pedindo o mesmo par geram uma só chamada.
+
+    Com um `store` (CandleStore), o cache é aquecido a partir dos candles
+    gravados em disco e os candles fechados são gravados à medida que chegam.
+    """
+
+    def __init__(self, max_candles=1000, validade=5, store=None):
+        self.max_candles = max_candles
+        self.validade = validade
+        self.store = store
+        self._persistido = {}
+        self._candles = {}
+        self._atualizado_em = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self._bytes_por_candle = 0
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+    def _lock_da_chave(self, chave):
+        with self._lock:
+            if chave not in self._locks:
+                self._locks[chave] = threading.Lock()
+            return self._locks[chave]
+
+    def obter(self, client, simbolo, intervalo, limite=1000):
+        """
+        Retorna os últimos `limite` candles brutos (formato da API de klines).
+
+        Parâmetros:
+            client (Client): Cliente Binance.
+            simbolo (str): Símbolo do ativo (e.g., 'BNBUSDT').
+            intervalo (str): Intervalo dos candles.
+            limite (int): Número de candles desejados.
+
+        Retorna:
+            list: Candles em ordem cronológica.
+        """
+        chave = (simbolo, intervalo)
+        with self._lock_da_chave(chave):
+            candles = self._candles.get(chave)
+            if candles is None and self.store is not None:
+                candles = self.store.candles(simbolo, intervalo, limite) or None
+            if candles is None or len(candles) < limite:
+                candles = self._baixar_completo(client, simbolo, intervalo, limite)
+            elif time.time() - self._atualizado_em.get(chave, 0) <= self.validade:
+                with self._lock:
+                    self.hits += 1
+                    self.bytes_saved += limite * self._bytes_por_candle
+                if self.store is not None:
+                    self._persistir(simbolo, intervalo, candles)
+                return candles[-limite:]
+            else:
+                candles = self._atualizar(client, simbolo, intervalo, candles, limite)
+            self._candles[chave] = candles[-max(limite, self.max_candles):]
+            self._atualizado_em[chave] = time.time()
+            if self.store is not None:
+                self._persistir(simbolo, intervalo, candles)
+            return candles[-limite:]
+
+    def _persistir(self, simbolo, intervalo, candles):
+        chave = (simbolo, intervalo)
+        if chave not in self._persistido:
+            self._persistido[chave] = self.store.ultimo_tempo_abertura(simbolo, intervalo) or 0
+        agora = int(time.time() * 1000)
+        fechados = [c for c in candles if c[0] > self._persistido[chave] and c[6] < agora]
+        if fechados:
+            self.store.anexar(simbolo, intervalo, fechados)
+            self._persistido[chave] = fechados[-1][0]
+
+    def _baixar_completo(self, client, simbolo, intervalo, limite):
+        candles = client.get_klines(symbol=simbolo, interval=intervalo, limit=limite)
+        with self._lock:
+            self.misses += 1
+            if candles:
+                self._bytes_por_candle = len(json.dumps(candles)) // len(candles)
+        return list(candles)
+
+    def _atualizar(self, client, simbolo, intervalo, candles, limite):
+        passo = interval_to_milliseconds(intervalo)
+        ultima_abertura = candles[-1][0]
+        novos = client.get_klines(
+            symbol=simbolo, interval=intervalo, startTime=ultima_abertura, limit=limite
+        )
+        # Sem resposta, resposta cheia (mais candles novos do que cabem) ou
+        # buraco entre o cache e os novos candles: baixar tudo de novo.
+        if not novos or len(novos) >= limite or novos[0][0] != ultima_abertura:
+            return self._baixar_completo(client, simbolo, intervalo, limite)
+        if passo and any(b[0] - a[0] != passo for a, b in zip(novos, novos[1:])):
+            return self._baixar_completo(client, simbolo, intervalo, limite)
+
+        with self._lock:
+            self.hits += 1
+            self.bytes_saved += (limite - len(novos)) * self._bytes_por_candle
+        return candles[:-1] + list(novos)
+
+    def aplicar_candle(self, simbolo, intervalo, candle):
+        """
+        Aplica ao cache um candle recebido por stream.
+
+        O candle substitui o último do cache se tiver a mesma abertura ou é
+        anexado se for o seguinte. Se houver buraco, o par é descartado para
+        que a próxima leitura baixe o histórico completo via REST. Pares que
+        ainda não estão em cache são ignorados.
+
+        Parâmetros:
+            simbolo (str): Símbolo do ativo.
+            intervalo (str): Intervalo dos candles.
+            candle (list): Candle no formato da API de klines.
+        """
+        chave = (simbolo, intervalo)
+        with self._lock_da_chave(chave):
+            candles = self._candles.get(chave)
+            if not candles:
+                return
+            passo = interval_to_milliseconds(intervalo)
+            ultima_abertura = candles[-1][0]
+            if candle[0] == ultima_abertura:
+                candles[-1] = candle
+            elif candle[0] == ultima_abertura + passo:
+                candles.append(candle)
+                if len(candles) > self.max_candles:
+                    del candles[0]
+            elif candle[0] > ultima_abertura:
+                self._candles.pop(chave, None)
+                self._atualizado_em.pop(chave, None)
+                return
+            else:
+                return
+            self._atualizado_em[chave] = time.time()
+
+    def limpar(self, simbolo=None, intervalo=None):
+        """Remove do cache um par (símbolo, intervalo) ou tudo, se omitido."""
+        with self._lock:
+            if simbolo is None:
+                self._candles.clear()
+                self._atualizado_em.clear()
+            else:
+                self._candles.pop((simbolo, intervalo), None)
+                self._atualizado_em.pop((simbolo, intervalo), None)
+
+    def estatisticas(self):
+        """Retorna os contadores de hits, misses e bytes economizados."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "bytes_saved": self.bytes_saved,
+                "pares": len(self._candles),
+            }
+
+
+cache_klines = KlineCache(store=CandleStore() if os.getenv("CANDLE_STORE_DIR") else None)
@@ -0,0 +1,146 @@
+import asyncio
+import json
+import os
+import threading
+
+import websockets
+
+from .kline_cache import cache_klines
+
+STREAM_URL = os.getenv("BINANCE_STREAM_URL", "wss://stream.binance.com:9443")
+
+
+def evento_para_candle(k):
+    """
+    Converte o campo 'k' de um evento de kline no formato da API REST.
+
+    Parâmetros:
+        k (dict): Dados do candle recebidos no stream.
+
+    Retorna:
+        list: Candle no formato retornado por `get_klines`.
+    """
+    return [k['t'], k['o'], k['h'], k['l'], k['c'], k['v'], k['T'], k['q'], k['n'], k['V'], k['Q'], k['B']]
+
+
+class KlineStream:
+    """
+    Recebe os streams de klines da Binance e mantém o `cache_klines` atualizado.
+
+    Uma única conexão é compartilhada por todos os bots do processo. Os bots
+    registram os pares que acompanham com `acompanhar` e esperam o fechamento
+    de um candle com `aguardar_fechamento`. Se a conexão cair, o cache deixa
+    de ser atualizado pelo stream e as leituras voltam a usar REST até a
+    reconexão.
+    """
+
+    def __init__(self, url=STREAM_URL, cache=cache_klines):
+        self.url = url
+        self.cache = cache
+        self.conectado = False
+        self.eventos = 0
+        self.reconexoes = 0
+        self._pares = {}
+        self._fechamentos = {}
+        self._condicao = threading.Condition()
+        self._mudou = threading.Event()
+        self._thread = None
+
+    def acompanhar(self, simbolos, intervalo):
+        """Passa a receber os candles dos símbolos no intervalo dado."""
+        with self._condicao:
+            for simbolo in simbolos:
+                par = (simbolo, intervalo)
+                self._pares[par] = self._pares.get(par, 0) + 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._executar, daemon=True)
+                self._thread.start()
+        self._mudou.set()
+
+    def liberar(self, simbolos, intervalo):
+        """Deixa de acompanhar os símbolos registrados por um bot."""
+        with self._condicao:
+            for simbolo in simbolos:
+                par = (simbolo, intervalo)
+                if self._pares.get(par, 0) <= 1:
+                    self._pares.pop(par, None)
+                else:
+                    self._pares[par] -= 1
+        self._mudou.set()
+
+    def fechamentos(self, simbolos, intervalo):
+        """Retorna um marcador da quantidade de candles fechados até agora."""
+        with self._condicao:
+            return sum(self._fechamentos.get((s, intervalo), 0) for s in simbolos)
+
+    def aguardar_fechamento(self, simbolos, intervalo, marcador, timeout):
+        """
+        Espera o fechamento de um candle de qualquer um dos símbolos.
+
+        Parâmetros:
+            simbolos (list): Símbolos acompanhados pelo bot.
+            intervalo (str): Intervalo dos candles.
+            marcador (int): Valor de `fechamentos` no início da espera.
+            timeout (float): Tempo máximo de espera em segundos.
+
+        Retorna:
+            bool: True se algum candle fechou desde o marcador.
+        """
+        with self._condicao:
+            return self._condicao.wait_for(
+                lambda: sum(self._fechamentos.get((s, intervalo), 0) for s in simbolos) > marcador,
+                timeout=timeout,
+            )
+
+    def _url_dos_streams(self):
+        with self._condicao:
+            streams = sorted(f"{s.lower()}@kline_{i}" for s, i in self._pares)
+        if not streams:
+            return None
+        return f"{self.url}/stream?streams={'/'.join(streams)}"
+
+    def _executar(self):
+        asyncio.run(self._loop())
+
+    async def _loop(self):
+        espera = 1
+        while True:
+            self._mudou.clear()
+            url = self._url_dos_streams()
+            if url is None:
+                await asyncio.to_thread(self._mudou.wait, 30)
+                continue
+            try:
+                async with websockets.connect(url, ping_interval=20) as conexao:
+                    self.conectado = True
+                    espera = 1
+                    while not self._mudou.is_set():
+                        try:
+                            mensagem = await asyncio.wait_for(conexao.recv(), timeout=1)
+                        except asyncio.TimeoutError:
+                            continue
+                        self._processar(json.loads(mensagem))
+            except Exception as e:
+                print(f"Stream de klines desconectado: {e}. Usando REST até reconectar.")
+                self.reconexoes += 1
+                await asyncio.sleep(espera)
+                espera = min(espera * 2, 30)
+            finally:
+                self.conectado = False
+
+    def _processar(self, mensagem):
+        dados = mensagem.get('data', mensagem)
+        if dados.get('e') != 'kline':
+            return
+        k = dados['k']
+        simbolo, intervalo = k['s'], k['i']
+        self.cache.aplicar_candle(simbolo, intervalo, evento_para_candle(k))
+        self.eventos += 1
+        if k['x']:
+            with self._condicao:
+                par = (simbolo, intervalo)
+                self._fechamentos[par] = self._fechamentos.get(par, 0) + 1
+                self._condicao.notify_all()
+
+
+stream_klines = KlineStream()
@@ -0,0 +1,164 @@
+import threading
+
+from binance.client import Client
+
+from .async_client import ClientePool, pool_habilitado
+from .data import candles_para_dataframe
+from .indicator_store import IndicatorStore
+from .kline_cache import cache_klines
+from .prices import precos_atuais
+from .rate_limit import ClienteGovernado
+from .symbol_info import cache_simbolos
+
+
+class MarketDataHub:
+    """
+    Ponto único de acesso aos dados públicos de mercado dentro do processo.
+
+    Klines, preços e exchangeInfo são buscados com um cliente público
+    compartilhado e servidos a todos os bots inscritos, de modo que o custo
+    cresce com o número de símbolos distintos e não com o número de usuários.
+    Os bots se inscrevem com seus ativos para que a busca de preços em lote
+    já inclua os símbolos de todos eles.
+    """
+
+    def __init__(self, client=None):
+        self._client = client
+        # Médias móveis publicadas pelos bots deste hub e lidas pela API
+        self.indicadores = IndicatorStore()
+        self._inscricoes = {}
+        self._dataframes = {}
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        """Cliente público (sem chaves) criado na primeira utilização, sobre o pool de conexões."""
+        with self._lock:
+            if self._client is None:
+                self._client = ClienteGovernado(ClientePool() if pool_habilitado() else Client())
+            return self._client
+
+    def _cliente(self, prioridade=None):
+        """Cliente público; com `prioridade`, as chamadas contam nessa prioridade do governador de peso."""
+        client = self.client
+        if prioridade is not None and isinstance(client, ClienteGovernado):
+            return client.com_prioridade(prioridade)
+        return client
+
+    def usar_cliente(self, client):
+        """Substitui o cliente usado para dados públicos (e.g., exchange simulada)."""
+        with self._lock:
+            self._client = client
+            self._dataframes.clear()
+        self.indicadores.limpar()
+
+    def inscrever(self, id_inscrito, simbolos, intervalo=Client.KLINE_INTERVAL_30MINUTE):
+        """
+        Registra os ativos acompanhados por um bot.
+
+        Parâmetros:
+            id_inscrito: Identificador do bot (e.g., user_id).
+            simbolos (list): Símbolos acompanhados.
+            intervalo (str): Intervalo dos candles usados pelo bot.
+        """
+        with self._lock:
+            self._inscricoes[id_inscrito] = (set(simbolos), intervalo)
+
+    def cancelar_inscricao(self, id_inscrito):
+        """Remove a inscrição de um bot."""
+        with self._lock:
+            self._inscricoes.pop(id_inscrito, None)
+
+    def simbolos_inscritos(self):
+        """Retorna o conjunto de símbolos acompanhados por algum bot."""
+        with self._lock:
+            simbolos = set()
+            for simbolos_do_bot, _ in self._inscricoes.values():
+                simbolos |= simbolos_do_bot
+            return simbolos
+
+    def pares_inscritos(self):
+        """Retorna os pares (símbolo, intervalo) acompanhados por algum bot."""
+        with self._lock:
+            return {
+                (simbolo, intervalo)
+                for simbolos, intervalo in self._inscricoes.values()
+                for simbolo in simbolos
+            }
+
+    def dados_historicos(self, simbolo, intervalo, limite=1000, prioridade=None):
+        """
+        Obtém os dados históricos de um símbolo, como `obter_dados_historicos`.
+
+        Bots pedindo o mesmo par recebem cópias do mesmo DataFrame, montado
+        uma única vez por atualização dos candles. Rotas da API passam
+        `prioridade=PRIORIDADE_PAINEL` (padrão: prioridade dos bots).
+
+        Retorna:
+            DataFrame: Colunas 'preco_fechamento' e 'tempo_fechamento'.
+        """
+        return self._dataframe(simbolo, intervalo, limite, prioridade).copy()
+
+    def medias_moveis(self, simbolo, intervalo, janela_curta=7, janela_longa=40, prioridade=None):
+        """
+        Retorna as médias móveis (curta, longa) atuais de um símbolo.
+
+        Usa as médias publicadas pelos bots em `self.indicadores`; sem
+        publicação para o candle atual, calcula uma única vez por candle.
+        """
+        dados = self._dataframe(simbolo, intervalo, 1000, prioridade)
+        return self.indicadores.medias(simbolo, intervalo, dados, janela_curta, janela_longa)
+
+    def _dataframe(self, simbolo, intervalo, limite, prioridade=None):
+        """DataFrame compartilhado do par (não deve ser alterado)."""
+        candles = cache_klines.obter(self._cliente(prioridade), simbolo, intervalo, limite)
+        chave = (simbolo, intervalo, limite)
+        marca = (len(candles), candles[0][0], candles[-1][0], candles[-1][4]) if candles else None
+        with self._lock:
+            guardado = self._dataframes.get(chave)
+        if guardado is None or guardado[0] != marca:
+            guardado = (marca, candles_para_dataframe(candles))
+            with self._lock:
+                self._dataframes[chave] = guardado
+        return guardado[1]
+
+    def precos(self, simbolos, prioridade=None):
+        """
+        Retorna os preços pedidos, buscando junto os de todos os bots inscritos.
+
+        Símbolos fora de negociação (e.g., deslistados) ficam de fora do lote e
+        da resposta; os dos outros bots não são exigidos, então um símbolo
+        recusado de um bot não derruba os preços dos demais.
+        """
+        simbolos = list(simbolos)
+        client = self._cliente(prioridade)
+        validos = cache_simbolos.negociaveis(client, set(simbolos) | self.simbolos_inscritos())
+        pedidos = [s for s in simbolos if s in validos]
+        todos = precos_atuais.precos(client, pedidos, adicionais=validos)
+        return {s: todos[s] for s in pedidos if s in todos}
+
+    def preco(self, simbolo, prioridade=None):
+        """Retorna o preço atual de um símbolo."""
+        precos = self.precos([simbolo], prioridade)
+        if simbolo not in precos:
+            raise ValueError(f"Preço de {simbolo} não disponível")
+        return precos[simbolo]
+
+    def filtros(self, simbolo, prioridade=None):
+        """Retorna os filtros pré-calculados de um símbolo."""
+        return cache_simbolos.obter(self._cliente(prioridade), simbolo)
+
+    def estatisticas(self):
+        """Resumo das inscrições e dos caches de dados de mercado."""
+        with self._lock:
+            bots = len(self._inscricoes)
+        return {
+            "bots_inscritos": bots,
+            "simbolos_distintos": len(self.simbolos_inscritos()),
+            "klines": cache_klines.estatisticas(),
+            "indicadores": self.indicadores.estatisticas(),
+            "chamadas_de_preco": precos_atuais.chamadas,
+        }
+
+
+hub_mercado = MarketDataHub()
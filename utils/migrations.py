@@ -0,0 +1,120 @@
+"""
+Migrações versionadas do banco SQLite.
+
+A versão do esquema fica em `PRAGMA user_version`. Cada migração roda uma
+única vez, numa transação própria (`BEGIN IMMEDIATE`, para que vários
+processos iniciando juntos não apliquem a mesma migração duas vezes).
+Migrações novas são acrescentadas ao final de `MIGRACOES`.
+"""
+from utils.positions import TRIGGER_POSICOES, reconstruir_posicoes
+
+
+def _colunas(cursor, tabela):
+    return {linha[1] for linha in cursor.execute(f"PRAGMA table_info({tabela})")}
+
+
+def _ids_da_binance(cursor):
+    """
+    Guarda o trade e a ordem da Binance em cada transação e indexa as consultas frequentes.
+
+    As transações antigas ficam com trade_id NULL (não conflitam na chave
+    única); a sincronização preenche o trade_id quando encontra o trade
+    correspondente, em vez de inserir outra linha.
+    """
+    colunas = _colunas(cursor, "transactions")
+    if "trade_id" not in colunas:
+        cursor.execute("ALTER TABLE transactions ADD COLUMN trade_id INTEGER")
+    if "order_id" not in colunas:
+        cursor.execute("ALTER TABLE transactions ADD COLUMN order_id INTEGER")
+
+    # Chave natural: um trade da Binance é gravado uma única vez por usuário e ativo
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_transactions_trade
+        ON transactions (user_id, asset, trade_id)
+    ''')
+    # Cobre as somas de investido por ativo e tipo (portfolio e stats) sem ler a tabela
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transactions_posicao
+        ON transactions (user_id, asset, type, total)
+    ''')
+    # Listagem das transações mais recentes de um usuário
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transactions_tempo
+        ON transactions (user_id, timestamp)
+    ''')
+
+
+def _cursores_de_sincronizacao(cursor):
+    """Último trade sincronizado por (usuário, ativo), para a sincronização paginar com fromId."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sync_cursors (
+            user_id INTEGER NOT NULL,
+            asset TEXT NOT NULL,
+            last_trade_id INTEGER NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, asset),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+
+
+def _livro_de_posicoes(cursor):
+    """
+    Cria a tabela de posições mantida por trigger e a preenche com o histórico existente.
+
+    Ver `utils.positions` para as regras de preço médio.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS positions (
+            user_id INTEGER NOT NULL,
+            asset TEXT NOT NULL,
+            quantity REAL NOT NULL DEFAULT 0,
+            cost_basis REAL NOT NULL DEFAULT 0,
+            realized_pnl REAL NOT NULL DEFAULT 0,
+            total_bought REAL NOT NULL DEFAULT 0,
+            total_sold REAL NOT NULL DEFAULT 0,
+            trades INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, asset),
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    cursor.execute(TRIGGER_POSICOES)
+    reconstruir_posicoes(cursor)
+
+
+MIGRACOES = [
+    _ids_da_binance,
+    _cursores_de_sincronizacao,
+    _livro_de_posicoes,
+]
+
+
+def versao_esquema(conn):
+    """Retorna a versão atual do esquema (número de migrações aplicadas)."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrar(conn):
+    """
+    Aplica as migrações pendentes.
+
+    Parâmetros:
+        conn: Conexão sem transação aberta (e.g., de `utils.db.conectar`).
+
+    Retorna:
+        int: Versão do esquema após as migrações.
+    """
+    cursor = conn.cursor()
+    for versao, migracao in enumerate(MIGRACOES, start=1):
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            # Relida dentro da transação: outro processo pode ter migrado enquanto esperávamos
+            if versao_esquema(conn) < versao:
+                migracao(cursor)
+                cursor.execute(f"PRAGMA user_version = {versao}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return versao_esquema(conn)
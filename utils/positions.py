@@ -0,0 +1,153 @@
+"""
+Livro de posições por (usuário, ativo).
+
+A tabela `positions` guarda quantidade, custo (preço médio), lucro
+realizado e totais comprados/vendidos de cada ativo. Ela é mantida por um
+trigger em `transactions` (ver `TRIGGER_POSICOES`), então toda transação
+inserida, pela sincronização ou pelo bot, atualiza a posição na mesma
+transação do banco. O trigger aplica os trades na ordem de inserção; quando
+chegam trades mais antigos que os já aplicados (e.g., sincronização depois de
+uma ordem do bot), `gravar_pagina` reconstrói a posição do ativo. O dashboard lê uma linha por ativo em vez de somar o
+histórico inteiro de trades. O lucro não realizado depende do preço atual e
+é calculado na leitura (`lucro_nao_realizado`).
+
+Uso:
+    python -m utils.positions rebuild            # todos os usuários
+    python -m utils.positions rebuild <user_id>
+"""
+from utils.db import conectar
+
+# Preço médio: compras somam ao custo; vendas baixam o custo proporcionalmente
+# à quantidade vendida e realizam a diferença para o preço médio. Num UPDATE,
+# todas as expressões usam os valores anteriores da linha.
+TRIGGER_POSICOES = '''
+    CREATE TRIGGER IF NOT EXISTS trg_transactions_positions
+    AFTER INSERT ON transactions
+    BEGIN
+        INSERT OR IGNORE INTO positions (user_id, asset) VALUES (NEW.user_id, NEW.asset);
+        UPDATE positions SET
+            quantity = CASE WHEN NEW.type = 'BUY' THEN quantity + NEW.quantity
+                            ELSE MAX(quantity - NEW.quantity, 0) END,
+            cost_basis = CASE WHEN NEW.type = 'BUY' THEN cost_basis + NEW.total
+                              WHEN quantity > 0 THEN cost_basis * MAX(quantity - NEW.quantity, 0) / quantity
+                              ELSE 0 END,
+            realized_pnl = CASE WHEN NEW.type = 'SELL' AND quantity > 0
+                                THEN realized_pnl + (NEW.price - cost_basis / quantity) * MIN(NEW.quantity, quantity)
+                                ELSE realized_pnl END,
+            total_bought = total_bought + CASE WHEN NEW.type = 'BUY' THEN NEW.total ELSE 0 END,
+            total_sold = total_sold + CASE WHEN NEW.type = 'SELL' THEN NEW.total ELSE 0 END,
+            trades = trades + 1,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE user_id = NEW.user_id AND asset = NEW.asset;
+    END
+'''
+
+COLUNAS = ("quantity", "cost_basis", "realized_pnl", "total_bought", "total_sold", "trades")
+
+
+def aplicar_trade(posicao, tipo, quantidade, preco, total):
+    """
+    Aplica um trade a uma posição, com as mesmas regras do trigger.
+
+    Parâmetros:
+        posicao (dict): Valores de COLUNAS; alterado no lugar.
+        tipo (str): 'BUY' ou 'SELL'.
+        quantidade, preco, total (float): Dados da transação.
+    """
+    atual = posicao["quantity"]
+    if tipo == 'BUY':
+        posicao["quantity"] = atual + quantidade
+        posicao["cost_basis"] += total
+        posicao["total_bought"] += total
+    else:
+        restante = max(atual - quantidade, 0)
+        if atual > 0:
+            posicao["realized_pnl"] += (preco - posicao["cost_basis"] / atual) * min(quantidade, atual)
+            posicao["cost_basis"] = posicao["cost_basis"] * restante / atual
+        else:
+            posicao["cost_basis"] = 0
+        posicao["quantity"] = restante
+        posicao["total_sold"] += total
+    posicao["trades"] += 1
+
+
+def reconstruir(conn, user_id=None, ativo=None):
+    """
+    Recalcula as posições a partir de todas as transações, em ordem cronológica.
+
+    Parâmetros:
+        conn: Conexão do banco (a transação é confirmada aqui).
+        user_id: Usuário a reconstruir (padrão: todos).
+        ativo (str): Ativo a reconstruir (padrão: todos; exige user_id).
+
+    Retorna:
+        int: Número de posições gravadas.
+    """
+    try:
+        total = reconstruir_posicoes(conn.cursor(), user_id, ativo)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return total
+
+
+def reconstruir_posicoes(cursor, user_id=None, ativo=None):
+    """Como `reconstruir`, sem confirmar a transação (usado pelas migrações e pela sincronização)."""
+    if ativo is not None:
+        filtro, parametros = "WHERE user_id = ? AND asset = ?", (user_id, ativo)
+    elif user_id is not None:
+        filtro, parametros = "WHERE user_id = ?", (user_id,)
+    else:
+        filtro, parametros = "", ()
+    cursor.execute(f'''
+        SELECT user_id, asset, type, quantity, price, total FROM transactions
+        {filtro}
+        ORDER BY user_id, asset, timestamp, id
+    ''', parametros)
+
+    posicoes = {}
+    for uid, ativo, tipo, quantidade, preco, total in cursor.fetchall():
+        posicao = posicoes.setdefault((uid, ativo), dict.fromkeys(COLUNAS, 0))
+        aplicar_trade(posicao, tipo, quantidade, preco, total)
+
+    cursor.execute(f'DELETE FROM positions {filtro}', parametros)
+    cursor.executemany(f'''
+        INSERT INTO positions (user_id, asset, {", ".join(COLUNAS)})
+        VALUES (?, ?, {", ".join("?" * len(COLUNAS))})
+    ''', [(uid, ativo, *(p[c] for c in COLUNAS)) for (uid, ativo), p in posicoes.items()])
+    return len(posicoes)
+
+
+def posicoes_do_usuario(cursor, user_id):
+    """
+    Retorna as posições de um usuário.
+
+    Retorna:
+        dict: Ativo -> dict com COLUNAS.
+    """
+    cursor.execute(f'''
+        SELECT asset, {", ".join(COLUNAS)} FROM positions WHERE user_id = ?
+    ''', (user_id,))
+    return {row[0]: dict(zip(COLUNAS, row[1:])) for row in cursor.fetchall()}
+
+
+def lucro_nao_realizado(posicao, preco_atual):
+    """Lucro não realizado da quantidade em carteira ao preço atual."""
+    return posicao["quantity"] * preco_atual - posicao["cost_basis"]
+
+
+def main():
+    import sys
+    if len(sys.argv) > 1 and sys.argv[1] == "rebuild":
+        user_id = int(sys.argv[2]) if len(sys.argv) > 2 else None
+        conn = conectar()
+        total = reconstruir(conn, user_id)
+        conn.close()
+        print(f"{total} posições reconstruídas")
+    else:
+        print("Usage: python -m utils.positions rebuild [user_id]")
+
+
+if __name__ == "__main__":
+    main()
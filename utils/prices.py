@@ -0,0 +1,109 @@
+import json
+import threading
+import time
+
+from binance.exceptions import BinanceAPIException
+
+
+class PriceSnapshot:
+    """
+    Preços de todos os símbolos em uso, buscados numa única chamada em lote.
+
+    Todas as threads do bot e as rotas da API compartilham o mesmo retrato de
+    preços enquanto ele tiver menos de `validade` segundos. Quando um símbolo
+    ainda não conhecido é pedido, ele entra no lote da próxima busca.
+
+    Um símbolo recusado pela Binance (e.g., deslistado) derruba o lote
+    inteiro; nesse caso os símbolos pedidos são buscados um a um e os
+    recusados ficam fora das buscas por `rejeicao` segundos, sem afetar os
+    demais.
+    """
+
+    def __init__(self, validade=5, rejeicao=300):
+        self.validade = validade
+        self.rejeicao = rejeicao
+        self._simbolos = set()
+        self._precos = {}
+        self._rejeitados = {}
+        self._atualizado_em = 0
+        self._lock = threading.Lock()
+        self.chamadas = 0
+
+    def precos(self, client, simbolos, adicionais=()):
+        """
+        Retorna o preço atual de cada símbolo pedido.
+
+        Parâmetros:
+            client (Client): Cliente Binance usado se for preciso buscar os preços.
+            simbolos (list): Símbolos desejados (e.g., ['BNBUSDT', 'BTCUSDT']).
+            adicionais (iterable): Símbolos buscados no mesmo lote sem serem
+                exigidos (e.g., os dos outros bots); ficam fora da nova tentativa.
+
+        Retorna:
+            dict: Símbolo -> preço (float); símbolos recusados pela Binance ficam de fora.
+        """
+        simbolos = list(simbolos)
+        with self._lock:
+            agora = time.time()
+            self._rejeitados = {s: t for s, t in self._rejeitados.items() if agora - t < self.rejeicao}
+            fresco = agora - self._atualizado_em <= self.validade
+            faltando = any(s not in self._precos and s not in self._rejeitados for s in simbolos)
+            if not fresco or faltando:
+                self._buscar(client, simbolos, adicionais)
+            return {s: self._precos[s] for s in simbolos if s in self._precos}
+
+    def preco(self, client, simbolo):
+        """Retorna o preço atual de um único símbolo."""
+        precos = self.precos(client, [simbolo])
+        if simbolo not in precos:
+            raise ValueError(f"Preço de {simbolo} não disponível")
+        return precos[simbolo]
+
+    def _buscar(self, client, simbolos, adicionais=()):
+        pedidos = set(simbolos) - self._rejeitados.keys()
+        lote = (self._simbolos | set(adicionais) | pedidos) - self._rejeitados.keys()
+        try:
+            tickers = self._ticker_em_lote(client, lote)
+        except Exception:
+            # Um símbolo inválido no lote derruba a chamada inteira;
+            # refaz apenas com os símbolos pedidos agora.
+            lote = pedidos
+            try:
+                tickers = self._ticker_em_lote(client, lote)
+            except BinanceAPIException:
+                # Algum dos próprios símbolos também é recusado: busca um a um
+                tickers = self._ticker_por_simbolo(client, lote)
+                lote = {t['symbol'] for t in tickers}
+        self._simbolos = lote
+        self._precos = {t['symbol']: float(t['price']) for t in tickers}
+        self._atualizado_em = time.time()
+
+    def _ticker_em_lote(self, client, simbolos):
+        if not simbolos:
+            return []
+        self.chamadas += 1
+        return client.get_symbol_ticker(symbols=json.dumps(sorted(simbolos), separators=(',', ':')))
+
+    def _ticker_por_simbolo(self, client, simbolos):
+        tickers = []
+        for simbolo in sorted(simbolos):
+            self.chamadas += 1
+            try:
+                tickers.append(client.get_symbol_ticker(symbol=simbolo))
+            except BinanceAPIException as e:
+                print(f"Preço de {simbolo} recusado pela Binance, ignorando por {self.rejeicao}s: {e}")
+                self._rejeitados[simbolo] = time.time()
+        return tickers
+
+
+precos_atuais = PriceSnapshot()
+
+
+def obter_precos(client, simbolos):
+    """Atalho para `precos_atuais.precos(client, simbolos)`."""
+    return precos_atuais.precos(client, simbolos)
+
+
+def obter_preco(client, simbolo):
+    """Atalho para `precos_atuais.preco(client, simbolo)`."""
+    return precos_atuais.preco(client, simbolo)
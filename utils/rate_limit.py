@@ -0,0 +1,245 @@
+"""
+Controle do peso de requisições à Binance compartilhado por todo o processo.
+
+A Binance limita o peso das requisições por minuto e por IP: todos os bots e
+as rotas da API dividem o mesmo orçamento. `GovernadorPeso` é um balde de
+fichas com o peso de cada endpoint, corrigido pelo cabeçalho
+X-MBX-USED-WEIGHT-1M de cada resposta. As chamadas têm prioridade: ordens
+podem usar o orçamento inteiro, os ciclos dos bots esperam antes disso e as
+atualizações do painel são as primeiras a esperar e, se a espera passar do
+limite, são recusadas com `LimitePesoExcedido`. Assim sobra peso para as
+ordens mesmo quando muitos bots acordam juntos.
+"""
+import json
+import os
+import threading
+import time
+
+from binance.exceptions import BinanceAPIException
+
+# Peso de cada método na Binance (ticker varia com os parâmetros; ver `peso_requisicao`)
+PESOS = {
+    "ping": 1,
+    "get_server_time": 1,
+    "get_klines": 2,
+    "get_symbol_ticker": 2,
+    "get_exchange_info": 20,
+    "get_symbol_info": 20,
+    "get_account": 20,
+    "create_order": 1,
+    "get_my_trades": 20,
+}
+
+PRIORIDADE_ORDEM = 0
+PRIORIDADE_BOT = 1
+PRIORIDADE_PAINEL = 2
+NOMES_PRIORIDADES = {PRIORIDADE_ORDEM: "order", PRIORIDADE_BOT: "bot", PRIORIDADE_PAINEL: "dashboard"}
+
+# Fração do orçamento que cada prioridade pode ocupar e espera máxima (s) antes de recusar
+FRACOES = {PRIORIDADE_ORDEM: 1.0, PRIORIDADE_BOT: 0.85, PRIORIDADE_PAINEL: 0.6}
+ESPERAS_MAXIMAS = {PRIORIDADE_ORDEM: 10, PRIORIDADE_BOT: 60, PRIORIDADE_PAINEL: 2}
+
+
+def peso_requisicao(metodo, params):
+    """
+    Retorna o peso de uma chamada na Binance.
+
+    Parâmetros:
+        metodo (str): Nome do método do Client (e.g., 'get_account').
+        params (dict): Parâmetros da chamada.
+
+    Retorna:
+        int: Peso da requisição.
+    """
+    if metodo == "get_symbol_ticker":
+        if params.get("symbol"):
+            return 2
+        if params.get("symbols"):
+            n = len(json.loads(params["symbols"]))
+            return 4 if n <= 20 else 40 if n <= 100 else 80
+        return 4
+    return PESOS[metodo]
+
+
+class LimitePesoExcedido(Exception):
+    """Chamada recusada para preservar o peso de requisições; tente após `retry_after` segundos."""
+
+    def __init__(self, mensagem, retry_after):
+        super().__init__(mensagem)
+        self.retry_after = retry_after
+
+
+class GovernadorPeso:
+    """
+    Balde de fichas com o peso de requisições por minuto, com prioridades.
+
+    Parâmetros:
+        peso_por_minuto (int): Peso permitido por minuto (padrão: variável de
+            ambiente BINANCE_WEIGHT_PER_MINUTE ou 6000, o limite da Binance).
+    """
+
+    def __init__(self, peso_por_minuto=None):
+        self.peso_por_minuto = peso_por_minuto or int(os.getenv("BINANCE_WEIGHT_PER_MINUTE", "6000"))
+        self._fichas = float(self.peso_por_minuto)
+        self._ultimo = time.monotonic()
+        self._pausa_ate = 0.0
+        self._peso_binance = None
+        self._minuto_binance = None
+        self._lock = threading.Lock()
+        self._aguardando = {p: 0 for p in NOMES_PRIORIDADES}
+        self._liberadas = {p: 0 for p in NOMES_PRIORIDADES}
+        self._recusadas = {p: 0 for p in NOMES_PRIORIDADES}
+        self._espera_maxima = {p: 0.0 for p in NOMES_PRIORIDADES}
+
+    def _reabastecer(self, agora):
+        self._fichas = min(
+            self.peso_por_minuto,
+            self._fichas + (agora - self._ultimo) * self.peso_por_minuto / 60,
+        )
+        self._ultimo = agora
+
+    def consumir(self, peso, prioridade=PRIORIDADE_BOT):
+        """
+        Reserva o peso de uma requisição, esperando se o orçamento da prioridade estiver esgotado.
+
+        Retorna:
+            float: Tempo de espera em segundos.
+
+        Raises:
+            LimitePesoExcedido: Se a espera necessária passar da espera máxima da prioridade.
+        """
+        inicio = time.monotonic()
+        reserva = self.peso_por_minuto * (1 - FRACOES[prioridade])
+        esperando = False
+        try:
+            while True:
+                with self._lock:
+                    agora = time.monotonic()
+                    self._reabastecer(agora)
+                    if agora >= self._pausa_ate and self._fichas - peso >= reserva:
+                        self._fichas -= peso
+                        espera = agora - inicio
+                        self._liberadas[prioridade] += 1
+                        self._espera_maxima[prioridade] = max(self._espera_maxima[prioridade], espera)
+                        return espera
+                    falta = max(self._pausa_ate - agora, (reserva + peso - self._fichas) * 60 / self.peso_por_minuto)
+                    if agora - inicio + falta > ESPERAS_MAXIMAS[prioridade]:
+                        self._recusadas[prioridade] += 1
+                        raise LimitePesoExcedido(
+                            "Limite de requisições à Binance próximo; tente novamente em instantes",
+                            retry_after=max(1, round(falta)),
+                        )
+                    if not esperando:
+                        esperando = True
+                        self._aguardando[prioridade] += 1
+                time.sleep(min(falta, 0.5))
+        finally:
+            if esperando:
+                with self._lock:
+                    self._aguardando[prioridade] -= 1
+
+    def informar_uso(self, resposta):
+        """Ajusta o saldo ao peso usado informado pela Binance no cabeçalho X-MBX-USED-WEIGHT-1M."""
+        usado = resposta.headers.get("X-MBX-USED-WEIGHT-1M") if resposta is not None else None
+        if usado is None:
+            return
+        usado = int(usado)
+        with self._lock:
+            self._reabastecer(time.monotonic())
+            # O cabeçalho inclui outros processos no mesmo IP; o balde nunca fica acima dele
+            self._fichas = min(self._fichas, self.peso_por_minuto - usado)
+            self._peso_binance = usado
+            self._minuto_binance = int(time.time() // 60)
+
+    def informar_erro(self, erro):
+        """Pausa todas as chamadas após HTTP 429/418, pelo tempo do cabeçalho Retry-After."""
+        if erro.status_code not in (418, 429):
+            return
+        resposta = erro.response
+        espera = resposta.headers.get("Retry-After") if resposta is not None else None
+        self.pausar(float(espera) if espera else 60 - time.time() % 60)
+
+    def pausar(self, segundos):
+        with self._lock:
+            self._pausa_ate = max(self._pausa_ate, time.monotonic() + segundos)
+
+    def utilizacao(self):
+        """Fração do peso por minuto em uso (0 a 1), pela estimativa local ou pelo cabeçalho da Binance."""
+        with self._lock:
+            return self._utilizacao()
+
+    def _utilizacao(self):
+        self._reabastecer(time.monotonic())
+        usado = self.peso_por_minuto - self._fichas
+        if self._minuto_binance == int(time.time() // 60):
+            usado = max(usado, self._peso_binance)
+        return min(1.0, max(0.0, usado / self.peso_por_minuto))
+
+    def estatisticas(self):
+        """Utilização do orçamento, pausa em curso e chamadas esperando, liberadas e recusadas por prioridade."""
+        with self._lock:
+            return {
+                "weight_per_minute": self.peso_por_minuto,
+                "utilisation": round(self._utilizacao(), 3),
+                "binance_used_weight": self._peso_binance if self._minuto_binance == int(time.time() // 60) else None,
+                "paused_seconds": round(max(0.0, self._pausa_ate - time.monotonic()), 1),
+                "priorities": {
+                    nome: {
+                        "budget_fraction": FRACOES[p],
+                        "waiting": self._aguardando[p],
+                        "granted": self._liberadas[p],
+                        "shed": self._recusadas[p],
+                        "max_wait_seconds": round(self._espera_maxima[p], 3),
+                    }
+                    for p, nome in NOMES_PRIORIDADES.items()
+                },
+            }
+
+
+governador_peso = GovernadorPeso()
+
+
+class ClienteGovernado:
+    """
+    Cliente Binance cujas chamadas passam pelo governador de peso.
+
+    Mantém a interface do cliente envolvido. Ordens (`create_order`) sempre
+    usam a prioridade de ordem; as demais chamadas, a prioridade do cliente.
+
+    Parâmetros:
+        client: Client, ClientePool ou SimulatedClient.
+        prioridade (int): PRIORIDADE_BOT ou PRIORIDADE_PAINEL.
+        governador (GovernadorPeso): Governador (padrão: o do processo).
+    """
+
+    def __init__(self, client, prioridade=PRIORIDADE_BOT, governador=governador_peso):
+        self.client = client
+        self.prioridade = prioridade
+        self.governador = governador
+
+    @property
+    def response(self):
+        return self.client.response
+
+    def com_prioridade(self, prioridade):
+        """Retorna o mesmo cliente com outra prioridade (e.g., chamadas do painel num cliente compartilhado)."""
+        return ClienteGovernado(self.client, prioridade, self.governador)
+
+    def __getattr__(self, nome):
+        atributo = getattr(self.client, nome)
+        if nome not in PESOS:
+            return atributo
+
+        def chamar(*args, **kwargs):
+            prioridade = PRIORIDADE_ORDEM if nome == "create_order" else self.prioridade
+            self.governador.consumir(peso_requisicao(nome, kwargs), prioridade)
+            try:
+                resultado = atributo(*args, **kwargs)
+            except BinanceAPIException as e:
+                self.governador.informar_erro(e)
+                raise
+            self.governador.informar_uso(getattr(self.client, "response", None))
+            return resultado
+
+        chamar.__name__ = nome
+        return chamar
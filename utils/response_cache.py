@@ -0,0 +1,139 @@
+"""
+Cache de respostas por usuário para as rotas consultadas pelo dashboard.
+
+O frontend consulta portfolio, estatísticas e status do bot periodicamente;
+cada consulta sem cache faz chamadas à Binance e agregações no banco. Aqui a
+última resposta de cada (usuário, rota) é reaproveitada por alguns segundos
+(TTL) e, por mais um intervalo, devolvida mesmo vencida enquanto é
+recalculada em segundo plano (stale-while-revalidate).
+
+Eventos que mudam os dados (trade registrado, configurações salvas, bot
+iniciado ou parado) chamam `invalidar(user_id)`. Cada invalidação incrementa
+a versão do usuário, e um recálculo iniciado antes dela não é guardado.
+O cache é do processo: com vários workers, cada um tem o seu.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# TTL padrão em segundos por rota (variáveis de ambiente RESPONSE_CACHE_TTL_<ROTA>)
+TTLS_PADRAO = {"portfolio": 30, "stats": 30, "bot_status": 5}
+
+
+class _Entrada:
+    def __init__(self, valor, versao):
+        self.valor = valor
+        self.versao = versao
+        self.criada = time.monotonic()
+        self.atualizando = False
+
+
+class CacheRespostas:
+    """
+    Respostas recentes por (usuário, rota), com TTL e stale-while-revalidate.
+
+    Parâmetros:
+        ttls (dict): Rota -> segundos em que a resposta é servida sem recálculo
+            (padrão: TTLS_PADRAO, ajustável por RESPONSE_CACHE_TTL_<ROTA>).
+        vencida (float): Segundos, após o TTL, em que a resposta vencida ainda é
+            servida enquanto é recalculada (padrão: RESPONSE_CACHE_STALE ou 120).
+        max_entradas (int): Máximo de respostas guardadas (as mais antigas saem primeiro).
+    """
+
+    def __init__(self, ttls=None, vencida=None, max_entradas=10000):
+        if ttls is None:
+            ttls = {
+                rota: float(os.getenv(f"RESPONSE_CACHE_TTL_{rota.upper()}", padrao))
+                for rota, padrao in TTLS_PADRAO.items()
+            }
+        self.ttls = ttls
+        self.vencida = float(os.getenv("RESPONSE_CACHE_STALE", "120")) if vencida is None else vencida
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()
+        self._versoes = {}
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.vencidas = 0
+        self.faltas = 0
+
+    def obter(self, user_id, rota, calcular):
+        """
+        Retorna a resposta de uma rota para o usuário, do cache ou recalculada.
+
+        Parâmetros:
+            user_id: ID do usuário.
+            rota (str): Nome da rota (chave de `ttls`).
+            calcular (callable): Sem argumentos; retorna (valor, guardar). Só
+                valores com guardar=True entram no cache (e.g., respostas 200).
+
+        Retorna:
+            tuple: (valor, estado), com estado "HIT", "STALE" ou "MISS".
+        """
+        ttl = self.ttls.get(rota, 0)
+        chave = (user_id, rota)
+        with self._lock:
+            versao = self._versoes.get(user_id, 0)
+            entrada = self._entradas.get(chave)
+            if entrada is not None and entrada.versao == versao:
+                idade = time.monotonic() - entrada.criada
+                if idade < ttl:
+                    self.acertos += 1
+                    return entrada.valor, "HIT"
+                if idade < ttl + self.vencida:
+                    self.vencidas += 1
+                    if not entrada.atualizando:
+                        entrada.atualizando = True
+                        threading.Thread(
+                            target=self._recalcular, args=(chave, versao, calcular, entrada),
+                            daemon=True, name=f"cache-{rota}",
+                        ).start()
+                    return entrada.valor, "STALE"
+            self.faltas += 1
+
+        valor, guardar = calcular()
+        if guardar:
+            self._guardar(chave, valor, versao)
+        return valor, "MISS"
+
+    def _recalcular(self, chave, versao, calcular, entrada):
+        try:
+            valor, guardar = calcular()
+            if guardar:
+                self._guardar(chave, valor, versao)
+        except Exception as e:
+            print(f"Erro ao recalcular {chave[1]} do usuário {chave[0]}: {e}")
+        finally:
+            entrada.atualizando = False
+
+    def _guardar(self, chave, valor, versao):
+        with self._lock:
+            # Invalidada durante o cálculo: o valor já nasceu desatualizado
+            if self._versoes.get(chave[0], 0) != versao:
+                return
+            self._entradas[chave] = _Entrada(valor, versao)
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def invalidar(self, user_id):
+        """Descarta as respostas do usuário e os recálculos em andamento."""
+        with self._lock:
+            self._versoes[user_id] = self._versoes.get(user_id, 0) + 1
+            for chave in [c for c in self._entradas if c[0] == user_id]:
+                del self._entradas[chave]
+
+    def estatisticas(self):
+        """Retorna acertos, respostas vencidas servidas, faltas e entradas guardadas."""
+        with self._lock:
+            return {
+                "hits": self.acertos,
+                "stale_hits": self.vencidas,
+                "misses": self.faltas,
+                "entries": len(self._entradas),
+                "ttls": dict(self.ttls),
+                "stale_seconds": self.vencida,
+            }
+
+
+cache_respostas = CacheRespostas()
@@ -0,0 +1,244 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .kline_stream import stream_klines
+
+
+class _Agendamento:
+    """Bot registrado no agendador."""
+
+    def __init__(self, user_id, criar_sessao, intervalo):
+        self.user_id = user_id
+        self.criar_sessao = criar_sessao
+        self.intervalo = intervalo
+        self.sessao = None
+        self.stop_flag = {'stop': False}
+        self.proxima_execucao = None
+        self.executando = False
+        self.ciclos = 0
+        self.ultimo_ciclo = None
+        self.ultimo_atraso = 0.0
+        self.erro = None
+
+
+class BotScheduler:
+    """
+    Agendador central dos bots: uma fila de prioridade com o próximo ciclo de cada usuário.
+
+    Uma única thread despacha os ciclos vencidos para um pool limitado de
+    trabalhadores, em vez de uma thread dormindo por usuário. A memória cresce
+    apenas com o estado de cada sessão (cliente, motores das médias), e parar
+    um bot não espera o fim do intervalo. Sessões em modo streaming são
+    antecipadas quando um candle dos seus ativos fecha.
+
+    Parâmetros:
+        trabalhadores (int): Ciclos executados em paralelo.
+    """
+
+    def __init__(self, trabalhadores=None):
+        self.trabalhadores = trabalhadores or int(os.getenv("BOT_SCHEDULER_WORKERS", "16"))
+        self._fila = []
+        self._sequencia = itertools.count()
+        self._agendamentos = {}
+        self._condicao = threading.Condition()
+        self._executor = None
+        self._vagas = threading.Semaphore(self.trabalhadores)
+        self._thread = None
+        self._thread_stream = None
+        self._atrasos = deque(maxlen=1000)
+
+    def _iniciar(self):
+        # Chamado com a condição adquirida; threads só sobem no primeiro bot
+        if self._thread is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.trabalhadores, thread_name_prefix="bot")
+            self._thread = threading.Thread(target=self._despachar, daemon=True, name="bot-scheduler")
+            self._thread.start()
+
+    def adicionar(self, user_id, criar_sessao, intervalo_minutos=30):
+        """
+        Agenda o bot de um usuário; o primeiro ciclo roda imediatamente.
+
+        Parâmetros:
+            user_id: Identificador do bot.
+            criar_sessao (callable): Cria a SessaoBot (executado no pool, fora da requisição).
+            intervalo_minutos (float): Intervalo entre ciclos (check_interval_minutes).
+        """
+        with self._condicao:
+            if self.ativo(user_id):
+                raise ValueError("Bot is already running")
+            agendamento = _Agendamento(user_id, criar_sessao, intervalo_minutos * 60)
+            self._agendamentos[user_id] = agendamento
+            self._enfileirar(agendamento, time.time())
+            self._iniciar()
+
+    def remover(self, user_id):
+        """
+        Para o bot de um usuário.
+
+        Um ciclo em andamento pula os ativos restantes; a sessão é encerrada
+        assim que ele termina.
+
+        Retorna:
+            bool: False se o bot não estava agendado.
+        """
+        with self._condicao:
+            agendamento = self._agendamentos.pop(user_id, None)
+            if agendamento is None:
+                return False
+            agendamento.stop_flag['stop'] = True
+            if not agendamento.executando and agendamento.sessao is not None:
+                self._executor.submit(self._encerrar, agendamento)
+            self._condicao.notify()
+            return True
+
+    def ativo(self, user_id):
+        """Indica se o bot do usuário está agendado."""
+        return user_id in self._agendamentos
+
+    def antecipar(self, user_ids):
+        """Coloca os próximos ciclos dos usuários para agora (e.g., quando um candle fecha)."""
+        with self._condicao:
+            agora = time.time()
+            for user_id in user_ids:
+                agendamento = self._agendamentos.get(user_id)
+                if agendamento is not None and not agendamento.executando and agendamento.proxima_execucao > agora:
+                    self._enfileirar(agendamento, agora)
+
+    def status(self, user_id):
+        """
+        Retorna o estado do bot de um usuário, ou None se não estiver agendado.
+
+        Retorna:
+            dict: cycle_in_progress, next_run_at, last_cycle_at, cycles, queue_lag_seconds e error.
+        """
+        with self._condicao:
+            agendamento = self._agendamentos.get(user_id)
+            if agendamento is None:
+                return None
+            return {
+                "cycle_in_progress": agendamento.executando,
+                "next_run_at": agendamento.proxima_execucao,
+                "last_cycle_at": agendamento.ultimo_ciclo,
+                "cycles": agendamento.ciclos,
+                "queue_lag_seconds": round(agendamento.ultimo_atraso, 3),
+                "error": agendamento.erro,
+            }
+
+    def estatisticas(self):
+        """Número de bots, ciclos em execução e atraso da fila (segundos entre o horário agendado e o início)."""
+        with self._condicao:
+            agora = time.time()
+            vencidos = [a.proxima_execucao for a in self._agendamentos.values()
+                        if not a.executando and a.proxima_execucao <= agora]
+            atrasos = self._atrasos
+            return {
+                "bots": len(self._agendamentos),
+                "workers": self.trabalhadores,
+                "running_cycles": sum(a.executando for a in self._agendamentos.values()),
+                "due_cycles": len(vencidos),
+                "current_lag_seconds": round(agora - min(vencidos), 3) if vencidos else 0.0,
+                "avg_lag_seconds": round(sum(atrasos) / len(atrasos), 3) if atrasos else 0.0,
+                "max_lag_seconds": round(max(atrasos), 3) if atrasos else 0.0,
+            }
+
+    def _enfileirar(self, agendamento, quando):
+        agendamento.proxima_execucao = quando
+        heapq.heappush(self._fila, (quando, next(self._sequencia), agendamento))
+        self._condicao.notify()
+
+    def _despachar(self):
+        while True:
+            # Só tira um ciclo da fila quando há trabalhador livre, para que o
+            # atraso medido seja o real e paradas/antecipações valham até o início
+            self._vagas.acquire()
+            with self._condicao:
+                while True:
+                    # Entradas antigas (reagendadas ou de bots removidos) são descartadas ao sair da fila
+                    while self._fila and self._obsoleta(*self._fila[0]):
+                        heapq.heappop(self._fila)
+                    espera = self._fila[0][0] - time.time() if self._fila else None
+                    if espera is not None and espera <= 0:
+                        break
+                    self._condicao.wait(espera)
+                quando, _, agendamento = heapq.heappop(self._fila)
+                agendamento.executando = True
+                agendamento.ultimo_atraso = time.time() - quando
+                self._atrasos.append(agendamento.ultimo_atraso)
+            self._executor.submit(self._executar, agendamento)
+
+    def _obsoleta(self, quando, _, agendamento):
+        return (self._agendamentos.get(agendamento.user_id) is not agendamento
+                or agendamento.executando or agendamento.proxima_execucao != quando)
+
+    def _executar(self, agendamento):
+        inicio = time.time()
+        try:
+            if agendamento.sessao is None:
+                agendamento.sessao = agendamento.criar_sessao()
+                if agendamento.sessao.streaming:
+                    self._acompanhar_stream()
+            if not agendamento.stop_flag['stop']:
+                agendamento.sessao.executar_ciclo(agendamento.stop_flag)
+            agendamento.erro = None
+        except Exception as e:
+            print(f"Erro no ciclo do bot {agendamento.user_id}: {e}")
+            agendamento.erro = str(e)
+            if agendamento.sessao is None:
+                # Sem sessão (e.g., chaves inválidas) o bot não tem como rodar
+                with self._condicao:
+                    if self._agendamentos.get(agendamento.user_id) is agendamento:
+                        del self._agendamentos[agendamento.user_id]
+        self._vagas.release()
+        with self._condicao:
+            agendamento.executando = False
+            agendamento.ciclos += 1
+            agendamento.ultimo_ciclo = inicio
+            if self._agendamentos.get(agendamento.user_id) is agendamento:
+                # Mantém a cadência; se o ciclo atrasou mais que um intervalo, o próximo roda já
+                self._enfileirar(agendamento, max(inicio + agendamento.intervalo, time.time()))
+                return
+        self._encerrar(agendamento)
+
+    def _encerrar(self, agendamento):
+        if agendamento.sessao is not None:
+            try:
+                agendamento.sessao.encerrar()
+            except Exception as e:
+                print(f"Erro ao encerrar bot {agendamento.user_id}: {e}")
+            agendamento.sessao = None
+        print(f"Bot parado para usuário {agendamento.user_id}")
+
+    def _acompanhar_stream(self):
+        with self._condicao:
+            if self._thread_stream is None:
+                self._thread_stream = threading.Thread(target=self._observar_fechamentos, daemon=True)
+                self._thread_stream.start()
+
+    def _observar_fechamentos(self):
+        # Antecipa os ciclos das sessões em streaming quando um candle dos seus ativos fecha
+        while True:
+            with self._condicao:
+                sessoes = [(a.user_id, a.sessao) for a in self._agendamentos.values()
+                           if a.sessao is not None and a.sessao.streaming]
+            pares = {}
+            for user_id, sessao in sessoes:
+                pares.setdefault(sessao.intervalo, set()).update(sessao.ativos)
+            if not pares:
+                time.sleep(5)
+                continue
+            # Todas as sessões usam candles de 30 minutos; basta acompanhar um intervalo
+            intervalo, simbolos = next(iter(pares.items()))
+            simbolos = sorted(simbolos)
+            marcador = stream_klines.fechamentos(simbolos, intervalo)
+            if stream_klines.aguardar_fechamento(simbolos, intervalo, marcador, timeout=5):
+                # Os candles de todos os ativos fecham juntos; dar tempo aos demais eventos
+                stream_klines.aguardar_fechamento(simbolos, intervalo, marcador + len(simbolos) - 1, timeout=2)
+                self.antecipar([user_id for user_id, _ in sessoes])
+
+
+agendador_bots = BotScheduler()
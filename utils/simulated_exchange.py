@@ -0,0 +1,408 @@
+"""
+Corretora simulada em processo, com a mesma interface do `binance.client.Client`.
+
+Implementa o subconjunto da API usado pelo projeto (klines, tickers,
+exchangeInfo, conta, ordens a mercado, trades e horário do servidor) sobre
+preços gravados ou gerados. Serve de backend para benchmarks, backtests e
+testes de carga sem conta real:
+
+    client = SimulatedClient(saldos={'USDT': 1000}, latencia=(0.05, 0.2), taxa_erro=0.01)
+    client.carregar_do_store('BTCUSDT')
+    run_bot_loop(client=client, market_data=MarketDataHub(client), enabled_assets=['BTCUSDT'])
+"""
+import json
+import math
+import random
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+from binance.exceptions import BinanceAPIException
+from binance.helpers import interval_to_milliseconds
+
+from .candle_store import store_candles
+from .rate_limit import peso_requisicao
+
+
+class _Resposta:
+    """Imita a resposta HTTP guardada em `Client.response` (apenas status e cabeçalhos)."""
+
+    def __init__(self, status_code, peso_minuto):
+        self.status_code = status_code
+        self.headers = {"X-MBX-USED-WEIGHT-1M": str(peso_minuto)}
+        self.text = ""
+
+
+class _Serie:
+    """Fechamentos de um símbolo, um por candle, a partir de `inicio`."""
+
+    def __init__(self, inicio, fechamentos, gerador=None):
+        self.inicio = inicio
+        self.fechamentos = [float(p) for p in fechamentos]
+        self.gerador = gerador
+
+    def garantir(self, n):
+        # Séries geradas crescem sob demanda; séries gravadas terminam no último candle
+        while self.gerador is not None and len(self.fechamentos) < n:
+            self.fechamentos.append(self.gerador(self.fechamentos[-1]))
+        return min(n, len(self.fechamentos))
+
+
+class SimulatedClient:
+    """
+    Corretora simulada compatível com o subconjunto do `Client` usado pelo bot.
+
+    O tempo simulado começa no último candle com histórico disponível e só
+    avança com `avancar` (ou sozinho, com `segundos_por_candle`). O preço de
+    um símbolo é o fechamento do candle corrente, que fica aberto até o
+    próximo avanço. Os caches de MarketDataHub usam o relógio real, então
+    avanços mais rápidos que a validade deles exigem ler as klines direto do
+    cliente.
+
+    Parâmetros:
+        saldos (dict): Saldos livres iniciais por ativo (padrão: 1000 USDT).
+        intervalo (str): Intervalo dos candles simulados.
+        latencia (float | tuple): Atraso por chamada em segundos, fixo ou (mínimo, máximo).
+        taxa_erro (float): Probabilidade de uma chamada falhar com erro interno da Binance.
+        comissao (float): Comissão por operação, descontada do ativo recebido.
+        semente (int): Semente dos preços gerados, da latência e dos erros.
+        segundos_por_candle (float): Se informado, o tempo simulado avança
+            sozinho um candle a cada tantos segundos reais.
+    """
+
+    def __init__(self, saldos=None, intervalo="30m", latencia=0.0, taxa_erro=0.0,
+                 comissao=0.001, semente=42, segundos_por_candle=None):
+        self.intervalo = intervalo
+        self.passo = interval_to_milliseconds(intervalo)
+        self.latencia = latencia
+        self.taxa_erro = taxa_erro
+        self.comissao = comissao
+        self.semente = semente
+        self.segundos_por_candle = segundos_por_candle
+        self.saldos = Counter({"USDT": 1000.0} if saldos is None else {a: float(v) for a, v in saldos.items()})
+        self.response = None
+        self.chamadas = Counter()
+        self.peso_total = 0
+
+        agora = int(time.time() * 1000)
+        self._tempo_base = agora - agora % self.passo
+        self._relogio_real = time.monotonic()
+        self._avancos = 0
+        self._series = {}
+        self._trades = {}
+        self._proximo_trade = 1
+        self._proxima_ordem = 1
+        self._falhas_forcadas = []
+        self._peso_minuto = Counter()
+        self._aleatorio = random.Random(semente)
+        self._lock = threading.RLock()
+
+    # ----- Preços -----
+
+    def definir_precos(self, simbolo, fechamentos, inicio=None):
+        """
+        Usa uma série gravada de fechamentos para o símbolo.
+
+        Parâmetros:
+            fechamentos (list): Preço de fechamento de cada candle, em ordem cronológica.
+            inicio (int): Abertura (ms) do primeiro candle. Por padrão a série
+                é alinhada para que o último candle seja o corrente.
+        """
+        with self._lock:
+            if inicio is None:
+                inicio = self.tempo - self.tempo % self.passo - (len(fechamentos) - 1) * self.passo
+            self._series[simbolo] = _Serie(inicio, fechamentos)
+
+    def carregar_do_store(self, simbolo, store=store_candles, candles_iniciais=1000):
+        """
+        Reproduz os candles gravados no armazém local.
+
+        O tempo simulado é posicionado `candles_iniciais` candles após o início
+        da série, de modo que a reprodução tenha histórico para as médias.
+        """
+        colunas = store.ler(simbolo, self.intervalo)
+        if len(colunas["tempo_abertura"]) == 0:
+            raise ValueError(f"Nenhum candle de {simbolo} ({self.intervalo}) no armazém")
+        with self._lock:
+            inicio = int(colunas["tempo_abertura"][0])
+            self._series[simbolo] = _Serie(inicio, np.asarray(colunas["preco_fechamento"]))
+            self._tempo_base = inicio + (candles_iniciais - 1) * self.passo
+            self._avancos = 0
+
+    def gerar_precos(self, simbolo, preco_inicial=100.0, volatilidade=0.01, historico=1000):
+        """Gera preços por passeio aleatório geométrico, com `historico` candles antes do atual."""
+        rng = np.random.default_rng([self.semente, sum(map(ord, simbolo))])
+        retornos = rng.normal(0, volatilidade, historico - 1)
+        fechamentos = preco_inicial * np.exp(np.concatenate(([0.0], np.cumsum(retornos))))
+        with self._lock:
+            inicio = self.tempo - self.tempo % self.passo - (historico - 1) * self.passo
+            self._series[simbolo] = _Serie(
+                inicio, fechamentos, gerador=lambda ultimo: ultimo * math.exp(rng.normal(0, volatilidade))
+            )
+
+    def _serie(self, simbolo):
+        if simbolo not in self._series:
+            # Símbolos sem série definida recebem preços gerados
+            self.gerar_precos(simbolo)
+        return self._series[simbolo]
+
+    @property
+    def tempo(self):
+        """Horário simulado atual (ms)."""
+        tempo = self._tempo_base + self._avancos * self.passo
+        if self.segundos_por_candle:
+            tempo += int((time.monotonic() - self._relogio_real) / self.segundos_por_candle * self.passo)
+        return tempo
+
+    def avancar(self, candles=1):
+        """
+        Avança o tempo simulado.
+
+        Retorna:
+            bool: False se alguma série gravada chegou ao fim.
+        """
+        with self._lock:
+            self._avancos += candles
+            return all(
+                s.gerador is not None or (self.tempo - s.inicio) // self.passo < len(s.fechamentos)
+                for s in self._series.values()
+            )
+
+    def definir_tempo(self, tempo):
+        """Posiciona o tempo simulado num horário (ms)."""
+        with self._lock:
+            self._tempo_base = tempo
+            self._avancos = 0
+            self._relogio_real = time.monotonic()
+
+    def fechamentos(self, simbolo, quantidade=None):
+        """
+        Série completa de fechamentos de um símbolo (usada por replays).
+
+        Parâmetros:
+            quantidade (int): Para séries geradas, quantos candles garantir.
+
+        Retorna:
+            tuple: (abertura do primeiro candle em ms, array de fechamentos).
+        """
+        with self._lock:
+            serie = self._serie(simbolo)
+            if quantidade is not None:
+                serie.garantir(quantidade)
+            return serie.inicio, np.asarray(serie.fechamentos)
+
+    def _indice_atual(self, serie):
+        indice = max((self.tempo - serie.inicio) // self.passo, 0)
+        return serie.garantir(indice + 1) - 1
+
+    def preco(self, simbolo):
+        """Preço atual (fechamento do candle corrente) de um símbolo."""
+        with self._lock:
+            serie = self._serie(simbolo)
+            return serie.fechamentos[self._indice_atual(serie)]
+
+    def _candle(self, serie, i):
+        fechamento = serie.fechamentos[i]
+        abertura = serie.fechamentos[i - 1] if i > 0 else fechamento
+        inicio = serie.inicio + i * self.passo
+        return [
+            inicio, f"{abertura:.8f}", f"{max(abertura, fechamento):.8f}", f"{min(abertura, fechamento):.8f}",
+            f"{fechamento:.8f}", "1000.00000000", inicio + self.passo - 1, f"{1000 * fechamento:.8f}",
+            100, "500.00000000", f"{500 * fechamento:.8f}", "0",
+        ]
+
+    # ----- Infraestrutura das chamadas -----
+
+    def falhar_proximas(self, quantidade=1, metodo=None, codigo=-1001, status=500,
+                        mensagem="Internal error; unable to process your request. Please try again."):
+        """Faz as próximas `quantidade` chamadas (de `metodo`, ou de qualquer um) falharem."""
+        with self._lock:
+            self._falhas_forcadas.extend([(metodo, codigo, status, mensagem)] * quantidade)
+
+    def _chamar(self, metodo, params):
+        latencia = self.latencia
+        if isinstance(latencia, (tuple, list)):
+            with self._lock:
+                latencia = self._aleatorio.uniform(*latencia)
+        if latencia:
+            time.sleep(latencia)
+
+        with self._lock:
+            peso = peso_requisicao(metodo, params)
+            minuto = int(time.time() // 60)
+            self._peso_minuto = Counter({minuto: self._peso_minuto[minuto] + peso})
+            self.chamadas[metodo] += 1
+            self.peso_total += peso
+
+            falha = next((f for f in self._falhas_forcadas if f[0] in (None, metodo)), None)
+            if falha is not None:
+                self._falhas_forcadas.remove(falha)
+                self._erro(*falha[1:])
+            if self.taxa_erro and self._aleatorio.random() < self.taxa_erro:
+                self._erro(-1001, 500, "Internal error; unable to process your request. Please try again.")
+            self.response = _Resposta(200, self._peso_minuto[minuto])
+
+    def _erro(self, codigo, status, mensagem):
+        self.response = _Resposta(status, sum(self._peso_minuto.values()))
+        raise BinanceAPIException(self.response, status, json.dumps({"code": codigo, "msg": mensagem}))
+
+    # ----- API pública (mesmos nomes e parâmetros do Client) -----
+
+    def ping(self):
+        self._chamar("ping", {})
+        return {}
+
+    def get_server_time(self):
+        self._chamar("get_server_time", {})
+        return {"serverTime": self.tempo}
+
+    def get_klines(self, **params):
+        self._chamar("get_klines", params)
+        simbolo, intervalo = params["symbol"], params["interval"]
+        if intervalo != self.intervalo:
+            self._erro(-1120, 400, f"Invalid interval: simulação configurada para {self.intervalo}.")
+        limite = min(int(params.get("limit", 500)), 1000)
+        with self._lock:
+            serie = self._serie(simbolo)
+            atual = self._indice_atual(serie)
+            fim = atual
+            if params.get("endTime") is not None:
+                fim = min(fim, (int(params["endTime"]) - serie.inicio) // self.passo)
+            if params.get("startTime") is not None:
+                primeiro = max(0, -(-(int(params["startTime"]) - serie.inicio) // self.passo))
+                ultimo = min(fim, primeiro + limite - 1)
+            else:
+                ultimo = fim
+                primeiro = max(0, fim - limite + 1)
+            return [self._candle(serie, i) for i in range(primeiro, ultimo + 1)]
+
+    def get_symbol_ticker(self, **params):
+        self._chamar("get_symbol_ticker", params)
+        if params.get("symbol"):
+            return {"symbol": params["symbol"], "price": f"{self.preco(params['symbol']):.8f}"}
+        simbolos = json.loads(params["symbols"]) if params.get("symbols") else list(self._series)
+        return [{"symbol": s, "price": f"{self.preco(s):.8f}"} for s in simbolos]
+
+    def _info_simbolo(self, simbolo):
+        # Passo de quantidade e de preço proporcionais à ordem de grandeza do preço
+        ordem = math.floor(math.log10(self.preco(simbolo)))
+        step = 10.0 ** min(max(-(ordem + 3), -8), 0)
+        tick = 10.0 ** min(max(ordem - 4, -8), 0)
+        return {
+            "symbol": simbolo,
+            "status": "TRADING",
+            "baseAsset": simbolo[:-4] if simbolo.endswith("USDT") else simbolo,
+            "quoteAsset": "USDT",
+            "filters": [
+                {"filterType": "PRICE_FILTER", "minPrice": f"{tick:.8f}", "maxPrice": "1000000.00000000",
+                 "tickSize": f"{tick:.8f}"},
+                {"filterType": "LOT_SIZE", "minQty": f"{step:.8f}", "maxQty": "9000000.00000000",
+                 "stepSize": f"{step:.8f}"},
+                {"filterType": "NOTIONAL", "minNotional": "5.00000000", "applyMinToMarket": True},
+            ],
+        }
+
+    def get_symbol_info(self, symbol):
+        self._chamar("get_symbol_info", {})
+        return self._info_simbolo(symbol)
+
+    def get_exchange_info(self):
+        self._chamar("get_exchange_info", {})
+        with self._lock:
+            return {"serverTime": self.tempo, "symbols": [self._info_simbolo(s) for s in list(self._series)]}
+
+    def get_account(self, **params):
+        self._chamar("get_account", params)
+        with self._lock:
+            return {
+                "canTrade": True,
+                "accountType": "SPOT",
+                "updateTime": self.tempo,
+                "balances": [
+                    {"asset": a, "free": f"{v:.8f}", "locked": "0.00000000"} for a, v in self.saldos.items()
+                ],
+            }
+
+    def create_order(self, **params):
+        self._chamar("create_order", params)
+        simbolo, lado = params["symbol"], params["side"]
+        if params.get("type") != "MARKET":
+            self._erro(-1116, 400, "Invalid orderType: a simulação só executa ordens MARKET.")
+        with self._lock:
+            info = self._info_simbolo(simbolo)
+            filtros = {f["filterType"]: f for f in info["filters"]}
+            preco = self.preco(simbolo)
+            if params.get("quantity") is not None:
+                quantidade = float(params["quantity"])
+            else:
+                quantidade = float(params["quoteOrderQty"]) / preco
+            step = float(filtros["LOT_SIZE"]["stepSize"])
+            quantidade = math.floor(round(quantidade / step, 6)) * step
+
+            if quantidade < float(filtros["LOT_SIZE"]["minQty"]):
+                self._erro(-1013, 400, "Filter failure: LOT_SIZE")
+            if quantidade * preco < float(filtros["NOTIONAL"]["minNotional"]):
+                self._erro(-1013, 400, "Filter failure: NOTIONAL")
+
+            base, total = info["baseAsset"], quantidade * preco
+            if lado == "BUY":
+                if self.saldos["USDT"] < total:
+                    self._erro(-2010, 400, "Account has insufficient balance for requested action.")
+                self.saldos["USDT"] -= total
+                comissao, ativo_comissao = quantidade * self.comissao, base
+                self.saldos[base] += quantidade - comissao
+            elif lado == "SELL":
+                if self.saldos[base] < quantidade - 1e-12:
+                    self._erro(-2010, 400, "Account has insufficient balance for requested action.")
+                self.saldos[base] -= quantidade
+                comissao, ativo_comissao = total * self.comissao, "USDT"
+                self.saldos["USDT"] += total - comissao
+            else:
+                self._erro(-1102, 400, f"Invalid side: {lado}")
+
+            ordem_id, trade_id = self._proxima_ordem, self._proximo_trade
+            self._proxima_ordem += 1
+            self._proximo_trade += 1
+            trade = {
+                "symbol": simbolo, "id": trade_id, "orderId": ordem_id, "orderListId": -1,
+                "price": f"{preco:.8f}", "qty": f"{quantidade:.8f}", "quoteQty": f"{total:.8f}",
+                "commission": f"{comissao:.8f}", "commissionAsset": ativo_comissao, "time": self.tempo,
+                "isBuyer": lado == "BUY", "isMaker": False, "isBestMatch": True,
+            }
+            self._trades.setdefault(simbolo, []).append(trade)
+            return {
+                "symbol": simbolo, "orderId": ordem_id, "orderListId": -1,
+                "clientOrderId": f"sim{ordem_id}", "transactTime": self.tempo,
+                "price": "0.00000000", "origQty": f"{quantidade:.8f}", "executedQty": f"{quantidade:.8f}",
+                "cummulativeQuoteQty": f"{total:.8f}", "status": "FILLED", "timeInForce": "GTC",
+                "type": "MARKET", "side": lado,
+                "fills": [{"price": trade["price"], "qty": trade["qty"], "commission": trade["commission"],
+                           "commissionAsset": ativo_comissao, "tradeId": trade_id}],
+            }
+
+    def get_my_trades(self, **params):
+        self._chamar("get_my_trades", params)
+        limite = min(int(params.get("limit", 500)), 1000)
+        with self._lock:
+            trades = self._trades.get(params["symbol"], [])
+            if params.get("fromId") is not None:
+                trades = [t for t in trades if t["id"] >= int(params["fromId"])][:limite]
+            else:
+                if params.get("startTime") is not None:
+                    trades = [t for t in trades if t["time"] >= int(params["startTime"])]
+                if params.get("endTime") is not None:
+                    trades = [t for t in trades if t["time"] <= int(params["endTime"])]
+                trades = trades[-limite:]
+            return [dict(t) for t in trades]
+
+    # ----- Métricas -----
+
+    def estatisticas(self):
+        """Chamadas por método, peso total e peso usado no minuto corrente."""
+        with self._lock:
+            return {
+                "chamadas": dict(self.chamadas),
+                "peso_total": self.peso_total,
+                "peso_minuto": self._peso_minuto[int(time.time() // 60)],
+            }
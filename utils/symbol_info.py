@@ -0,0 +1,122 @@
+import math
+import threading
+import time
+
+
+class SymbolInfoCache:
+    """
+    Cache de metadados de símbolos carregado de uma única chamada a exchangeInfo.
+
+    Para cada símbolo guarda os filtros já convertidos em float e a precisão
+    decimal da quantidade e do preço, evitando varrer a lista de filtros e
+    recalcular logaritmos a cada ordem. Os dados são recarregados após `ttl`
+    segundos.
+    """
+
+    def __init__(self, ttl=3600):
+        self.ttl = ttl
+        self._simbolos = {}
+        self._negociaveis = set()
+        self._carregado_em = 0
+        self._lock = threading.Lock()
+
+    def negociaveis(self, client, simbolos):
+        """
+        Filtra os símbolos com status TRADING no exchangeInfo.
+
+        Parâmetros:
+            client (Client): Cliente Binance usado caso o cache precise ser carregado.
+            simbolos (iterable): Símbolos a verificar.
+
+        Retorna:
+            set: Símbolos negociáveis; todos os pedidos se o exchangeInfo não puder ser carregado.
+        """
+        simbolos = set(simbolos)
+        with self._lock:
+            try:
+                if time.time() - self._carregado_em > self.ttl:
+                    self._carregar(client)
+                elif not simbolos <= self._simbolos.keys() and time.time() - self._carregado_em > 60:
+                    self._carregar(client)
+            except Exception as e:
+                print(f"Erro ao carregar exchangeInfo, símbolos não verificados: {e}")
+                return simbolos
+            return simbolos & self._negociaveis
+
+    def obter(self, client, simbolo):
+        """
+        Retorna os filtros pré-calculados de um símbolo.
+
+        Parâmetros:
+            client (Client): Cliente Binance usado caso o cache precise ser carregado.
+            simbolo (str): Símbolo do ativo (e.g., 'BNBUSDT').
+
+        Retorna:
+            dict: min_qty, max_qty, step_size, tick_size, min_notional,
+            precision e price_precision.
+        """
+        with self._lock:
+            if time.time() - self._carregado_em > self.ttl:
+                self._carregar(client)
+            elif simbolo not in self._simbolos and time.time() - self._carregado_em > 60:
+                # Símbolo possivelmente listado depois da última carga
+                self._carregar(client)
+            if simbolo not in self._simbolos:
+                raise ValueError(f"Símbolo {simbolo} não encontrado na Binance")
+            return self._simbolos[simbolo]
+
+    def _carregar(self, client):
+        try:
+            info = client.get_exchange_info()
+        except Exception as e:
+            if not self._simbolos:
+                raise
+            print(f"Erro ao atualizar exchangeInfo, usando dados anteriores: {e}")
+            self._carregado_em = time.time()
+            return
+        self._simbolos = {s['symbol']: extrair_filtros(s) for s in info.get('symbols', [])}
+        self._negociaveis = {s['symbol'] for s in info.get('symbols', []) if s.get('status') == 'TRADING'}
+        self._carregado_em = time.time()
+
+    def limpar(self):
+        """Descarta os metadados carregados."""
+        with self._lock:
+            self._simbolos = {}
+            self._negociaveis = set()
+            self._carregado_em = 0
+
+
+def extrair_filtros(symbol_info):
+    """
+    Converte os filtros de um símbolo do exchangeInfo em valores numéricos.
+
+    Parâmetros:
+        symbol_info (dict): Entrada de 'symbols' do exchangeInfo.
+
+    Retorna:
+        dict: Filtros e precisões do símbolo.
+    """
+    filtros = {f['filterType']: f for f in symbol_info.get('filters', [])}
+    lot_size = filtros.get('LOT_SIZE', {})
+    price_filter = filtros.get('PRICE_FILTER', {})
+    notional = filtros.get('NOTIONAL') or filtros.get('MIN_NOTIONAL') or {}
+
+    step_size = float(lot_size.get('stepSize', 0))
+    tick_size = float(price_filter.get('tickSize', 0))
+    return {
+        'min_qty': float(lot_size.get('minQty', 0)),
+        'max_qty': float(lot_size.get('maxQty', 0)),
+        'step_size': step_size,
+        'tick_size': tick_size,
+        'min_notional': float(notional.get('minNotional', 0)),
+        'precision': int(round(-math.log(step_size, 10))) if step_size > 0 else 8,
+        'price_precision': int(round(-math.log(tick_size, 10))) if tick_size > 0 else 8,
+    }
+
+
+cache_simbolos = SymbolInfoCache()
+
+
+def obter_filtros(client, simbolo):
+    """Atalho para `cache_simbolos.obter(client, simbolo)`."""
+    return cache_simbolos.obter(client, simbolo)
@@ -1,70 +1,223 @@
-import sqlite3
 from binance.client import Client
 import os
 from dotenv import load_dotenv
+from utils.assets import TOP_ASSETS
+from utils.db import conectar
+from utils.positions import reconstruir_posicoes
+from utils.rate_limit import LimitePesoExcedido
 
-# Use persistent disk path for Render or current directory for local development
-DB_DIR = os.environ.get('RENDER') and '/opt/render/project/src' or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DB_PATH = os.path.join(DB_DIR, 'cryptobot.db')
+# Trades por página de get_my_trades (máximo da Binance)
+LIMITE_PAGINA = 1000
 
-def sync_transactions_from_binance(user_id):
+def ativos_habilitados(cursor, user_id):
+    """Retorna os ativos habilitados pelo usuário (padrão: os 5 primeiros de TOP_ASSETS)."""
+    cursor.execute('''
+        SELECT asset_symbol FROM asset_settings
+        WHERE user_id = ? AND enabled = 1
+    ''', (user_id,))
+    ativos = [row[0] for row in cursor.fetchall()]
+    return ativos or [a["symbol"] for a in TOP_ASSETS[:5]]
+
+def ultimo_trade_sincronizado(cursor, user_id, ativo):
     """
-    Syncs transactions from Binance order history to the database.
-    Only syncs orders that are not already in the database.
+    Retorna o último trade_id sincronizado de um ativo, ou None se nunca sincronizado.
+
+    Sem cursor gravado, usa o maior trade_id já presente em transactions
+    (gravadas pela sincronização: antes da primeira ordem do bot num ativo,
+    `gravar_pagina` fixa o cursor, para os fills do bot não contarem aqui).
+    """
+    cursor.execute(
+        'SELECT last_trade_id FROM sync_cursors WHERE user_id = ? AND asset = ?',
+        (user_id, ativo)
+    )
+    row = cursor.fetchone()
+    if row is not None:
+        return row[0]
+    cursor.execute(
+        'SELECT MAX(trade_id) FROM transactions WHERE user_id = ? AND asset = ?',
+        (user_id, ativo)
+    )
+    return cursor.fetchone()[0]
+
+def gravar_pagina(cursor, user_id, ativo, trades, avancar_cursor=True):
+    """
+    Grava uma página de trades da Binance e avança o cursor do ativo.
+
+    Trades já gravados são ignorados pela chave única (user_id, asset,
+    trade_id). Transações antigas (sem trade_id) com mesma quantidade, preço e
+    horário recebem o trade_id em vez de serem duplicadas. Se a página tiver
+    trades anteriores a outros já gravados, a posição do ativo é reconstruída
+    (o trigger de posições aplica os trades na ordem de inserção). A transação
+    é confirmada por quem chama. Com `avancar_cursor=False` (ordens do bot), o
+    cursor de sincronização não avança; se ainda não existir, é criado na
+    posição atual, antes do fill.
+
+    Retorna:
+        int: Número de transações inseridas.
+    """
+    linhas = [
+        (
+            user_id, ativo, 'BUY' if t['isBuyer'] else 'SELL',
+            float(t['qty']), float(t['price']), float(t['qty']) * float(t['price']),
+            t['time'], t['id'], t.get('orderId')
+        )
+        for t in sorted(trades, key=lambda t: (t['time'], t['id']))
+    ]
+
+    if not avancar_cursor:
+        ultimo = ultimo_trade_sincronizado(cursor, user_id, ativo)
+        cursor.execute('''
+            INSERT OR IGNORE INTO sync_cursors (user_id, asset, last_trade_id)
+            VALUES (?, ?, ?)
+        ''', (user_id, ativo, -1 if ultimo is None else ultimo))
+
+    # Comparação feita no SQLite, com a mesma ordenação da reconstrução
+    cursor.execute(
+        'SELECT 1 FROM transactions WHERE user_id = ? AND asset = ? AND timestamp > ? LIMIT 1',
+        (user_id, ativo, linhas[0][6])
+    )
+    fora_de_ordem = cursor.fetchone() is not None
+
+    cursor.execute(
+        'SELECT 1 FROM transactions WHERE user_id = ? AND asset = ? AND trade_id IS NULL LIMIT 1',
+        (user_id, ativo)
+    )
+    if cursor.fetchone() is not None:
+        cursor.executemany('''
+            UPDATE transactions SET trade_id = ?, order_id = ?
+            WHERE id = (
+                SELECT id FROM transactions
+                WHERE user_id = ? AND asset = ? AND trade_id IS NULL
+                AND timestamp = ? AND quantity = ? AND price = ?
+                ORDER BY id LIMIT 1
+            )
+            AND NOT EXISTS (
+                SELECT 1 FROM transactions WHERE user_id = ? AND asset = ? AND trade_id = ?
+            )
+        ''', [(l[7], l[8], user_id, ativo, l[6], l[3], l[4], user_id, ativo, l[7]) for l in linhas])
+
+    # rowcount não conta as linhas alteradas pelo trigger de posições
+    cursor.executemany('''
+        INSERT OR IGNORE INTO transactions
+        (user_id, asset, type, quantity, price, total, timestamp, trade_id, order_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', linhas)
+    inseridas = cursor.rowcount
+    if inseridas and fora_de_ordem:
+        reconstruir_posicoes(cursor, user_id, ativo)
+    if not avancar_cursor:
+        return inseridas
+
+    cursor.execute('''
+        INSERT INTO sync_cursors (user_id, asset, last_trade_id, updated_at)
+        VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT (user_id, asset) DO UPDATE SET
+            last_trade_id = MAX(last_trade_id, excluded.last_trade_id),
+            updated_at = excluded.updated_at
+    ''', (user_id, ativo, max(t['id'] for t in trades)))
+    return inseridas
+
+def registrar_ordem(conn, user_id, ativo, ordem):
+    """
+    Grava as execuções (fills) de uma ordem enviada pelo bot como transações.
+
+    O cursor de sincronização não avança: trades feitos fora do bot continuam
+    sendo buscados, e a sincronização ignora os já gravados aqui pelo trade_id.
+
+    Parâmetros:
+        conn: Conexão do banco (a transação é confirmada aqui).
+        user_id: ID do usuário.
+        ativo (str): Símbolo da ordem.
+        ordem (dict): Resposta de `create_order`.
+
+    Retorna:
+        int: Número de transações inseridas.
+    """
+    trades = [
+        {
+            'id': fill['tradeId'], 'orderId': ordem.get('orderId'), 'qty': fill['qty'],
+            'price': fill['price'], 'time': ordem.get('transactTime'), 'isBuyer': ordem.get('side') == 'BUY',
+        }
+        for fill in ordem.get('fills', [])
+    ]
+    if not trades:
+        return 0
+    try:
+        inseridas = gravar_pagina(conn.cursor(), user_id, ativo, trades, avancar_cursor=False)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return inseridas
+
+def sincronizar_trades(client, conn, user_id, ativos=None):
+    """
+    Sincroniza os trades da Binance a partir do último trade gravado de cada ativo.
+
+    Pagina com `fromId` a partir do cursor de (usuário, ativo) e grava cada
+    página numa única transação. Uma conta sem trades novos custa uma chamada
+    por ativo e nenhuma escrita no banco.
+
+    Parâmetros:
+        client: Cliente Binance do usuário.
+        conn: Conexão do banco (de `utils.db.conectar`).
+        user_id: ID do usuário.
+        ativos (list): Símbolos a sincronizar (padrão: ativos habilitados do usuário).
+
+    Retorna:
+        dict: Ativo -> transações inseridas; ativos com erro ficam de fora.
+
+    Raises:
+        LimitePesoExcedido: Se o governador de peso recusar uma chamada; as
+            páginas anteriores ficam gravadas.
     """
-    load_dotenv()
-    api_key = os.getenv("KEY_BINANCE")
-    api_secret = os.getenv("SECRET_BINANCE")
-    client = Client(api_key, api_secret)
-    
-    ativos = ["BNBUSDT", "BTCUSDT", "ETHUSDT", "SOLUSDT", "XRPUSDT"]
-    
-    conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
-    
+    if ativos is None:
+        ativos = ativos_habilitados(cursor, user_id)
+
+    resultado = {}
     for ativo in ativos:
         try:
-            # Get recent trades from Binance
-            trades = client.get_my_trades(symbol=ativo, limit=500)
-            
-            for trade in trades:
-                # Check if transaction already exists
-                cursor.execute('''
-                    SELECT id FROM transactions 
-                    WHERE user_id = ? AND asset = ? 
-                    AND quantity = ? AND price = ? AND timestamp = ?
-                ''', (
-                    user_id,
-                    ativo,
-                    float(trade['qty']),
-                    float(trade['price']),
-                    trade['time']
-                ))
-                
-                if cursor.fetchone() is None:
-                    # Insert new transaction
-                    trade_type = 'BUY' if trade['isBuyer'] else 'SELL'
-                    cursor.execute('''
-                        INSERT INTO transactions 
-                        (user_id, asset, type, quantity, price, total, timestamp)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        user_id,
-                        ativo,
-                        trade_type,
-                        float(trade['qty']),
-                        float(trade['price']),
-                        float(trade['qty']) * float(trade['price']),
-                        trade['time']
-                    ))
-            
-            conn.commit()
+            ultimo = ultimo_trade_sincronizado(cursor, user_id, ativo)
+            inseridas = 0
+            while True:
+                trades = client.get_my_trades(
+                    symbol=ativo, fromId=0 if ultimo is None else ultimo + 1,
+                    limit=LIMITE_PAGINA, recvWindow=60000
+                )
+                if not trades:
+                    break
+                try:
+                    inseridas += gravar_pagina(cursor, user_id, ativo, trades)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                ultimo = max(t['id'] for t in trades)
+                if len(trades) < LIMITE_PAGINA:
+                    break
+            resultado[ativo] = inseridas
+        except LimitePesoExcedido:
+            raise
         except Exception as e:
             print(f"Error syncing transactions for {ativo}: {e}")
             continue
-    
+    return resultado
+
+def sync_transactions_from_binance(user_id):
+    """
+    Syncs transactions from Binance order history to the database.
+    Only fetches trades newer than the last one synced for each enabled asset.
+    """
+    load_dotenv()
+    api_key = os.getenv("KEY_BINANCE")
+    api_secret = os.getenv("SECRET_BINANCE")
+    client = Client(api_key, api_secret)
+
+    conn = conectar()
+    resultado = sincronizar_trades(client, conn, user_id)
     conn.close()
-    print(f"Transactions synced for user {user_id}")
+    print(f"Transactions synced for user {user_id}: {sum(resultado.values())} new")
 
 if __name__ == "__main__":
     import sys
@@ -72,5 +225,4 @@ if __name__ == "__main__":
         user_id = int(sys.argv[1])
         sync_transactions_from_binance(user_id)
     else:
-        print("Usage: python transaction_sync.py <user_id>")
-
+        print("Usage: python -m utils.transaction_sync <user_id>")
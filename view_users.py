@@ -4,16 +4,12 @@ Script para visualizar usuários cadastrados no CryptoBot
 """
 import sqlite3
 from datetime import datetime
-import os
-
-# Use persistent disk path for Render or current directory for local development
-DB_DIR = os.environ.get('RENDER') and '/opt/render/project/src' or os.path.dirname(os.path.abspath(__file__))
-DB_PATH = os.path.join(DB_DIR, 'cryptobot.db')
+from utils.db import conectar
 
 def view_users():
     """Lista todos os usuários cadastrados no sistema"""
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = conectar()
         cursor = conn.cursor()
         
         # Buscar todos os usuários
@@ -72,7 +68,7 @@ def reset_password(username, new_password):
     from werkzeug.security import generate_password_hash
     
     try:
-        conn = sqlite3.connect(DB_PATH)
+        conn = conectar()
         cursor = conn.cursor()
         
         # Verificar se o usuário existe